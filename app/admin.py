@@ -4,8 +4,10 @@ from django.contrib.auth.models import Group
 from .models import (
     Users, Program, Section, Module, ProgramModule,
     Enrollment, Assignment, AssignmentSubmission,
-    Material, Certificate, MaterialProgress
+    Material, Certificate, MaterialProgress, ProgramProgress, Job,
+    DailyProgramStats
 )
+from .jobs import retry
 
 # ——— INLINES ——— #
 
@@ -137,3 +139,34 @@ class MaterialProgressAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'material__title')
     list_filter = ('material__module__section',)
     autocomplete_fields = ('user', 'material')
+
+# ——— PROGRAM PROGRESS ADMIN ——— #
+
+@admin.register(ProgramProgress)
+class ProgramProgressAdmin(admin.ModelAdmin):
+    list_display = ('user', 'program', 'assignments_accepted', 'assignments_total', 'updated_at')
+    search_fields = ('user__username', 'program__name')
+    readonly_fields = ('updated_at',)
+
+# ——— DAILY STATS ADMIN ——— #
+
+@admin.register(DailyProgramStats)
+class DailyProgramStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'program', 'enrollments', 'submissions', 'accepted', 'rejected', 'material_views')
+    list_filter = ('program',)
+    date_hierarchy = 'day'
+
+# ——— JOB ADMIN ——— #
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Повторить упавшие задачи')
+    def retry_jobs(self, request, queryset):
+        count = retry(queryset)
+        self.message_user(request, f'Поставлено в очередь: {count}')
@@ -0,0 +1,790 @@
+# app/api.py
+"""
+JSON API v1 (/api/v1/) для мобильного клиента.
+
+Ресурсы: programs, sections, modules, assignments, materials, enrollments,
+submissions и избранное (favorites). Авторизация — та же сессия, что
+у сайта: вход через /login/, изменяющие запросы передают X-CSRFToken.
+Без входа читаются только programs и sections (они есть на главной),
+и без связей с закрытыми ресурсами: кураторов программы аноним не видит
+ни списком id, ни через include — как и страницу /curators/.
+
+Параметры чтения:
+
+* fields=name,section — только эти поля (id есть всегда); поля вложенных
+  ресурсов — fields[sections]=name;
+* include=section,curators — вложить связанный объект вместо его id,
+  можно цепочкой: include=module.section. Связи грузятся через
+  select_related/prefetch_related, колонки — через only(), так что
+  лишних запросов и полей нет;
+* cursor и limit — keyset-пагинация из app/pagination.py (limit до MAX_LIMIT);
+* фильтры ресурса (Resource.filters), например ?section=3.
+
+У каждого ответа есть ETag, и If-None-Match даёт 304. Для программ,
+разделов и модулей ETag и Last-Modified строятся из счётчиков версий
+app/fragments.py ещё до запросов к базе; для остальных ресурсов ETag —
+хэш тела ответа (экономится трафик, а не запросы).
+
+Запись: POST в список, PATCH и DELETE объекта. Тело — JSON, для POST
+можно форму или multipart с файлом; файл также передаётся upload_id
+завершённой докачиваемой загрузки (app/uploads.py). Данные проверяют
+те же формы, что и на сайте, права — те же роли.
+
+Ответы сериализуются orjson, если он установлен, иначе стандартным json.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import fragments, progress, tasks, writes
+from .forms import (
+    AssignmentForm, AssignmentSubmissionForm, MaterialForm, ProgramForm, SectionForm, SubmissionReviewForm,
+)
+from .models import (
+    Assignment, AssignmentSubmission, Enrollment, Material, Module, Program, Section, Users,
+)
+from .pagination import PAGE_SIZE, paginate
+from .roles import is_admin, is_curator, is_curator_or_admin, is_participant
+from .routers import read_source, replica_reads
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+API_VERSION = 1
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.fields = fields
+
+
+# 🧾 JSON
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _json(data=None, status=200):
+    response = HttpResponse(b'' if data is None else dumps(data), status=status, content_type='application/json')
+    # Ответ зависит от пользователя (сессия) — только приватный кэш с обязательной проверкой
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _error(status, message, fields=None):
+    data = {'error': message}
+    if fields:
+        data['fields'] = fields
+    return _json(data, status=status)
+
+
+# 🧩 Поля: (колонки модели для only(), функция(obj, request) -> значение JSON)
+def _attr(column):
+    return (column,), lambda obj, request: getattr(obj, column)
+
+
+def _timestamp(column):
+    def get(obj, request):
+        value = getattr(obj, column)
+        return value.isoformat() if value else None
+    return (column,), get
+
+
+def _media_url(column):
+    def get(obj, request):
+        file = getattr(obj, column)
+        return request.build_absolute_uri(file.url) if file else None
+    return (column,), get
+
+
+def _material_file_url(obj, request):
+    # Через представление с проверкой доступа и Range, а не прямую ссылку в MEDIA
+    return request.build_absolute_uri(reverse('material_file', args=[obj.pk])) if obj.file else None
+
+
+def _visible_sections(user):
+    return Enrollment.objects.filter(user=user, is_approved=True).values('program__section_id')
+
+
+class Resource:
+    """Описание ресурса API. Подклассы задают поля, видимость и права на запись."""
+    name = None
+    model = None
+    fields = {}
+    # Поле ответа -> (имя ресурса, много ли объектов)
+    relations = {}
+    # GET-параметр -> lookup
+    filters = {}
+    ordering = ('pk',)
+    # Читается без входа
+    public = False
+    # Есть ли отдельный URL (users — только вложенный ресурс)
+    routed = True
+    # Группа app/fragments.py, если содержимое не зависит от пользователя и её
+    # счётчик меняется при любом изменении ресурса
+    fragment = None
+    form = None
+
+    def queryset(self, request):
+        return self.model.objects.all()
+
+    # 🔐 Права на запись
+    def can_create(self, user):
+        return False
+
+    def can_update(self, user, obj):
+        return False
+
+    def can_delete(self, user, obj):
+        return self.can_update(user, obj)
+
+    def get_form(self, request, data, files, instance=None):
+        return self.form(data, files, instance=instance)
+
+    def save(self, form):
+        return form.save()
+
+    def create(self, request, data, files):
+        if not self.can_create(request.user):
+            raise PermissionDenied
+        return self.save(_valid(self.get_form(request, data, files))), 201
+
+    def update(self, request, obj, data):
+        if not self.can_update(request.user, obj):
+            raise PermissionDenied
+        form_fields = self.form._meta.fields
+        current = {
+            name: [item.pk for item in value] if isinstance(value, list) else value
+            for name, value in model_to_dict(obj, fields=form_fields).items()
+            # Файл остаётся прежним, если не передан новый (upload_id)
+            if not isinstance(value, FieldFile)
+        }
+        return self.save(_valid(self.get_form(request, {**current, **data}, None, instance=obj)))
+
+    def delete(self, request, obj):
+        if not self.can_delete(request.user, obj):
+            raise PermissionDenied
+        obj.delete()
+        return None, 204
+
+
+def _valid(form):
+    if not form.is_valid():
+        raise ApiError(400, 'Проверьте данные', form.errors.get_json_data())
+    return form
+
+
+class UserResource(Resource):
+    name = 'users'
+    model = Users
+    routed = False
+    # Счётчик кураторов; участники вкладываются только в заявки и ответы,
+    # которые сами не версионируются
+    fragment = fragments.CURATORS
+    fields = {
+        'username': _attr('username'),
+        'first_name': _attr('first_name'),
+        'last_name': _attr('last_name'),
+        'middle_name': _attr('middle_name'),
+    }
+
+
+class SectionResource(Resource):
+    name = 'sections'
+    model = Section
+    public = True
+    fragment = fragments.SECTIONS
+    form = SectionForm
+    fields = {
+        'name': _attr('name'),
+        'description': _attr('description'),
+    }
+    relations = {'programs': ('programs', True)}
+
+    def can_create(self, user):
+        return is_curator_or_admin(user)
+
+    def can_update(self, user, obj):
+        return is_curator_or_admin(user)
+
+    def delete(self, request, obj):
+        if not self.can_delete(request.user, obj):
+            raise PermissionDenied
+        # Каскад (модули, задания, ответы, программы) удаляется в фоне, как на сайте
+        tasks.delete_section.enqueue(section_id=obj.pk)
+        return {'status': 'queued'}, 202
+
+
+class ProgramResource(Resource):
+    name = 'programs'
+    model = Program
+    public = True
+    fragment = fragments.PROGRAMS
+    form = ProgramForm
+    fields = {
+        'name': _attr('name'),
+        'description': _attr('description'),
+        'goal': _attr('goal'),
+        'skills': _attr('skills'),
+        'certificate_image': _media_url('certificate_image'),
+    }
+    relations = {'section': ('sections', False), 'curators': ('users', True)}
+    filters = {'section': 'section_id'}
+
+    def can_create(self, user):
+        return is_curator_or_admin(user)
+
+    def can_update(self, user, obj):
+        return is_curator_or_admin(user)
+
+    def delete(self, request, obj):
+        if not self.can_delete(request.user, obj):
+            raise PermissionDenied
+        tasks.delete_program.enqueue(program_id=obj.pk)
+        return {'status': 'queued'}, 202
+
+
+class ModuleResource(Resource):
+    # Модули ведутся в админке — в API только чтение
+    name = 'modules'
+    model = Module
+    fragment = fragments.MODULES
+    fields = {
+        'name': _attr('name'),
+        'description': _attr('description'),
+    }
+    relations = {'section': ('sections', False)}
+    filters = {'section': 'section_id'}
+
+
+class AssignmentResource(Resource):
+    name = 'assignments'
+    model = Assignment
+    form = AssignmentForm
+    fields = {
+        'title': _attr('title'),
+        'description': _attr('description'),
+    }
+    relations = {'module': ('modules', False)}
+    filters = {'module': 'module_id', 'section': 'module__section_id'}
+
+    def queryset(self, request):
+        assignments = Assignment.objects.all()
+        if is_curator_or_admin(request.user):
+            return assignments
+        return assignments.filter(module__section_id__in=_visible_sections(request.user))
+
+    def can_create(self, user):
+        return is_curator_or_admin(user)
+
+    def can_update(self, user, obj):
+        return is_curator(user)
+
+
+class MaterialResource(Resource):
+    name = 'materials'
+    model = Material
+    form = MaterialForm
+    fields = {
+        'title': _attr('title'),
+        'description': _attr('description'),
+        'file_type': _attr('file_type'),
+        'file': (('file',), _material_file_url),
+    }
+    relations = {'module': ('modules', False)}
+    filters = {'module': 'module_id', 'section': 'module__section_id'}
+
+    def queryset(self, request):
+        materials = Material.objects.all()
+        if is_curator_or_admin(request.user):
+            return materials
+        # Как и файл материала: только разделы программ, на которые пользователь записан
+        return materials.filter(module__section_id__in=_visible_sections(request.user))
+
+    def get_form(self, request, data, files, instance=None):
+        return self.form(data, files, instance=instance, user=request.user)
+
+    def can_create(self, user):
+        return is_curator(user)
+
+    def can_update(self, user, obj):
+        return is_curator(user)
+
+
+class EnrollmentResource(Resource):
+    name = 'enrollments'
+    model = Enrollment
+    fields = {
+        'is_approved': _attr('is_approved'),
+        'created_at': _timestamp('created_at'),
+    }
+    relations = {'program': ('programs', False), 'user': ('users', False)}
+    filters = {'program': 'program_id', 'is_approved': 'is_approved'}
+    ordering = ('-pk',)
+
+    def queryset(self, request):
+        user = request.user
+        if is_admin(user):
+            return Enrollment.objects.all()
+        if is_curator(user):
+            return Enrollment.objects.filter(program__curators=user)
+        return Enrollment.objects.filter(user=user)
+
+    def create(self, request, data, files):
+        # Заявку подаёт участник за себя: {"program": id}
+        if not is_participant(request.user):
+            raise PermissionDenied
+        program = _related_object(Program.objects.all(), data.get('program'), 'program')
+        enrollment, created = writes.atomic_with_retry(
+            Enrollment.objects.get_or_create, user=request.user, program=program,
+        )
+        return enrollment, 201 if created else 200
+
+    def update(self, request, obj, data):
+        # Куратор своих программ или админ одобряет/отклоняет: {"is_approved": true}
+        if not is_curator_or_admin(request.user):
+            raise PermissionDenied
+        approved = data.get('is_approved')
+        if not isinstance(approved, bool):
+            raise ApiError(400, 'Проверьте данные', {'is_approved': [{'message': 'Ожидается true или false'}]})
+        # Прогресс создаётся или удаляется так же, как при пакетном одобрении на сайте
+        progress.set_approval(Enrollment.objects.filter(pk=obj.pk), approved)
+        return Enrollment.objects.get(pk=obj.pk)
+
+    def delete(self, request, obj):
+        raise ApiError(405, 'Метод не поддерживается')
+
+
+class SubmissionResource(Resource):
+    name = 'submissions'
+    model = AssignmentSubmission
+    fields = {
+        'answer_text': _attr('answer_text'),
+        'answer_file': _media_url('answer_file'),
+        'status': _attr('status'),
+        'submitted_at': _timestamp('submitted_at'),
+        'reviewed_at': _timestamp('reviewed_at'),
+    }
+    relations = {'assignment': ('assignments', False), 'user': ('users', False)}
+    filters = {'assignment': 'assignment_id', 'status': 'status'}
+    ordering = ('-pk',)
+
+    def queryset(self, request):
+        if is_curator_or_admin(request.user):
+            return AssignmentSubmission.objects.all()
+        return AssignmentSubmission.objects.filter(user=request.user)
+
+    def create(self, request, data, files):
+        # Ответ участника на задание: {"assignment": id, "answer_text": ..., "upload_id": ...}
+        if not is_participant(request.user):
+            raise PermissionDenied
+        assignment = _related_object(
+            RESOURCES['assignments'].queryset(request), data.get('assignment'), 'assignment',
+        )
+        submission = AssignmentSubmission.objects.filter(user=request.user, assignment=assignment).first()
+        # Как в assignment_detail: отправленный или принятый ответ не меняется
+        if submission is not None and submission.status != 'rejected':
+            raise ApiError(409, 'Ответ уже отправлен на проверку или принят')
+        form = _valid(AssignmentSubmissionForm(data, files, instance=submission, user=request.user))
+        form.instance.user = request.user
+        form.instance.assignment = assignment
+        form.instance.status = 'submitted'
+        new_submission = writes.atomic_with_retry(form.save)
+        return new_submission, 201 if submission is None else 200
+
+    def update(self, request, obj, data):
+        # Проверка куратором: {"status": "accepted" | "rejected"}
+        if not is_curator(request.user):
+            raise PermissionDenied
+        if data.get('status') not in ('accepted', 'rejected'):
+            raise ApiError(400, 'Проверьте данные', {'status': [{'message': 'Ожидается accepted или rejected'}]})
+        form = _valid(SubmissionReviewForm(data, instance=obj))
+        # Счётчики прогресса и сертификат обновляются сигналами (app/progress.py)
+        return writes.atomic_with_retry(form.save)
+
+    def delete(self, request, obj):
+        raise ApiError(405, 'Метод не поддерживается')
+
+
+RESOURCES = {resource.name: resource for resource in (
+    UserResource(), SectionResource(), ProgramResource(), ModuleResource(),
+    AssignmentResource(), MaterialResource(), EnrollmentResource(), SubmissionResource(),
+)}
+
+
+def _related_object(queryset, value, field):
+    if value in (None, ''):
+        raise ApiError(400, 'Проверьте данные', {field: [{'message': 'Обязательное поле'}]})
+    try:
+        return queryset.get(pk=value)
+    except (queryset.model.DoesNotExist, ValueError, TypeError, ValidationError):
+        raise ApiError(400, 'Проверьте данные', {field: [{'message': 'Объект не найден'}]})
+
+
+# 🔎 Разбор fields/include и план запроса
+class Query:
+    """Что попросил клиент: поля по типам ресурсов и дерево вложений."""
+
+    def __init__(self, request, resource):
+        self.request = request
+        self.resource = resource
+        self.authenticated = request.user.is_authenticated
+        self.fieldsets = self._parse_fields(request.GET)
+        self.include = self._parse_include(request.GET.get('include', ''))
+
+    def _parse_fields(self, params):
+        fieldsets = {}
+        for key in params:
+            if key == 'fields':
+                name = self.resource.name
+            elif key.startswith('fields[') and key.endswith(']'):
+                name = key[7:-1]
+            else:
+                continue
+            resource = RESOURCES.get(name)
+            if resource is None:
+                raise ApiError(400, f'Неизвестный ресурс в {key}: {name}')
+            self._require_access(resource)
+            names = [field for field in params[key].split(',') if field and field != 'id']
+            unknown = [field for field in names if field not in resource.fields and field not in resource.relations]
+            if unknown:
+                raise ApiError(400, f'Неизвестные поля {name}: {", ".join(unknown)}')
+            for field in names:
+                if field in resource.relations:
+                    self._require_access(RESOURCES[resource.relations[field][0]])
+            fieldsets[name] = names
+        return fieldsets
+
+    def _parse_include(self, value):
+        tree = {}
+        for path in filter(None, value.split(',')):
+            resource, node = self.resource, tree
+            for name in path.split('.'):
+                if name not in resource.relations:
+                    raise ApiError(400, f'Нельзя вложить {name} в {resource.name}')
+                node = node.setdefault(name, {})
+                resource = RESOURCES[resource.relations[name][0]]
+                self._require_access(resource)
+        return tree
+
+    def _require_access(self, resource):
+        if not resource.public and not self.authenticated:
+            raise ApiError(401, 'Требуется вход')
+
+    def selected(self, resource, tree):
+        names = self.fieldsets.get(resource.name)
+        if names is None:
+            names = [*resource.fields, *(
+                name for name, (target, _) in resource.relations.items()
+                if self.authenticated or RESOURCES[target].public
+            )]
+        # Вложенная связь попадает в ответ, даже если её нет в fields
+        return names + [name for name in tree if name not in names]
+
+    def fragment_groups(self):
+        """
+        Группы app/fragments.py, покрывающие весь ответ, или None, если хоть
+        один затронутый ресурс не версионируется — тогда ETag считается по телу.
+        """
+        groups = set()
+
+        def walk(resource, tree):
+            if resource.fragment is None:
+                return False
+            groups.add(resource.fragment)
+            for name in self.selected(resource, tree):
+                if name not in resource.relations:
+                    continue
+                target = RESOURCES[resource.relations[name][0]]
+                if name in tree:
+                    if not walk(target, tree[name]):
+                        return False
+                elif target.fragment is None:
+                    return False
+                else:
+                    # Без вложения в ответе только id — их меняют изменения связанного ресурса
+                    groups.add(target.fragment)
+            return True
+
+        return sorted(groups) if walk(self.resource, self.include) else None
+
+    # 🗄 only / select_related / prefetch_related
+    def optimize(self, queryset, resource=None, tree=None, extra=()):
+        resource = resource or self.resource
+        tree = self.include if tree is None else tree
+        only, select, prefetch = ['pk', *extra], [], []
+        self._collect(resource, tree, '', only, select, prefetch)
+        # Поля сортировки нужны курсору — без них был бы запрос на каждую строку
+        only += [field.lstrip('-') for field in resource.ordering if field.lstrip('-') != 'pk']
+        queryset = queryset.only(*only)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def _collect(self, resource, tree, prefix, only, select, prefetch):
+        for name in self.selected(resource, tree):
+            if name not in resource.relations:
+                only.extend(prefix + column for column in resource.fields[name][0])
+                continue
+            target = RESOURCES[resource.relations[name][0]]
+            if resource.relations[name][1]:
+                field = resource.model._meta.get_field(name)
+                # Обратному ForeignKey нужен столбец связи, чтобы разложить объекты по родителям
+                extra = [field.field.name] if field.one_to_many else []
+                related = target.model.objects.order_by('pk')
+                if name in tree:
+                    related = self.optimize(related, target, tree[name], extra)
+                else:
+                    related = related.only('pk', *extra)
+                prefetch.append(Prefetch(prefix + name, queryset=related))
+            else:
+                only.append(prefix + name)
+                if name in tree:
+                    select.append(prefix + name)
+                    self._collect(target, tree[name], f'{prefix}{name}__', only, select, prefetch)
+
+    def serialize(self, obj, resource=None, tree=None):
+        resource = resource or self.resource
+        tree = self.include if tree is None else tree
+        data = {'id': obj.pk}
+        for name in self.selected(resource, tree):
+            if name not in resource.relations:
+                data[name] = resource.fields[name][1](obj, self.request)
+                continue
+            target_name, many = resource.relations[name]
+            if many:
+                related = getattr(obj, name).all()
+                data[name] = (
+                    [self.serialize(item, RESOURCES[target_name], tree[name]) for item in related]
+                    if name in tree else [item.pk for item in related]
+                )
+            elif name in tree:
+                related = getattr(obj, name)
+                data[name] = self.serialize(related, RESOURCES[target_name], tree[name]) if related else None
+            else:
+                data[name] = getattr(obj, resource.model._meta.get_field(name).attname)
+        return data
+
+
+# 🧭 Чтение с ETag / Last-Modified
+def _respond(request, query, build, versioned=True):
+    """
+    build() -> данные ответа. Для версионируемых ресурсов валидаторы известны
+    до запросов к базе, и при совпадении build() не вызывается вовсе.
+    """
+    groups = query.fragment_groups() if versioned else None
+    if groups:
+        # Набор связей в ответе зависит от того, вошёл ли пользователь
+        raw = (
+            f'{API_VERSION}:{fragments.versions(*groups)}:{read_source()}:'
+            f'{query.authenticated}:{request.get_full_path()}'
+        )
+        response = _json()
+        response['ETag'] = f'"{hashlib.sha1(raw.encode()).hexdigest()[:32]}"'
+        last_modified = fragments.last_modified(*groups)
+        response['Last-Modified'] = http_date(last_modified)
+        conditional = get_conditional_response(
+            request, etag=response['ETag'], last_modified=last_modified, response=response,
+        )
+        if conditional is not response:
+            return conditional
+        response.content = dumps(build())
+        return response
+
+    response = _json(build())
+    response['ETag'] = f'"{hashlib.sha1(response.content).hexdigest()[:32]}"'
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _limit(request):
+    value = request.GET.get('limit', '')
+    if not value:
+        return PAGE_SIZE
+    if not value.isdigit() or not 1 <= int(value) <= MAX_LIMIT:
+        raise ApiError(400, f'limit должен быть от 1 до {MAX_LIMIT}')
+    return int(value)
+
+
+def _page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def _filtered(request, resource, queryset):
+    for param, lookup in resource.filters.items():
+        value = request.GET.get(param)
+        if value is None:
+            continue
+        if value in ('true', 'false'):
+            value = value == 'true'
+        try:
+            queryset = queryset.filter(**{lookup: value})
+        except (ValueError, ValidationError):
+            raise ApiError(400, f'Некорректное значение {param}')
+    return queryset
+
+
+def _list(request, query, queryset, versioned=True):
+    limit = _limit(request)
+
+    def build():
+        page = paginate(
+            query.optimize(_filtered(request, query.resource, queryset)), request,
+            ordering=query.resource.ordering, per_page=limit,
+        )
+        return {
+            'results': [query.serialize(obj) for obj in page],
+            'next': _page_link(request, page.next_cursor),
+            'previous': _page_link(request, page.previous_cursor),
+        }
+    return _respond(request, query, build, versioned)
+
+
+def _detail(request, query, queryset, pk):
+    def build():
+        obj = query.optimize(queryset).filter(pk=pk).first()
+        if obj is None:
+            raise Http404
+        return query.serialize(obj)
+    return _respond(request, query, build)
+
+
+# ✏️ Запись
+def _payload(request):
+    if request.content_type == 'application/json':
+        try:
+            data = loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Некорректный JSON')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект')
+        return data, None
+    if request.method == 'POST':
+        return request.POST, request.FILES
+    raise ApiError(415, 'Ожидается application/json')
+
+
+def _written(request, resource, obj, status=200):
+    if obj is None:
+        return _json(status=status)
+    if isinstance(obj, dict):
+        return _json(obj, status=status)
+    query = Query(request, resource)
+    obj = query.optimize(resource.model.objects.all()).get(pk=obj.pk)
+    response = _json(query.serialize(obj), status=status)
+    if status == 201:
+        response['Location'] = request.build_absolute_uri(reverse('api_item', args=[resource.name, obj.pk]))
+    return response
+
+
+# 🚪 Точки входа
+def _api_view(methods):
+    """JSON вместо редиректов и HTML-страниц ошибок; 401 для анонимов."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _error(405, 'Метод не поддерживается')
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                return _error(exc.status, exc.message, exc.fields)
+            except Http404:
+                return _error(404, 'Не найдено')
+            except PermissionDenied:
+                return _error(403, 'Недостаточно прав')
+        return wrapper
+    return decorator
+
+
+def _resource(request, name, write=False):
+    resource = RESOURCES.get(name)
+    if resource is None or not resource.routed:
+        raise Http404
+    if not request.user.is_authenticated and (write or not resource.public):
+        raise ApiError(401, 'Требуется вход')
+    return resource
+
+
+@_api_view(('GET', 'HEAD', 'POST'))
+def collection(request, resource):
+    resource = _resource(request, resource, write=request.method == 'POST')
+    if request.method == 'POST':
+        data, files = _payload(request)
+        obj, status = resource.create(request, data, files)
+        return _written(request, resource, obj, status)
+    query = Query(request, resource)
+    return replica_reads(lambda request: _list(request, query, resource.queryset(request)))(request)
+
+
+@_api_view(('GET', 'HEAD', 'PATCH', 'DELETE'))
+def item(request, resource, pk):
+    resource = _resource(request, resource, write=request.method in ('PATCH', 'DELETE'))
+    if request.method in ('GET', 'HEAD'):
+        query = Query(request, resource)
+        return replica_reads(lambda request: _detail(request, query, resource.queryset(request), pk))(request)
+
+    obj = resource.queryset(request).filter(pk=pk).first()
+    if obj is None:
+        raise Http404
+    if request.method == 'DELETE':
+        result, status = resource.delete(request, obj)
+        return _written(request, resource, result, status)
+    data, _ = _payload(request)
+    return _written(request, resource, resource.update(request, obj, data))
+
+
+@_api_view(('GET', 'HEAD', 'POST'))
+def favorites(request):
+    """Избранные программы пользователя; POST {"program": id} добавляет программу."""
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Требуется вход')
+    resource = RESOURCES['programs']
+    if request.method == 'POST':
+        data, _ = _payload(request)
+        program = _related_object(Program.objects.all(), data.get('program'), 'program')
+        exists = request.user.favorites.filter(pk=program.pk).exists()
+        if not exists:
+            request.user.favorites.add(program)
+        return _written(request, resource, program, 200 if exists else 201)
+    # Состав избранного у каждого свой и счётчиками версий не покрыт — ETag по телу
+    return _list(request, Query(request, resource), request.user.favorites.all(), versioned=False)
+
+
+@_api_view(('DELETE',))
+def favorite(request, program_id):
+    """DELETE убирает программу из избранного."""
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Требуется вход')
+    request.user.favorites.remove(program_id)
+    return _json(status=204)
@@ -0,0 +1,134 @@
+# app/certificates.py
+"""
+PDF-сертификаты.
+
+PDF рендерится один раз и хранится в Certificate.file под ключом, зависящим
+от имени пользователя, названия программы и версии шаблона. Пока эти данные
+не меняются, скачивание отдаёт готовый файл из хранилища.
+
+ReportLab и transliterate импортируются при первом рендере: модуль
+подключается при старте каждого воркера (через сигналы и задачи),
+а PDF нужен лишь немногим запросам.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Certificate
+
+# Увеличить при любом изменении вёрстки generate_certificate_pdf
+CERTIFICATE_TEMPLATE_VERSION = 1
+CERTIFICATE_PDF_DIR = 'certificates/pdf'
+
+
+def generate_certificate_pdf(username, program_name):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+    from transliterate import translit
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+
+    width, height = A4
+
+    # Заменим всё на латиницу
+    username = translit(username, 'ru', reversed=True)
+    program_name = translit(program_name, 'ru', reversed=True)
+
+    p.setFont("Helvetica-Bold", 24)
+    p.drawCentredString(width / 2, height - 4 * cm, "CERTIFICATE")
+
+    p.setFont("Helvetica", 16)
+    p.drawCentredString(width / 2, height - 6 * cm, f"User: {username}")
+
+    p.setFont("Helvetica-Oblique", 14)
+    p.drawCentredString(width / 2, height - 8 * cm, f"For completed the program: {program_name}")
+
+    p.setFont("Helvetica", 12)
+    p.drawCentredString(width / 2, 3 * cm, "Congratulate!")
+
+    p.showPage()
+    p.save()
+    buffer.seek(0)
+
+    filename = f'{username}_{program_name}_certificate.pdf'.replace(' ', '_')
+    return ContentFile(buffer.read(), name=filename)
+
+
+def certificate_key(username, program_name):
+    raw = f'{CERTIFICATE_TEMPLATE_VERSION}\0{username}\0{program_name}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def certificate_key_for(certificate):
+    return certificate_key(certificate.user.username, certificate.program.name)
+
+
+def _key_prefix(key):
+    return f'{CERTIFICATE_PDF_DIR}/{key}/'
+
+
+def is_certificate_file_current(certificate, key=None):
+    key = key or certificate_key_for(certificate)
+    name = certificate.file.name or ''
+    return name.startswith(_key_prefix(key)) and default_storage.exists(name)
+
+
+def store_certificate_pdf(certificate, key, content):
+    """Сохранить отрендеренный PDF и привязать его к сертификату."""
+    name = default_storage.save(_key_prefix(key) + content.name, content)
+    old_name = certificate.file.name
+    Certificate.objects.filter(pk=certificate.pk).update(file=name)
+    certificate.file.name = name
+
+    # Старый файл больше никому не нужен (ключ сменился или версия шаблона выросла)
+    if old_name and old_name != name and not Certificate.objects.filter(file=old_name).exists():
+        default_storage.delete(old_name)
+    return name
+
+
+def ensure_certificate_file(certificate):
+    """
+    Гарантировать актуальный PDF в хранилище. Возвращает ключ (он же ETag).
+
+    certificate должен быть загружен с select_related('user', 'program').
+    """
+    key = certificate_key_for(certificate)
+    if not is_certificate_file_current(certificate, key):
+        content = generate_certificate_pdf(certificate.user.username, certificate.program.name)
+        store_certificate_pdf(certificate, key, content)
+    return key
+
+
+# 📦 Массовый рендер (manage.py issuecertificates)
+def render_to_storage(key, username, program_name):
+    """
+    Положить PDF в хранилище под ключом key и вернуть имя файла.
+    Если файл с этим ключом уже есть (прошлый прерванный запуск) — вернуть его.
+    Работает без базы, поэтому годится для пула процессов.
+    """
+    prefix = _key_prefix(key)
+    try:
+        _, files = default_storage.listdir(prefix)
+    except FileNotFoundError:
+        files = []
+    if files:
+        return prefix + sorted(files)[0]
+    content = generate_certificate_pdf(username, program_name)
+    return default_storage.save(prefix + content.name, content)
+
+
+def attach_files(names):
+    """Привязать файлы к сертификатам ({id: имя}) и удалить старые, на которые никто не ссылается."""
+    certificates = list(Certificate.objects.filter(pk__in=names).only('pk', 'file'))
+    old_names = {c.file.name for c in certificates if c.file.name and c.file.name != names[c.pk]}
+    for certificate in certificates:
+        certificate.file.name = names[certificate.pk]
+    Certificate.objects.bulk_update(certificates, ['file'])
+    still_used = set(Certificate.objects.filter(file__in=old_names).values_list('file', flat=True))
+    for name in old_names - still_used:
+        default_storage.delete(name)
+    return len(certificates)
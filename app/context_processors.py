@@ -1,4 +1,6 @@
 # app/context_processors.py
+from .roles import is_admin, is_curator, is_participant
+
 
 def user_roles(request):
     if not request.user.is_authenticated:
@@ -8,15 +10,10 @@ def user_roles(request):
             'is_user': False,
         }
 
-    is_admin_user = request.user.is_superuser or request.user.groups.filter(name='Администратор').exists()
-    is_curator_user = False
-    is_participant_user = False
-
-    if not is_admin_user:
-        is_curator_user = request.user.groups.filter(name='Куратор').exists()
-
-        if not is_curator_user:
-            is_participant_user = request.user.groups.filter(name='Пользователь').exists()
+    # Все проверки читают один и тот же набор групп, загруженный за запрос
+    is_admin_user = is_admin(request.user)
+    is_curator_user = not is_admin_user and is_curator(request.user)
+    is_participant_user = not is_admin_user and not is_curator_user and is_participant(request.user)
 
     return {
         'is_admin': is_admin_user,
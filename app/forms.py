@@ -3,8 +3,10 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import Group
 from .models import (
     Users, Program, Enrollment, AssignmentSubmission,
-    Material, Assignment, Certificate
+    Material, Assignment, Certificate, Section, UploadSession
 )
+from . import thumbnails
+from .uploads import attaching
 
 class BaseBootstrapForm(forms.ModelForm):
     def apply_bootstrap(self):
@@ -30,6 +32,47 @@ class BaseBootstrapForm(forms.ModelForm):
         self.apply_bootstrap()
 
 
+class ChunkedUploadMixin(forms.Form):
+    """
+    Файл можно передать обычным полем или id завершённой докачиваемой загрузки
+    (app/uploads.py) в скрытом поле upload_id. Форме нужен user=request.user;
+    сохраняется она с commit=True (поля, не входящие в форму, задают в instance заранее).
+    """
+    upload_field = None
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.upload_session = None
+        self.fields['upload_id'].widget.attrs['data-chunked-upload-for'] = self.upload_field
+        self.fields[self.upload_field].widget.attrs['data-chunked-upload'] = 'true'
+        if self.data.get(self.add_prefix('upload_id')):
+            self.fields[self.upload_field].required = False
+
+    def clean_upload_id(self):
+        upload_id = self.cleaned_data.get('upload_id')
+        if upload_id:
+            self.upload_session = UploadSession.objects.filter(
+                pk=upload_id, user=self.user, status='complete'
+            ).first()
+            if self.upload_session is None:
+                raise forms.ValidationError('Загрузка файла не найдена или не завершена')
+        return upload_id
+
+    def save(self, commit=True):
+        if self.upload_session is None:
+            return super().save(commit)
+        if not commit:
+            # Загрузка закрывается вместе с сохранением модели — иначе при ошибке файл потеряется
+            raise ValueError('Форму с upload_id сохраняют с commit=True')
+        instance = super().save(commit=False)
+        with attaching(self.upload_session, getattr(instance, self.upload_field)):
+            instance.save()
+            self._save_m2m()
+        return instance
+
+
 # 🔐 Регистрация
 class RegistrationForm(BaseBootstrapForm):
     first_name = forms.CharField(label='Имя', required=False)
@@ -91,7 +134,9 @@ class EnrollmentForm(BaseBootstrapForm):
 
 
 # 📝 Отправка задания
-class AssignmentSubmissionForm(BaseBootstrapForm):
+class AssignmentSubmissionForm(ChunkedUploadMixin, BaseBootstrapForm):
+    upload_field = 'answer_file'
+
     class Meta:
         model = AssignmentSubmission
         fields = ['answer_text', 'answer_file']
@@ -119,7 +164,9 @@ class SubmissionReviewForm(BaseBootstrapForm):
 
 
 # 📁 Материал
-class MaterialForm(BaseBootstrapForm):
+class MaterialForm(ChunkedUploadMixin, BaseBootstrapForm):
+    upload_field = 'file'
+
     class Meta:
         model = Material
         fields = ['module', 'title', 'file', 'file_type', 'description']
@@ -150,6 +197,17 @@ class AssignmentForm(BaseBootstrapForm):
         }
 
 
+# 🗂 Раздел
+class SectionForm(BaseBootstrapForm):
+    class Meta:
+        model = Section
+        fields = ['name', 'description']
+        labels = {
+            'name': 'Название раздела',
+            'description': 'Описание раздела',
+        }
+
+
 # 🎓 Программа
 class ProgramForm(BaseBootstrapForm):
     class Meta:
@@ -174,6 +232,13 @@ class ProgramForm(BaseBootstrapForm):
             }),
         }
 
+    def save(self, commit=True):
+        program = super().save(commit)
+        # Копии для каталога — сразу при загрузке, а не на первом показе
+        if commit and 'certificate_image' in self.changed_data:
+            thumbnails.generate(program.certificate_image)
+        return program
+
 
 # 🏅 Сертификат
 class CertificateForm(BaseBootstrapForm):
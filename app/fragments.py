@@ -0,0 +1,102 @@
+# app/fragments.py
+"""
+Версионный кэш фрагментов каталога.
+
+Для каждой группы данных каталога в кэше лежит счётчик версии. Фрагменты
+шаблонов кэшируются тегом {% cache %}, а строка версий из context() входит
+в его vary_on: сигналы из app/signals.py увеличивают счётчик при изменении
+данных, фрагмент получает новый ключ, а старые записи истекают сами
+через FRAGMENT_CACHE_TIMEOUT.
+
+Данные для фрагментов представления передают лениво (querysets,
+SimpleLazyObject), поэтому при попадании в кэш запросов к базе нет.
+Персональное (избранное, заявка, кнопки куратора) в общие фрагменты
+не входит или разделяется по роли через vary_on. Ссылки пагинации внутри
+фрагмента строятся из page_query(), а не из всего request.GET.
+
+Счётчики должны жить в общем для всех воркеров кэше (по умолчанию
+app/sqlite_cache.py) — с LocMemCache каждый процесс видит только свои
+изменения, и устаревший фрагмент живёт до истечения FRAGMENT_CACHE_TIMEOUT.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+
+from .routers import read_source
+
+PROGRAMS = 'program'
+SECTIONS = 'section'
+MODULES = 'module'
+MATERIALS = 'material'
+CURATORS = 'curators'
+ALL = (PROGRAMS, SECTIONS, MODULES, MATERIALS, CURATORS)
+
+
+def _key(name):
+    return f'fragment-version:{name}'
+
+
+def _modified_key(name):
+    return f'fragment-modified:{name}'
+
+
+def _initial():
+    # Не 1: после вытеснения счётчика из кэша ключи не совпадут со старыми фрагментами
+    return time.time_ns() // 1000
+
+
+def versions(*names):
+    """Строка с текущими версиями групп names, например 'program.1718.section.42'."""
+    keys = [_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        found[key] = value
+    return '.'.join(f'{name}.{found[key]}' for name, key in zip(names, keys))
+
+
+def bump(*names):
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), _initial(), None)
+    cache.set_many({_modified_key(name): int(time.time()) for name in names}, None)
+
+
+def last_modified(*names):
+    """Время последнего изменения групп names (unix time) — для заголовка Last-Modified."""
+    keys = [_modified_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Время изменения неизвестно (кэш очищен) — считаем, что данные изменились сейчас
+            now = int(time.time())
+            found[key] = now if cache.add(key, now, None) else cache.get(key, now)
+    return max(found.values())
+
+
+def context(*names):
+    """Переменные для {% cache fragment_timeout '...' fragment_version ... %}."""
+    return {
+        'fragment_timeout': getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600),
+        # С реплики фрагмент рендерится по снимку — его поколение тоже часть ключа
+        'fragment_version': f'{versions(*names)}:{read_source()}',
+    }
+
+
+def page_query(**params):
+    """
+    Параметры для ссылок пагинации внутри фрагмента — только те, от которых
+    зависит его ключ. Иначе {% querystring %} скопировал бы в общий фрагмент
+    весь request.GET первого посетителя (например, utm-метки).
+    """
+    query = QueryDict(mutable=True)
+    for name, value in params.items():
+        if value not in (None, ''):
+            query[name] = value
+    return query
@@ -0,0 +1,126 @@
+# app/jobs.py
+"""
+Очередь фоновых задач на таблице Job.
+
+Задача — обычная функция, помеченная декоратором @job (см. app/tasks.py).
+Вьюхи ставят её в очередь через func.enqueue(**kwargs) и сразу отвечают,
+а выполняет её воркер `python manage.py runjobs`. Брокер не нужен: захват
+задачи — атомарный UPDATE ... WHERE status='queued'.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job(name=None, max_attempts=3):
+    """Зарегистрировать функцию как фоновую задачу."""
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[job_name] = func
+        func.job_name = job_name
+        func.enqueue = lambda run_at=None, **payload: enqueue(
+            job_name, run_at=run_at, max_attempts=max_attempts, **payload
+        )
+        return func
+    return decorator
+
+
+def enqueue(name, run_at=None, max_attempts=3, **payload):
+    """
+    Поставить задачу в очередь. Аргументы должны сериализоваться в JSON.
+
+    Строка очереди пишется в той же транзакции, что и данные вьюхи, поэтому
+    при откате задача тоже пропадёт.
+    """
+    if _setting('JOBS_EAGER', False):
+        _registry[name](**payload)
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim_next(worker_id, batch=10):
+    """Захватить следующую готовую задачу или вернуть None."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('id', flat=True)[:batch]
+    )
+    for job_id in candidates:
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job_obj):
+    func = _registry.get(job_obj.name)
+    try:
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {job_obj.name}')
+        # Без общей транзакции: задача сама пишет короткими транзакциями (см. app/tasks.py)
+        func(**job_obj.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Задача %s #%s упала (попытка %s)', job_obj.name, job_obj.pk, job_obj.attempts)
+        if job_obj.attempts < job_obj.max_attempts:
+            # Экспоненциальная пауза перед повтором: 30 с, 60 с, 120 с...
+            delay = _setting('JOBS_RETRY_BACKOFF', 30) * 2 ** (job_obj.attempts - 1)
+            Job.objects.filter(pk=job_obj.pk).update(
+                status='queued', run_at=timezone.now() + timedelta(seconds=delay),
+                locked_by='', locked_at=None, last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job_obj.pk).update(
+                status='failed', finished_at=timezone.now(), last_error=error,
+            )
+        return False
+
+    Job.objects.filter(pk=job_obj.pk).update(status='done', finished_at=timezone.now(), last_error='')
+    return True
+
+
+def requeue_interval():
+    """Как часто воркер ищет зависшие задачи, с."""
+    return _setting('JOBS_REQUEUE_INTERVAL', 60)
+
+
+def requeue_stale():
+    """
+    Вернуть в очередь задачи, чей воркер умер посреди выполнения.
+    Вызывается при старте runjobs и затем раз в requeue_interval().
+    """
+    timeout = _setting('JOBS_STALE_TIMEOUT', 600)
+    return Job.objects.filter(
+        status='running', locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    ).update(status='queued', locked_by='', locked_at=None)
+
+
+def retry(jobs):
+    return jobs.filter(status='failed').update(
+        status='queued', attempts=0, run_at=timezone.now(), locked_by='', locked_at=None,
+    )
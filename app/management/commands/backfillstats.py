@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from app import stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает дневную статистику по программам из заявок, ответов и просмотров"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Первый день периода (ГГГГ-ММ-ДД)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Последний день периода (ГГГГ-ММ-ДД)')
+
+    def handle(self, *args, **options):
+        count = stats.backfill(options['since'], options['until'])
+        self.stdout.write(self.style.SUCCESS(f"Записано строк статистики: {count}"))
+        undated = stats.undated()
+        if any(undated.values()):
+            self.stdout.write(self.style.WARNING(
+                f"Без даты и не учтены: заявок {undated['enrollments']}, "
+                f"просмотров материалов {undated['material_views']} (созданы до миграции 0007)"
+            ))
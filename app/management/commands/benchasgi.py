@@ -0,0 +1,142 @@
+import json
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connections
+
+from app.models import Certificate, Enrollment, Material, Module, Program, Section, Users
+from app.roles import ROLE_PARTICIPANT
+
+from .loadtest import Command as LoadTestCommand, Results, Session
+
+DEPLOYMENTS = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}
+
+
+class Command(LoadTestCommand):
+    help = (
+        "Сравнивает WSGI (gunicorn, sync-воркеры) и ASGI (gunicorn + UvicornWorker) при одинаковом "
+        "числе воркеров на эндпоинтах с вводом-выводом: файл материала, сертификат, избранное"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=3, help='Воркеров в обоих вариантах')
+        parser.add_argument('--concurrency', type=int, default=30, help='Одновременных клиентов')
+        parser.add_argument('--rounds', type=int, default=5, help='Кругов запросов на клиента')
+        parser.add_argument('--file-size', type=int, default=5, help='Размер файла материала, МБ')
+        parser.add_argument('--deployments', nargs='+', choices=sorted(DEPLOYMENTS), default=['wsgi', 'asgi'])
+        parser.add_argument('--output', help='Файл для результатов JSON')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='benchasgi-')
+        summaries = {}
+        try:
+            database = self.copy_database(workdir)
+            fixtures = self.create_bench_fixtures(workdir, options)
+            for deployment in options['deployments']:
+                port = self.free_port()
+                base_url = f'http://localhost:{port}'
+                server = self.start_server({**options, 'server': DEPLOYMENTS[deployment]}, database, port, workdir)
+                try:
+                    self.wait_for(base_url, server)
+                    results, elapsed = self.run_clients(base_url, fixtures, options)
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+                summaries[deployment] = {'elapsed_s': round(elapsed, 2), 'endpoints': results.summary(elapsed)}
+                self.print_summary(summaries[deployment]['endpoints'], elapsed)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.print_comparison(summaries)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'options': {k: options[k] for k in ('workers', 'concurrency', 'rounds', 'file_size')},
+                           'deployments': summaries}, f, ensure_ascii=False, indent=2)
+
+    def create_bench_fixtures(self, workdir, options):
+        call_command('initroles', stdout=open(os.devnull, 'w'))
+        tag = uuid.uuid4().hex[:6]
+        section = Section.objects.create(name=f'ASGI {tag}', description='-')
+        program = Program.objects.create(name=f'ASGI {tag}', description='-', goal='-', skills='-', section=section)
+        module = Module.objects.create(name='Модуль', description='-', section=section)
+
+        # Файл кладём прямо в MEDIA_ROOT сервера (STUDYHUB_MEDIA_ROOT копии)
+        name = f'materials/asgi-{tag}.bin'
+        path = os.path.join(workdir, 'media', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(options['file_size'] * 1024 * 1024))
+        material = Material.objects.create(module=module, title='Файл', description='-', file=name)
+
+        password = secrets.token_urlsafe(16)
+        hashed = make_password(password)
+        group = Group.objects.get(name=ROLE_PARTICIPANT)
+        users = Users.objects.bulk_create([
+            Users(username=f'asgi_{tag}_{i}', password=hashed) for i in range(options['concurrency'])
+        ])
+        Users.groups.through.objects.bulk_create([Users.groups.through(users_id=u.pk, group_id=group.pk) for u in users])
+        Enrollment.objects.bulk_create([Enrollment(user=u, program=program, is_approved=True) for u in users])
+        certificates = Certificate.objects.bulk_create([Certificate(user=u, program=program) for u in users])
+        connections.close_all()
+        return {
+            'program_id': program.pk,
+            'material_id': material.pk,
+            'password': password,
+            'users': [(u.username, c.pk) for u, c in zip(users, certificates)],
+        }
+
+    def run_clients(self, base_url, fixtures, options):
+        results = Results()
+        start_together = threading.Barrier(len(fixtures['users']))
+
+        def client(user):
+            username, certificate_id = user
+            session = Session(base_url, results)
+            session.login(username, fixtures['password'])
+            # Первый запрос рендерит PDF сертификата — в замер не входит, чтобы варианты были в равных условиях
+            session.get('warmup', f'/certificate/{certificate_id}/download/')
+            start_together.wait()
+            for _ in range(options['rounds']):
+                session.get('material_file', f"/materials/{fixtures['material_id']}/file/")
+                session.get('download_certificate', f'/certificate/{certificate_id}/download/')
+                session.post('add_to_favorites', '/favorites/add/', {'program_id': fixtures['program_id']})
+
+        self.stdout.write(
+            f"Клиентов: {len(fixtures['users'])}, кругов: {options['rounds']}, воркеров: {options['workers']}"
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(fixtures['users'])) as pool:
+            list(pool.map(client, fixtures['users']))
+        # Вход и прогрев в замер не входят
+        for endpoint in ('login (GET)', 'login (POST)', 'warmup'):
+            results.samples.pop(endpoint, None)
+        return results, time.perf_counter() - start
+
+    def print_comparison(self, summaries):
+        if len(summaries) < 2:
+            return
+        self.stdout.write("\nСравнение (rps / p95 мс):")
+        names = list(summaries)
+        by_endpoint = {
+            name: {row['endpoint']: row for row in summary['endpoints']} for name, summary in summaries.items()
+        }
+        endpoints = sorted(set().union(*(rows.keys() for rows in by_endpoint.values())))
+        self.stdout.write(f"{'Эндпоинт':<24}" + ''.join(f"{name:>22}" for name in names))
+        for endpoint in endpoints:
+            cells = []
+            for name in names:
+                row = by_endpoint[name].get(endpoint)
+                cells.append(f"{row['rps']:>9} / {row['p95_ms']:>8}" + (' !' if row['errors'] else '  ') if row else '-')
+            self.stdout.write(f"{endpoint:<24}" + ''.join(f"{cell:>22}" for cell in cells))
+        self.stdout.write(
+            f"{'всего, с':<24}" + ''.join(f"{summaries[name]['elapsed_s']:>22}" for name in names)
+        )
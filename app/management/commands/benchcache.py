@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from app.sqlite_cache import SQLiteCache
+
+KEYS = 1000
+
+
+def _backends(workdir):
+    params = {'TIMEOUT': 600, 'OPTIONS': {'MAX_ENTRIES': KEYS * 10}}
+    return {
+        'locmem': lambda: LocMemCache('benchcache', params),
+        'filebased': lambda: FileBasedCache(os.path.join(workdir, 'filebased'), params),
+        'sqlite': lambda: SQLiteCache(os.path.join(workdir, 'cache.sqlite3'), params),
+    }
+
+
+def _timed(func, operations):
+    """Микросекунд на операцию (медиана из трёх прогонов)."""
+    runs = []
+    for _ in range(3):
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1e6 / operations)
+    return statistics.median(runs)
+
+
+def _mixed_worker(factory, operations, value, seed, barrier, results):
+    # 90% чтений и 10% записей по общему набору ключей
+    cache = factory()
+    rnd = random.Random(seed)
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(operations):
+        key = f'key:{rnd.randrange(KEYS)}'
+        if rnd.random() < 0.1:
+            cache.set(key, value)
+        else:
+            cache.get(key)
+    results.put(time.perf_counter() - start)
+
+
+def _incr_worker(factory, operations, barrier):
+    cache = factory()
+    barrier.wait()
+    for _ in range(operations):
+        cache.incr('counter')
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает бэкенды кэша (LocMemCache, FileBasedCache, app.sqlite_cache.SQLiteCache): "
+        "время операций в одном процессе, смешанную нагрузку и согласованность incr в нескольких"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000, help='Операций на замер')
+        parser.add_argument('--processes', type=int, default=4, help='Процессов для общей нагрузки')
+        parser.add_argument('--value-size', type=int, default=2000,
+                            help='Размер значения в байтах (примерно фрагмент каталога)')
+        parser.add_argument('--backends', nargs='+', choices=['locmem', 'filebased', 'sqlite'],
+                            default=['locmem', 'filebased', 'sqlite'])
+
+    def handle(self, *args, **options):
+        operations, processes = options['operations'], options['processes']
+        value = 'x' * options['value_size']
+        context = multiprocessing.get_context('fork')
+
+        with tempfile.TemporaryDirectory(prefix='studyhub-benchcache-') as workdir:
+            factories = _backends(workdir)
+            self.stdout.write(
+                f"{'бэкенд':<10} {'get':>8} {'get miss':>9} {'set':>8} {'incr':>8} {'get_many':>9}   "
+                f"{processes} проц.: {'ops/s':>8}  incr {'итог':>6}/{'ожид.':<6}"
+            )
+            for name in options['backends']:
+                factory = factories[name]
+                cache = factory()
+                cache.clear()
+                keys = [f'key:{i}' for i in range(KEYS)]
+                cache.set_many({key: value for key in keys})
+                cache.set('counter', 0)
+
+                timings = {
+                    'get': _timed(lambda: [cache.get(keys[i % KEYS]) for i in range(operations)], operations),
+                    'miss': _timed(lambda: [cache.get(f'missing:{i}') for i in range(operations)], operations),
+                    'set': _timed(lambda: [cache.set(keys[i % KEYS], value) for i in range(operations)], operations),
+                    'incr': _timed(lambda: [cache.incr('counter') for _ in range(operations)], operations),
+                    'get_many': _timed(
+                        lambda: [cache.get_many(keys[i % (KEYS - 10):][:10]) for i in range(operations // 10)],
+                        operations // 10,
+                    ),
+                }
+
+                # Общая нагрузка: воркеры как у gunicorn, каждый со своим экземпляром бэкенда
+                barrier, results = context.Barrier(processes), context.Queue()
+                workers = [
+                    context.Process(target=_mixed_worker, args=(factory, operations, value, seed, barrier, results))
+                    for seed in range(processes)
+                ]
+                elapsed = self.run_workers(workers, results)
+                throughput = processes * operations / elapsed
+
+                # Счётчик версий: каждый воркер увеличивает один и тот же ключ
+                cache.set('counter', 0)
+                barrier = context.Barrier(processes)
+                self.run_workers([
+                    context.Process(target=_incr_worker, args=(factory, operations, barrier))
+                    for _ in range(processes)
+                ])
+                counted = cache.get('counter')
+                expected = processes * operations
+                line = (
+                    f"{name:<10} {timings['get']:>6.1f}мкс {timings['miss']:>7.1f}мкс {timings['set']:>6.1f}мкс "
+                    f"{timings['incr']:>6.1f}мкс {timings['get_many']:>7.1f}мкс   "
+                    f"{'':>{len(str(processes)) + 8}}{throughput:>8.0f}  incr {counted:>6}/{expected:<6}"
+                )
+                self.stdout.write(self.style.SUCCESS(line) if counted == expected else self.style.WARNING(line))
+
+        self.stdout.write(
+            "incr: итог меньше ожидаемого — процессы не видят общих данных (LocMemCache) "
+            "или теряют обновления (FileBasedCache: get + set без блокировки)."
+        )
+
+    def run_workers(self, workers, results=None):
+        for worker in workers:
+            worker.start()
+        # Очередь читаем до join, иначе процесс с неотправленными данными не завершится
+        elapsed = max(results.get() for _ in workers) if results is not None else None
+        for worker in workers:
+            worker.join()
+        return elapsed
@@ -0,0 +1,196 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from app import metrics, urls
+from app.models import (
+    Assignment, AssignmentSubmission, Certificate, Enrollment, Material, Program, Section, Users
+)
+from app.roles import ROLE_ADMIN, ROLE_CURATOR, ROLE_PARTICIPANT
+
+ROLES = {'participant': ROLE_PARTICIPANT, 'curator': ROLE_CURATOR, 'admin': ROLE_ADMIN}
+
+# Меняют данные на GET или принимают только POST — в замер не входят
+SKIP = {
+    'logout', 'enroll', 'mark_material_viewed', 'enrollment_toggle_approval', 'add_to_favorites',
+    'program_delete', 'assignment_delete', 'material_delete', 'section_delete',
+    'submissions_bulk_review', 'enrollments_bulk',
+    'upload_start', 'upload_status', 'upload_chunk', 'upload_finish',
+    # Файлов у синтетических материалов нет
+    'material_file',
+}
+
+
+def _participant_objects(user, model):
+    sections = Enrollment.objects.filter(user=user, is_approved=True).values('program__section_id')
+    return model.objects.filter(module__section_id__in=sections)
+
+
+def _sample_object(url_name, user):
+    """Объект для URL с параметром: тот, что пользователь этой роли реально открыл бы."""
+    if url_name in ('program_detail', 'program_edit'):
+        curated = Program.objects.filter(curators=user)
+        return (curated if curated.exists() else Program.objects).order_by('pk').first()
+    if url_name in ('assignment_detail', 'submit_assignment', 'assignment_edit'):
+        return _participant_objects(user, Assignment).order_by('pk').first() or Assignment.objects.order_by('pk').first()
+    if url_name in ('material_detail', 'material_edit'):
+        return _participant_objects(user, Material).order_by('pk').first() or Material.objects.order_by('pk').first()
+    if url_name == 'review_submission':
+        return AssignmentSubmission.objects.filter(status='submitted').order_by('pk').first()
+    if url_name == 'section_edit':
+        return Section.objects.order_by('pk').first()
+    if url_name == 'download_certificate':
+        return Certificate.objects.filter(user=user).order_by('pk').first()
+    return None
+
+
+def _resolve(pattern, user):
+    """Путь для URL-шаблона или None, если подходящего объекта нет."""
+    url_name = pattern.name
+    params = list(pattern.pattern.converters)
+    if not params:
+        return reverse(url_name)
+    obj = _sample_object(url_name, user)
+    if obj is None or len(params) != 1:
+        return None
+    return reverse(url_name, kwargs={params[0]: obj.pk})
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время ответа и число SQL-запросов всех GET-страниц app/urls.py "
+        "для каждой роли и пишет результат в JSON (для сравнения между коммитами)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Замеров на URL')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на URL')
+        parser.add_argument('--roles', nargs='+', choices=sorted(ROLES), default=sorted(ROLES))
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help='Только эти имена URL')
+        parser.add_argument('--user', action='append', default=[], metavar='ROLE=USERNAME',
+                            help='Пользователь для роли (по умолчанию — первый с этой ролью)')
+        parser.add_argument('--output', help='Файл для результатов JSON')
+        parser.add_argument('--compare', help='JSON предыдущего запуска для сравнения')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Изменение медианы в %%, начиная с которого оно показывается')
+
+    def handle(self, *args, **options):
+        users = self.pick_users(options['roles'], options['user'])
+        patterns = [
+            p for p in urls.urlpatterns
+            if isinstance(p, URLPattern) and p.name not in SKIP
+            and (not options['only'] or p.name in options['only'])
+        ]
+
+        results = []
+        for role, user in users.items():
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            for pattern in patterns:
+                path = _resolve(pattern, user)
+                if path is None:
+                    continue
+                results.append(self.measure(client, role, pattern.name, path, options['repeat'], options['warmup']))
+                self.report_line(results[-1])
+
+        data = {
+            'revision': _git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'counts': {
+                'users': Users.objects.count(),
+                'programs': Program.objects.count(),
+                'assignments': Assignment.objects.count(),
+                'submissions': AssignmentSubmission.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты записаны в {options['output']}"))
+        if options['compare']:
+            self.compare(options['compare'], results, options['threshold'])
+
+    def pick_users(self, roles, overrides):
+        chosen = dict(item.split('=', 1) for item in overrides if '=' in item)
+        users = {}
+        for role in roles:
+            if role in chosen:
+                user = Users.objects.filter(username=chosen[role]).first()
+            else:
+                # Группа «Пользователь» есть у всех, поэтому берём того, у кого нет ролей «выше»
+                higher = list(ROLES.values())[list(ROLES).index(role) + 1:]
+                user = (
+                    Users.objects.filter(groups__name=ROLES[role])
+                    .exclude(groups__name__in=higher).order_by('pk').first()
+                )
+            if user is None:
+                raise CommandError(f"Нет пользователя с ролью {role} (см. generatedata или --user {role}=логин)")
+            users[role] = user
+        return users
+
+    def measure(self, client, role, url_name, path, repeat, warmup):
+        for _ in range(warmup):
+            client.get(path)
+        timings, queries, status = [], 0, None
+        for _ in range(repeat):
+            recorder = metrics.QueryRecorder()
+            with recorder.attach():
+                start = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries, status = recorder.count, response.status_code
+        timings.sort()
+        return {
+            'role': role,
+            'url_name': url_name,
+            'path': path,
+            'status': status,
+            'queries': queries,
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'min_ms': round(timings[0], 2),
+        }
+
+    def report_line(self, row):
+        self.stdout.write(
+            f"{row['role']:<12} {row['url_name']:<24} {row['status']:>4} "
+            f"{row['queries']:>4} SQL  медиана {row['median_ms']:>8} мс  p95 {row['p95_ms']:>8} мс"
+        )
+
+    def compare(self, baseline_path, results, threshold):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = {(row['role'], row['url_name']): row for row in json.load(f)['results']}
+        self.stdout.write(f"\nСравнение с {baseline_path}:")
+        changed = False
+        for row in results:
+            before = baseline.get((row['role'], row['url_name']))
+            if before is None:
+                continue
+            delta = (row['median_ms'] - before['median_ms']) * 100 / before['median_ms'] if before['median_ms'] else 0
+            if abs(delta) < threshold and row['queries'] == before['queries']:
+                continue
+            changed = True
+            line = (
+                f"{row['role']:<12} {row['url_name']:<24} {before['median_ms']:>8} → {row['median_ms']:>8} мс "
+                f"({delta:+.0f}%), SQL {before['queries']} → {row['queries']}"
+            )
+            worse = delta > 0 or row['queries'] > before['queries']
+            self.stdout.write(self.style.ERROR(line) if worse else self.style.SUCCESS(line))
+        if not changed:
+            self.stdout.write(f"Изменений больше {threshold}% нет.")
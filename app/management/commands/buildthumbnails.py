@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app import thumbnails
+from app.models import Program
+
+
+class Command(BaseCommand):
+    help = "Создаёт уменьшенные копии изображений сертификатов программ (WebP и JPEG)"
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        programs = Program.objects.exclude(certificate_image='').exclude(certificate_image__isnull=True)
+        for program in programs.only('pk', 'certificate_image').iterator():
+            if thumbnails.generate(program.certificate_image) is None:
+                failed += 1
+                self.stderr.write(f"Программа {program.pk}: не удалось прочитать {program.certificate_image.name}")
+            else:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Изображений обработано: {built}, с ошибками: {failed}"))
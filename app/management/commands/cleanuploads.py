@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.uploads import cleanup_stale
+
+
+class Command(BaseCommand):
+    help = "Удаляет брошенные загрузки файлов частями"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, help='Возраст загрузки без изменений, ч (по умолчанию CHUNKED_UPLOAD_EXPIRE_HOURS)')
+
+    def handle(self, *args, **options):
+        count = cleanup_stale(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f"Удалено загрузок: {count}"))
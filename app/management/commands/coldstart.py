@@ -0,0 +1,115 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Тяжёлые зависимости, которые нужны лишь отдельным запросам (PDF, нарезка изображений)
+DEFERRED = ['reportlab.pdfgen.canvas', 'transliterate', 'PIL.Image']
+
+# Выполняется в отдельном процессе — так же, как gunicorn поднимает новый воркер
+PROBE = '''
+import json, os, sys, time
+
+def ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+mode, paths, deferred = sys.argv[1], json.loads(sys.argv[2]), json.loads(sys.argv[3])
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studyhub.settings')
+from studyhub.wsgi import application
+result = {'load_ms': ms(started), 'loaded': [name for name in deferred if name in sys.modules]}
+
+result['warmup_ms'] = 0
+if mode == 'warm':
+    from app.warmup import warm_up
+    since = time.perf_counter()
+    warm_up()
+    result['warmup_ms'] = ms(since)
+
+from django.test import Client
+client = Client(HTTP_HOST='localhost')
+result['first'] = {}
+for path in paths:
+    since = time.perf_counter()
+    status = client.get(path).status_code
+    result['first'][path] = ms(since)
+    if status >= 500:
+        sys.exit(f'{path}: {status}')
+since = time.perf_counter()
+client.get(paths[0])
+result['repeat_ms'] = ms(since)
+
+since = time.perf_counter()
+for name in deferred:
+    __import__(name)
+result['deferred_ms'] = ms(since)
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Отчёт о холодном старте воркера: время загрузки приложения, прогрева "
+        "(app.warmup) и первых запросов в новом процессе — с прогревом и без"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Процессов на каждый режим')
+        parser.add_argument('--paths', nargs='+', default=['/login/', '/', '/register/'],
+                            help='Первые запросы нового воркера (без входа)')
+        parser.add_argument('--output', help='Файл для результатов JSON')
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        # Первый процесс заполняет кэш фрагментов и кэш ОС — в замер не входит
+        self.probe('cold', paths)
+        runs = {'cold': [], 'warm': []}
+        for _ in range(options['runs']):
+            for mode in runs:
+                runs[mode].append(self.probe(mode, paths))
+
+        report = {mode: self.median(results, paths) for mode, results in runs.items()}
+        loaded = sorted({name for results in runs.values() for r in results for name in r['loaded']})
+
+        self.stdout.write(f"Процессов на режим: {options['runs']}, медианы в мс\n")
+        self.stdout.write(f"{'':<28}{'без прогрева':>14}{'с прогревом':>14}")
+        rows = [('загрузка приложения', 'load_ms'), ('прогрев', 'warmup_ms')]
+        rows += [(f'первый {path}', path) for path in paths]
+        rows += [(f'повторный {paths[0]}', 'repeat_ms'), ('первые запросы, всего', 'first_total_ms')]
+        for label, key in rows:
+            self.stdout.write(f"{label:<28}{report['cold'][key]:>14}{report['warm'][key]:>14}")
+        self.stdout.write(
+            f"\nОтложенные импорты ({', '.join(DEFERRED)}): {report['cold']['deferred_ms']} мс — "
+            "их платит первый запрос, которому они нужны, а не каждый воркер при старте."
+        )
+        if loaded:
+            self.stdout.write(self.style.WARNING(f"Загружены при старте: {', '.join(loaded)}"))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'runs': options['runs'], 'paths': paths, 'loaded_at_start': loaded, **report},
+                          f, ensure_ascii=False, indent=2)
+
+    def probe(self, mode, paths):
+        process = subprocess.run(
+            [sys.executable, '-c', PROBE, mode, json.dumps(paths), json.dumps(DEFERRED)],
+            cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'studyhub.settings'},
+            capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"Замер ({mode}) завершился с ошибкой:\n{process.stderr}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def median(self, results, paths):
+        row = {
+            key: round(statistics.median(r[key] for r in results), 1)
+            for key in ('load_ms', 'warmup_ms', 'repeat_ms', 'deferred_ms')
+        }
+        for path in paths:
+            row[path] = round(statistics.median(r['first'][path] for r in results), 1)
+        # Сколько ждут первые клиенты нового воркера (прогрев идёт до приёма запросов)
+        row['first_total_ms'] = round(statistics.median(sum(r['first'].values()) for r in results), 1)
+        return row
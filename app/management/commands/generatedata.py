@@ -0,0 +1,206 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app import fragments, progress, search, stats
+from app.models import (
+    Assignment, AssignmentSubmission, Enrollment, Material, MaterialProgress, Module, Program, Section, Users
+)
+from app.roles import ROLE_ADMIN, ROLE_CURATOR, ROLE_PARTICIPANT
+
+DEFAULT_PASSWORD = 'benchmark'
+
+STATUS_WEIGHTS = (('accepted', 5), ('submitted', 3), ('rejected', 2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими данными для замеров производительности. "
+        "Запускайте на копии базы: данные не удаляются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--programs', type=int, default=1_000)
+        parser.add_argument('--assignments', type=int, default=10_000)
+        parser.add_argument('--materials', type=int, default=10_000)
+        parser.add_argument('--submissions', type=int, default=1_000_000)
+        parser.add_argument('--material-views', type=int, default=1_000_000)
+        parser.add_argument('--scale', type=float, default=1.0, help='Множитель для всех объёмов, например 0.01')
+        parser.add_argument('--prefix', default='gen', help='Префикс логинов и названий')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Пароль всех созданных пользователей')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self.counts = {
+            name: max(1, int(options[name] * scale))
+            for name in ('users', 'programs', 'assignments', 'materials', 'submissions', 'material_views')
+        }
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.now = timezone.now()
+
+        if Users.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(f"Пользователи с префиксом «{self.prefix}_» уже есть — укажите другой --prefix")
+
+        call_command('initroles', stdout=self.stdout)
+        with transaction.atomic():
+            self.create_catalog()
+            self.create_users(make_password(options['password']))
+            self.create_enrollments()
+            self.create_submissions()
+            self.create_material_views()
+
+        # bulk_create обходит сигналы — производные данные пересчитываются пакетно
+        self.stdout.write("Пересчёт прогресса...")
+        for start in range(0, len(self.participant_ids), self.batch_size):
+            chunk = self.participant_ids[start:start + self.batch_size]
+            progress.rebuild_progress(Enrollment.objects.filter(user_id__in=chunk))
+        self.stdout.write("Пересборка поискового индекса и статистики...")
+        search.rebuild()
+        stats.backfill()
+        # bulk_create сигналов не шлёт — сбрасываем кэш фрагментов каталога целиком
+        fragments.bump(*fragments.ALL)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Готово: " + ", ".join(f"{name}={count}" for name, count in self.counts.items())
+            + f". Пароль пользователей: {options['password']}"
+        ))
+
+    def past(self, days=90):
+        return self.now - timedelta(seconds=self.random.randint(0, days * 86400))
+
+    def bulk(self, model, objects):
+        """bulk_create пачками из итератора, не держа всё в памяти; возвращает созданные pk."""
+        ids, batch = [], []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                ids += [o.pk for o in model.objects.bulk_create(batch)]
+                batch = []
+        if batch:
+            ids += [o.pk for o in model.objects.bulk_create(batch)]
+        self.stdout.write(f"  {model.__name__}: {len(ids)}")
+        return ids
+
+    def create_catalog(self):
+        programs = self.counts['programs']
+        section_ids = self.bulk(Section, (
+            Section(name=f'{self.prefix} раздел {i}', description='Синтетический раздел для замеров')
+            for i in range(max(1, programs // 5))
+        ))
+        module_ids = self.bulk(Module, (
+            Module(name=f'{self.prefix} модуль {i}', description='Синтетический модуль', section_id=section_id)
+            for i, section_id in enumerate(section_ids * 2)
+        ))
+        self.program_ids = self.bulk(Program, (
+            Program(
+                name=f'{self.prefix} программа {i}',
+                description='Программа повышения квалификации по программированию и анализу данных',
+                goal='Освоить профессиональные навыки',
+                skills='Python, SQL, Django',
+                section_id=self.random.choice(section_ids),
+            )
+            for i in range(programs)
+        ))
+        self.program_section = dict(Program.objects.filter(pk__in=self.program_ids).values_list('pk', 'section_id'))
+        module_section = dict(Module.objects.filter(pk__in=module_ids).values_list('pk', 'section_id'))
+
+        self.section_assignments, self.section_materials = {}, {}
+        modules = list(module_section)
+        assignment_modules = [self.random.choice(modules) for _ in range(self.counts['assignments'])]
+        for assignment_id, module_id in zip(self.bulk(Assignment, (
+            Assignment(module_id=module_id, title=f'Задание {i}', description='Выполните упражнение')
+            for i, module_id in enumerate(assignment_modules)
+        )), assignment_modules):
+            self.section_assignments.setdefault(module_section[module_id], []).append(assignment_id)
+
+        material_modules = [self.random.choice(modules) for _ in range(self.counts['materials'])]
+        for material_id, module_id in zip(self.bulk(Material, (
+            Material(module_id=module_id, title=f'Материал {i}', description='Лекция', file='materials/generated.pdf')
+            for i, module_id in enumerate(material_modules)
+        )), material_modules):
+            self.section_materials.setdefault(module_section[module_id], []).append(material_id)
+
+    def create_users(self, password):
+        total = self.counts['users']
+        curators = max(1, total // 100)
+        admins = max(1, min(5, total // 1000))
+        roles = [ROLE_ADMIN] * admins + [ROLE_CURATOR] * curators + [ROLE_PARTICIPANT] * (total - admins - curators)
+        user_ids = self.bulk(Users, (
+            Users(
+                username=f'{self.prefix}_{role_index}_{i}',
+                password=password,
+                first_name=f'Имя{i}', last_name=f'Фамилия{i}',
+            )
+            for i, role_index in enumerate(
+                {ROLE_ADMIN: 'admin', ROLE_CURATOR: 'curator', ROLE_PARTICIPANT: 'student'}[role] for role in roles
+            )
+        ))
+        groups = dict(Group.objects.filter(name__in=set(roles)).values_list('name', 'pk'))
+        self.bulk(Users.groups.through, (
+            Users.groups.through(users_id=user_id, group_id=groups[role]) for user_id, role in zip(user_ids, roles)
+        ))
+        self.participant_ids = [user_id for user_id, role in zip(user_ids, roles) if role == ROLE_PARTICIPANT]
+        curator_ids = [user_id for user_id, role in zip(user_ids, roles) if role == ROLE_CURATOR]
+        self.bulk(Program.curators.through, (
+            Program.curators.through(program_id=program_id, users_id=curator_id)
+            for program_id in self.program_ids
+            for curator_id in self.random.sample(curator_ids, min(2, len(curator_ids)))
+        ))
+
+    def create_enrollments(self):
+        self.user_sections = {}
+
+        def enrollments():
+            for user_id in self.participant_ids:
+                for program_id in self.random.sample(self.program_ids, min(len(self.program_ids), self.random.randint(1, 3))):
+                    approved = self.random.random() < 0.8
+                    if approved:
+                        self.user_sections.setdefault(user_id, set()).add(self.program_section[program_id])
+                    yield Enrollment(user_id=user_id, program_id=program_id, is_approved=approved, created_at=self.past())
+
+        self.bulk(Enrollment, enrollments())
+
+    def _per_user(self, target, pool_by_section):
+        """Равномерно раскидать target объектов по пользователям: (user_id, id объекта из разделов пользователя)."""
+        users = list(self.user_sections)
+        if not users:
+            return
+        quota = max(1, target // len(users))
+        produced = 0
+        for user_id in users:
+            pool = [pk for section_id in self.user_sections[user_id] for pk in pool_by_section.get(section_id, ())]
+            for object_id in self.random.sample(pool, min(quota, len(pool), target - produced)):
+                produced += 1
+                yield user_id, object_id
+            if produced >= target:
+                return
+
+    def create_submissions(self):
+        statuses = [status for status, weight in STATUS_WEIGHTS for _ in range(weight)]
+
+        def submissions():
+            for user_id, assignment_id in self._per_user(self.counts['submissions'], self.section_assignments):
+                status = self.random.choice(statuses)
+                yield AssignmentSubmission(
+                    user_id=user_id, assignment_id=assignment_id, answer_text='Ответ',
+                    status=status, reviewed_at=self.past(30) if status != 'submitted' else None,
+                )
+
+        self.bulk(AssignmentSubmission, submissions())
+
+    def create_material_views(self):
+        self.bulk(MaterialProgress, (
+            MaterialProgress(user_id=user_id, material_id=material_id, viewed_at=self.past())
+            for user_id, material_id in self._per_user(self.counts['material_views'], self.section_materials)
+        ))
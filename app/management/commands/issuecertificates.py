@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app import certificates, progress, writes
+from app.models import Certificate, Enrollment, ProgramProgress
+
+
+def _render_batch(rows):
+    # Выполняется в дочернем процессе: только ReportLab и хранилище, без базы
+    return [
+        (pk, certificates.render_to_storage(key, username, program_name))
+        for pk, key, username, program_name in rows
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Выдаёт недостающие сертификаты всем, кто завершил программу, и рендерит "
+        "их PDF в пуле процессов. Повторный запуск продолжает с того же места."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--program', type=int, action='append', dest='programs', metavar='ID',
+                            help='Только эти программы (можно несколько раз)')
+        parser.add_argument('--rebuild-progress', action='store_true',
+                            help='Сначала пересчитать прогресс с нуля (после импорта оценок или смены правил)')
+        parser.add_argument('--no-render', action='store_true', help='Только создать записи, без PDF')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=100, help='Сертификатов на одну задачу пула')
+
+    def handle(self, *args, **options):
+        programs = options['programs']
+        if options['rebuild_progress']:
+            self.rebuild_progress(programs)
+
+        completed = ProgramProgress.objects.all()
+        if programs:
+            completed = completed.filter(program_id__in=programs)
+        issued = writes.atomic_with_retry(progress.issue_certificates, completed, render=False)
+        self.stdout.write(f"Выдано новых сертификатов: {issued}")
+
+        if options['no_render']:
+            return
+        pending = self.pending_files(programs)
+        self.stdout.write(f"PDF к рендеру: {len(pending)}")
+        if pending:
+            self.render(pending, options['workers'], options['batch_size'])
+
+    def rebuild_progress(self, programs, chunk_size=5000):
+        enrollments = Enrollment.objects.filter(is_approved=True)
+        if programs:
+            enrollments = enrollments.filter(program_id__in=programs)
+        user_ids = list(enrollments.values_list('user_id', flat=True).distinct().order_by('user_id'))
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = enrollments.filter(user_id__in=user_ids[start:start + chunk_size])
+            # Сертификаты выдаёт (и считает) issue_certificates в handle
+            writes.atomic_with_retry(progress.rebuild_progress, chunk, issue=False)
+        self.stdout.write(f"Прогресс пересчитан для пользователей: {len(user_ids)}")
+
+    def pending_files(self, programs):
+        """Сертификаты без актуального PDF: ключ сменился (имя, программа, шаблон) или файла нет."""
+        rows = Certificate.objects.all()
+        if programs:
+            rows = rows.filter(program_id__in=programs)
+        pending = []
+        for pk, username, program_name, name in (
+            rows.values_list('pk', 'user__username', 'program__name', 'file').iterator(chunk_size=2000)
+        ):
+            key = certificates.certificate_key(username, program_name)
+            if not (name and name.startswith(f'{certificates.CERTIFICATE_PDF_DIR}/{key}/')
+                    and default_storage.exists(name)):
+                pending.append((pk, key, username, program_name))
+        return pending
+
+    def render(self, pending, workers, batch_size):
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        # Дочерние процессы не должны унаследовать открытые соединения с базой
+        connections.close_all()
+        started = last_report = time.monotonic()
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(_render_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                names = dict(future.result())
+                writes.atomic_with_retry(certificates.attach_files, names)
+                done += len(names)
+                now = time.monotonic()
+                if now - last_report >= 1 or done == len(pending):
+                    last_report = now
+                    self.stdout.write(
+                        f"  {done}/{len(pending)} ({done * 100 // len(pending)}%), "
+                        f"{done / (now - started):.0f} PDF/с"
+                    )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Отрендерено {done} PDF за {elapsed:.1f} с ({done / elapsed:.0f} PDF/с, процессов: {workers})"
+        ))
@@ -0,0 +1,384 @@
+import json
+import os
+import re
+import secrets
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.models import Assignment, AssignmentSubmission, Certificate, Enrollment, Module, Program, Section, Users
+from app.roles import ROLE_CURATOR, ROLE_PARTICIPANT
+
+SERVERS = ['gunicorn', 'uvicorn', 'runserver']
+LOCKED_MARKER = b'database is locked'
+_REVIEW_LINK = re.compile(rb'/submissions/(\d+)/review/')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Results:
+    """Замеры по эндпоинтам, общие для всех потоков."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, endpoint, seconds, status, locked, unexpected=False):
+        with self.lock:
+            self.samples[endpoint].append((seconds, status, locked, unexpected))
+
+    def summary(self, elapsed):
+        rows = []
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [s[0] * 1000 for s in samples]
+            errors = sum(
+                1 for _, status, locked, unexpected in samples
+                if status is None or status >= 500 or locked or unexpected
+            )
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': round(errors * 100 / len(samples), 2),
+                'locked': sum(1 for s in samples if s[2]),
+                'rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 0.50), 1),
+                'p95_ms': round(percentile(latencies, 0.95), 1),
+                'p99_ms': round(percentile(latencies, 0.99), 1),
+            })
+        return rows
+
+
+class Session:
+    """HTTP-сессия одного пользователя: cookies, CSRF и замер каждого запроса."""
+
+    def __init__(self, base_url, results):
+        self.base_url = base_url
+        self.results = results
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    @property
+    def csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def request(self, endpoint, path, data=None, content_type=None, expect=None):
+        headers = {'Referer': self.base_url + path}
+        if data is not None:
+            headers['X-CSRFToken'] = self.csrf_token
+            headers['Content-Type'] = content_type or 'application/x-www-form-urlencoded'
+        request = Request(self.base_url + path, data=data, headers=headers, method='POST' if data is not None else 'GET')
+        start = time.perf_counter()
+        status, body = None, b''
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                status, body = response.status, response.read()
+        except HTTPError as exc:
+            status, body = exc.code, exc.read()
+        except (URLError, OSError):
+            pass
+        self.results.add(
+            endpoint, time.perf_counter() - start, status, LOCKED_MARKER in body,
+            unexpected=expect is not None and status != expect,
+        )
+        return status, body
+
+    def get(self, endpoint, path):
+        return self.request(endpoint, path)
+
+    def post(self, endpoint, path, fields, expect=None):
+        fields = {**fields, 'csrfmiddlewaretoken': self.csrf_token}
+        return self.request(endpoint, path, urlencode(fields).encode(), expect=expect)
+
+    def post_multipart(self, endpoint, path, fields, files):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in {**fields, 'csrfmiddlewaretoken': self.csrf_token}.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, (filename, content) in files.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self.request(endpoint, path, b''.join(parts), f'multipart/form-data; boundary={boundary}')
+
+    def login(self, username, password):
+        self.get('login (GET)', '/login/')
+        status, _ = self.post('login (POST)', '/login/', {'username': username, 'password': password})
+        return status == 302
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест «дедлайна»: поднимает локальный сервер на копии базы, "
+        "N участников одновременно сдают задания с файлами, кураторы параллельно проверяют. "
+        "Выводит пропускную способность, p50/p95/p99 и долю ошибок по эндпоинтам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--curators', type=int, default=3)
+        parser.add_argument('--assignments', type=int, default=3, help='Заданий на участника')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременно работающих участников')
+        parser.add_argument('--file-size', type=int, default=256, help='Размер файла ответа, КБ')
+        parser.add_argument('--server', choices=SERVERS, default='gunicorn',
+                            help='gunicorn — WSGI, uvicorn — ASGI (gunicorn с UvicornWorker)')
+        parser.add_argument('--workers', type=int, default=3, help='Воркеров gunicorn')
+        parser.add_argument('--port', type=int, default=0, help='Порт сервера (0 — любой свободный)')
+        parser.add_argument('--url', help='Не поднимать сервер, а бить по уже запущенному (база — текущая)')
+        parser.add_argument('--yes', action='store_true',
+                            help='Подтвердить запись тестовых данных в текущую базу при --url (только при DEBUG)')
+        parser.add_argument('--keep-database', action='store_true', help='Не удалять копию базы после теста')
+        parser.add_argument('--output', help='Файл для результатов JSON')
+
+    def handle(self, *args, **options):
+        if options['url'] and not (options['yes'] and settings.DEBUG):
+            # Данные теста пишутся прямо в базу запущенного сервера
+            raise CommandError(
+                "С --url участники, кураторы и ответы создаются в текущей базе. "
+                "Это разрешено только при DEBUG = True и с флагом --yes."
+            )
+        workdir = tempfile.mkdtemp(prefix='loadtest-')
+        server = None
+        # Пароль известен только этому процессу; по нему входят клиенты теста
+        password = secrets.token_urlsafe(16)
+        tag = uuid.uuid4().hex[:6]
+        try:
+            if options['url']:
+                base_url = options['url'].rstrip('/')
+            else:
+                database = self.copy_database(workdir)
+                port = options['port'] or self.free_port()
+                base_url = f'http://localhost:{port}'  # localhost есть в ALLOWED_HOSTS
+                server = self.start_server(options, database, port, workdir)
+                self.wait_for(base_url, server)
+
+            students, curators, assignment_ids = self.create_fixtures(options, tag, password)
+            results, elapsed = self.run(base_url, students, curators, assignment_ids, password, options)
+        finally:
+            if options['url']:
+                self.delete_fixtures(tag)
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+            if not options['keep_database']:
+                shutil.rmtree(workdir, ignore_errors=True)
+            else:
+                self.stdout.write(f"Копия базы и журнал сервера: {workdir}")
+
+        rows = results.summary(elapsed)
+        self.print_summary(rows, elapsed)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'options': {k: v for k, v in options.items() if k in (
+                    'students', 'curators', 'assignments', 'concurrency', 'file_size', 'server', 'workers',
+                )}, 'elapsed_s': round(elapsed, 2), 'endpoints': rows}, f, ensure_ascii=False, indent=2)
+
+    # 🗄 Окружение
+    def copy_database(self, workdir):
+        """Копия рабочей базы (sqlite backup API), на которую переключаются и сервер, и эта команда."""
+        source = connections['default'].settings_dict['NAME']
+        target = os.path.join(workdir, 'db.sqlite3')
+        with sqlite3.connect(str(source)) as src, sqlite3.connect(target) as dst:
+            src.backup(dst)
+        connections['default'].close()
+        connections['default'].settings_dict['NAME'] = target
+        return target
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(('localhost', 0))
+            return sock.getsockname()[1]
+
+    def start_server(self, options, database, port, workdir):
+        env = {
+            **os.environ,
+            'STUDYHUB_DB_PATH': database,
+            'STUDYHUB_MEDIA_ROOT': os.path.join(workdir, 'media'),
+            # Кэш фрагментов от рабочей базы не должен попасть в ответы копии
+            'STUDYHUB_CACHE_PATH': os.path.join(workdir, 'cache.sqlite3'),
+        }
+        if options['server'] == 'gunicorn':
+            command = [
+                sys.executable, '-m', 'gunicorn', 'studyhub.wsgi:application',
+                f'--bind=localhost:{port}', f"--workers={options['workers']}",
+            ]
+        elif options['server'] == 'uvicorn':
+            # Как в Dockerfile: под ASGI постоянные соединения не используются
+            env.setdefault('STUDYHUB_CONN_MAX_AGE', '0')
+            command = [
+                sys.executable, '-m', 'gunicorn', 'studyhub.asgi:application',
+                '--worker-class=uvicorn_worker.UvicornWorker',
+                f'--bind=localhost:{port}', f"--workers={options['workers']}",
+            ]
+        else:
+            command = [sys.executable, 'manage.py', 'runserver', f'localhost:{port}', '--noreload']
+        log = open(os.path.join(workdir, 'server.log'), 'wb')
+        self.stdout.write(f"Сервер: {' '.join(command[1:])}")
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    def wait_for(self, base_url, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Сервер завершился при запуске (см. --keep-database и server.log)")
+            try:
+                with build_opener().open(base_url + '/login/', timeout=2):
+                    return
+            except HTTPError as exc:
+                raise CommandError(f"Сервер ответил {exc.code} на /login/")
+            except (URLError, OSError):
+                time.sleep(0.2)
+        raise CommandError(f"Сервер не ответил за {timeout} с")
+
+    def create_fixtures(self, options, tag, password):
+        call_command('initroles', stdout=open(os.devnull, 'w'))
+        section = Section.objects.create(name=f'Нагрузочный тест {tag}', description='Нагрузочный тест')
+        program = Program.objects.create(
+            name=f'Нагрузочный тест {tag}', description='-', goal='-', skills='-', section=section,
+        )
+        module = Module.objects.create(name='Модуль', description='-', section=section)
+        assignment_ids = [
+            Assignment.objects.create(module=module, title=f'Задание {i}', description='-').pk
+            for i in range(options['assignments'])
+        ]
+
+        password = make_password(password)
+        groups = dict(Group.objects.values_list('name', 'pk'))
+        students = [f'load_{tag}_student_{i}' for i in range(options['students'])]
+        curators = [f'load_{tag}_curator_{i}' for i in range(options['curators'])]
+        created = Users.objects.bulk_create([Users(username=name, password=password) for name in students + curators])
+        Users.groups.through.objects.bulk_create(
+            [Users.groups.through(users_id=u.pk, group_id=groups[ROLE_PARTICIPANT]) for u in created[:len(students)]]
+            + [Users.groups.through(users_id=u.pk, group_id=groups[ROLE_CURATOR]) for u in created[len(students):]]
+        )
+        program.curators.add(*created[len(students):])
+        for user in created[:len(students)]:
+            Enrollment.objects.create(user=user, program=program, is_approved=True)
+        connections.close_all()
+        return students, curators, assignment_ids
+
+    def delete_fixtures(self, tag):
+        """Удалить всё, что создал тест с меткой tag, вместе с загруженными файлами."""
+        sections = Section.objects.filter(name=f'Нагрузочный тест {tag}')
+        for model, field, lookup in (
+            (AssignmentSubmission, 'answer_file', 'assignment__module__section__in'),
+            (Certificate, 'file', 'program__section__in'),
+        ):
+            for obj in model.objects.filter(**{lookup: sections}).exclude(**{field: ''}):
+                getattr(obj, field).delete(save=False)
+        # Программа, модуль, задания, заявки и ответы удаляются каскадом от раздела
+        sections.delete()
+        Users.objects.filter(username__startswith=f'load_{tag}_').delete()
+        self.stdout.write(f"Тестовые данные {tag} удалены")
+        connections.close_all()
+
+    # 🏃 Нагрузка
+    def run(self, base_url, students, curators, assignment_ids, password, options):
+        results = Results()
+        content = os.urandom(options['file_size'] * 1024)
+        students_done = threading.Event()
+
+        def student(username):
+            session = Session(base_url, results)
+            if not session.login(username, password):
+                return
+            for assignment_id in assignment_ids:
+                path = f'/assignments/{assignment_id}/'
+                session.get('assignment_detail (GET)', path)
+                session.post_multipart(
+                    'assignment_detail (POST)', path,
+                    {'answer_text': f'Ответ {username}'},
+                    {'answer_file': (f'{username}-{assignment_id}.bin', content)},
+                )
+
+        def curator(username, index):
+            session = Session(base_url, results)
+            if not session.login(username, password):
+                return
+            # Ответы, которые не удалось принять, больше не трогаем — иначе цикл не кончится
+            failed = set()
+            # Проверяем, пока участники сдают, и дочищаем очередь после
+            while True:
+                finished = students_done.is_set()
+                ids = []
+                # Только задания теста: чужие ответы в базе (реальные с --url или накопленные
+                # в копии) не принимаем и в замер не включаем
+                for assignment_id in assignment_ids:
+                    _, body = session.get('submissions_to_check', f'/submissions/?assignment={assignment_id}')
+                    ids += [
+                        pk for pk in _REVIEW_LINK.findall(body or b'')
+                        # Кураторы делят ответы по id, чтобы не проверять одно и то же дважды
+                        if pk not in failed and int(pk) % len(curators) == index
+                    ]
+                if not ids:
+                    if finished:
+                        return
+                    time.sleep(0.2)
+                    continue
+                for submission_id in ids[:5]:
+                    path = f'/submissions/{submission_id.decode()}/review/'
+                    session.get('review_submission (GET)', path)
+                    status, _ = session.post('review_submission (POST)', path, {'status': 'accepted'}, expect=302)
+                    if status != 302:
+                        failed.add(submission_id)
+
+        self.stdout.write(
+            f"Участников: {len(students)}, кураторов: {len(curators)}, заданий: {len(assignment_ids)}, "
+            f"параллельно: {options['concurrency']}"
+        )
+        start = time.perf_counter()
+        curator_threads = [
+            threading.Thread(target=curator, args=(name, index)) for index, name in enumerate(curators)
+        ]
+        for thread in curator_threads:
+            thread.start()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(student, students))
+        students_done.set()
+        for thread in curator_threads:
+            thread.join()
+        return results, time.perf_counter() - start
+
+    def print_summary(self, rows, elapsed):
+        self.stdout.write(f"\nДлительность: {elapsed:.1f} с")
+        self.stdout.write(
+            f"{'Эндпоинт':<28} {'запросов':>8} {'ошибок':>7} {'%':>6} {'locked':>7} {'rps':>7} "
+            f"{'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8}"
+        )
+        for row in rows:
+            line = (
+                f"{row['endpoint']:<28} {row['requests']:>8} {row['errors']:>7} {row['error_rate']:>6} "
+                f"{row['locked']:>7} {row['rps']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
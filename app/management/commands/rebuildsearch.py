@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс каталога (программы, разделы, кураторы)"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING("Таблица search_index недоступна (нужна SQLite с FTS5 и миграции)."))
+            return
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано документов: {count}"))
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from app import jobs, uploads
+from app import tasks  # noqa: F401 — регистрирует задачи
+
+
+class Command(BaseCommand):
+    help = "Запускает воркеры фоновых задач (очередь в таблице Job)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Число процессов-воркеров')
+        parser.add_argument('--threads', type=int, default=1, help='Число потоков в каждом процессе')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза при пустой очереди, с')
+        parser.add_argument('--burst', action='store_true', help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        jobs.requeue_stale()
+
+        if processes == 1:
+            run_worker_process(0, options)
+            return
+
+        children = [start_worker_process(n, options) for n in range(processes)]
+        stopping = threading.Event()
+
+        def forward(signum, frame):
+            stopping.set()
+            for child in children:
+                if child.is_alive():
+                    os.kill(child.pid, signum)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        # В --burst процессы выходят сами, когда очередь пуста; иначе упавший
+        # процесс (OOM, segfault, необработанная ошибка) заменяется новым
+        while not options['burst'] and not stopping.wait(options['poll_interval']):
+            for n, child in enumerate(children):
+                if child.exitcode is None or stopping.is_set():
+                    continue
+                self.stderr.write(f"Воркер {n} (pid {child.pid}) завершился с кодом {child.exitcode}, перезапуск")
+                children[n] = start_worker_process(n, options)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS("Воркеры остановлены."))
+
+
+def start_worker_process(number, options):
+    # Соединения с БД нельзя делить между процессами после fork
+    connections.close_all()
+    process = multiprocessing.Process(target=run_worker_process, args=(number, options), daemon=False)
+    process.start()
+    return process
+
+
+def run_worker_process(number, options):
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    threads = [
+        threading.Thread(
+            target=worker_loop,
+            # Зависшие задачи возвращает в очередь первый поток каждого процесса
+            args=(f'{socket.gethostname()}:{os.getpid()}:{number}.{n}', options, stop, n == 0),
+        )
+        for n in range(max(1, options['threads']))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # join с таймаутом, чтобы главный поток успевал обработать сигнал
+        while thread.is_alive():
+            thread.join(0.5)
+
+
+def worker_loop(worker_id, options, stop, sweep=False):
+    next_sweep = time.monotonic() + jobs.requeue_interval()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            if sweep and time.monotonic() >= next_sweep:
+                jobs.requeue_stale()
+                # Заодно убираем брошенные загрузки — иначе их .part лежат на диске до ручной чистки
+                uploads.cleanup_stale()
+                next_sweep = time.monotonic() + jobs.requeue_interval()
+            job = jobs.claim_next(worker_id)
+            if job is None:
+                if options['burst']:
+                    break
+                stop.wait(options['poll_interval'])
+                continue
+            jobs.run_job(job)
+    finally:
+        connections.close_all()
@@ -0,0 +1,45 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимает копию основной базы SQLite для реплики чтения (sqlite backup API). "
+        "Копия подменяется атомарно, читатели не видят недописанный файл."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='replica', help='Псевдоним реплики в DATABASES')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Повторять каждые N секунд (0 — один раз)')
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES['default']
+        target = settings.DATABASES.get(options['alias'])
+        if target is None:
+            raise CommandError(f"Реплика «{options['alias']}» не настроена (STUDYHUB_REPLICA_PATH)")
+        if not (source['ENGINE'].endswith('sqlite3') and target['ENGINE'].endswith('sqlite3')):
+            raise CommandError("Снимок делается только из SQLite в SQLite")
+
+        while True:
+            started = time.monotonic()
+            self.snapshot(str(source['NAME']), str(target['NAME']))
+            self.stdout.write(self.style.SUCCESS(
+                f"Снимок {target['NAME']} готов за {time.monotonic() - started:.2f} с"
+            ))
+            if not options['interval']:
+                return
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+
+    def snapshot(self, source_path, target_path):
+        tmp_path = f'{target_path}.tmp'
+        with sqlite3.connect(source_path, timeout=30) as src, sqlite3.connect(tmp_path) as dst:
+            # Постранично, чтобы не держать блокировку чтения на всё время копирования
+            src.backup(dst, pages=1024)
+            # Снимок без WAL: его открывают только на чтение
+            dst.execute('PRAGMA journal_mode=DELETE')
+        os.replace(tmp_path, target_path)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from app import metrics
+
+
+class Command(BaseCommand):
+    help = "Показывает представления с наибольшим числом SQL-запросов, временем в БД и шаблонах, повторами"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='За сколько последних часов')
+        parser.add_argument('--order', choices=sorted(metrics.REPORT_ORDERING), default='queries',
+                            help='Критерий сортировки')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--sql', action='store_true', help='Показать самый частый повторяющийся запрос')
+
+    def handle(self, *args, **options):
+        rows = metrics.report(options['hours'], options['order'], options['limit'])
+        if not rows:
+            self.stdout.write(self.style.WARNING("Замеров пока нет (METRICS_ENABLED, METRICS_SAMPLE_RATE)."))
+            return
+
+        self.stdout.write(
+            f"{'URL':<32} {'запросов':>8} {'SQL ср.':>8} {'SQL макс':>8} {'БД мс':>8} {'шабл. мс':>8} "
+            f"{'шабл.p95':>8} {'p50 мс':>8} {'p95 мс':>8} {'повторы':>8} {'бюджет':>7}"
+        )
+        for row in rows:
+            over_budget = row['budget'] is not None and row['max_queries'] > row['budget']
+            line = (
+                f"{row['url_name']:<32} {row['requests']:>8} {row['avg_queries']:>8} {row['max_queries']:>8} "
+                f"{row['avg_db_ms']:>8} {row['avg_render_ms']:>8} {row['p95_render_ms']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['max_duplicates']:>8} "
+                f"{row['budget'] if row['budget'] is not None else '—':>7}"
+            )
+            self.stdout.write(self.style.ERROR(line) if over_budget else line)
+            if options['sql'] and row['top_sql']:
+                self.stdout.write(f"    {row['top_sql'][:200]}")
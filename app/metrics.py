@@ -0,0 +1,346 @@
+# app/metrics.py
+"""
+Метрики запросов: число SQL-запросов, время в БД, повторяющиеся запросы,
+время рендеринга шаблонов и общее время ответа по имени URL.
+
+QueryMetricsMiddleware (app/middleware.py) подключает к соединениям
+execute_wrapper, поэтому работает и без DEBUG. Замеры копятся в памяти
+процесса и пачками пишутся в отдельный файл SQLite (METRICS_DB), чтобы
+не нагружать основную базу, через одно соединение на процесс. Хранятся
+METRICS_RETENTION_HOURS часов, в выборку попадает доля запросов
+METRICS_SAMPLE_RATE. По умолчанию метрики выключены (STUDYHUB_METRICS=1).
+
+Время шаблонов меряет бэкенд TimedDjangoTemplates (TEMPLATES в settings):
+учитывается внешний render() без вложенных include. Ленивые QuerySet,
+которые выполняются в шаблоне, входят и во время БД, и во время шаблона.
+
+Отчёт: `python manage.py viewstats`.
+
+Бюджеты запросов задаются в QUERY_BUDGETS ({имя URL: максимум}).
+Превышение пишется в лог, а при QUERY_BUDGETS_STRICT = True — бросает
+QueryBudgetExceeded (удобно в тестах). В тестах можно также явно
+ограничить блок кода: `with query_budget(10): client.get(...)`.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVERY = 50
+FLUSH_INTERVAL = 5.0
+
+_INSERT = (
+    'INSERT INTO request_metrics '
+    '(ts, url_name, method, status, duration_ms, db_ms, queries, duplicates, top_sql, render_ms) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS request_metrics (
+    ts REAL NOT NULL,
+    url_name TEXT NOT NULL,
+    method TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration_ms REAL NOT NULL,
+    db_ms REAL NOT NULL,
+    queries INTEGER NOT NULL,
+    duplicates INTEGER NOT NULL,
+    top_sql TEXT NOT NULL DEFAULT '',
+    render_ms REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS request_metrics_ts ON request_metrics (ts);
+CREATE INDEX IF NOT EXISTS request_metrics_url ON request_metrics (url_name, ts);
+'''
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting('METRICS_ENABLED', False)
+
+
+def should_sample():
+    rate = _setting('METRICS_SAMPLE_RATE', 0.05)
+    return rate >= 1 or random.random() < rate
+
+
+# 🧮 Подсчёт запросов
+class QueryRecorder:
+    """execute_wrapper, который считает запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.render_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count += 1
+            # Параметры не учитываются: N+1 — это один и тот же шаблон запроса
+            self.statements[sql] += 1
+
+    @contextmanager
+    def attach(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @contextmanager
+    def track_renders(self):
+        """Учитывать в этом рекордере время шаблонов, отрендеренных внутри блока."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def most_repeated(self):
+        """(sql, число повторов) самого частого шаблона или (None, 0)."""
+        if not self.statements:
+            return None, 0
+        sql, n = self.statements.most_common(1)[0]
+        return (sql, n) if n > 1 else (None, 0)
+
+
+_current = contextvars.ContextVar('metrics_recorder', default=None)
+
+
+# 🖼 Время шаблонов
+@contextmanager
+def render_timer():
+    recorder = _current.get()
+    # Вложенный render (render_to_string в теге шаблона) уже идёт во внешнем замере
+    if recorder is None or recorder.rendering:
+        yield
+        return
+    recorder.rendering = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.render_time += time.perf_counter() - start
+        recorder.rendering = False
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with render_timer():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который отдаёт время рендеринга в метрики запроса."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def budget_for(url_name):
+    return _setting('QUERY_BUDGETS', {}).get(url_name)
+
+
+def check_budget(url_name, recorder):
+    budget = budget_for(url_name)
+    if budget is None or recorder.count <= budget:
+        return
+    sql, repeated = recorder.most_repeated()
+    message = f'{url_name}: {recorder.count} SQL-запросов при бюджете {budget}'
+    if sql:
+        message += f'; чаще всего ({repeated} раз): {sql[:300]}'
+    if _setting('QUERY_BUDGETS_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def query_budget(max_queries=None, url_name=None):
+    """
+    Ограничить число SQL-запросов в блоке; бюджет — число или из QUERY_BUDGETS[url_name].
+
+        with query_budget(url_name='profile'):
+            self.client.get(reverse('profile'))
+    """
+    budget = max_queries if max_queries is not None else budget_for(url_name)
+    recorder = QueryRecorder()
+    with recorder.attach():
+        yield recorder
+    if budget is not None and recorder.count > budget:
+        sql, repeated = recorder.most_repeated()
+        lines = [f'{recorder.count} SQL-запросов при бюджете {budget}']
+        if sql:
+            lines.append(f'Повторяется {repeated} раз: {sql}')
+        raise QueryBudgetExceeded('\n'.join(lines))
+
+
+# 💾 Хранилище
+def _connect(path):
+    # Соединением пользуются поток запроса и atexit, но всегда под _db_lock
+    db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.executescript(_SCHEMA)
+    # Файлы метрик, созданные до появления колонки render_ms
+    if 'render_ms' not in {row[1] for row in db.execute('PRAGMA table_info(request_metrics)')}:
+        db.execute('ALTER TABLE request_metrics ADD COLUMN render_ms REAL NOT NULL DEFAULT 0')
+    return db
+
+
+_db_lock = threading.Lock()
+_db = None  # (pid, путь, соединение)
+
+
+@contextmanager
+def _connection():
+    """Одно соединение на процесс: схема проверяется один раз при открытии."""
+    global _db
+    path = str(_setting('METRICS_DB', settings.BASE_DIR / 'db' / 'metrics.sqlite3'))
+    with _db_lock:
+        # После fork или смены METRICS_DB (тесты) открываем заново
+        if _db is None or _db[:2] != (os.getpid(), path):
+            if _db is not None and _db[0] == os.getpid():
+                _db[2].close()
+            _db = (os.getpid(), path, _connect(path))
+        try:
+            yield _db[2]
+        except sqlite3.Error:
+            # Файл могли удалить или повредить — в следующий раз соединение откроется заново
+            _db[2].close()
+            _db = None
+            raise
+
+
+class _Buffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []
+        self.last_flush = time.monotonic()
+
+    def add(self, row):
+        with self.lock:
+            self.rows.append(row)
+            due = len(self.rows) >= FLUSH_EVERY or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+            if not due:
+                return
+            rows, self.rows = self.rows, []
+            self.last_flush = time.monotonic()
+        _write(rows)
+
+    def flush(self):
+        with self.lock:
+            rows, self.rows = self.rows, []
+            self.last_flush = time.monotonic()
+        _write(rows)
+
+
+_buffer = _Buffer()
+atexit.register(_buffer.flush)
+
+
+def _write(rows):
+    if not rows:
+        return
+    cutoff = time.time() - _setting('METRICS_RETENTION_HOURS', 72) * 3600
+    try:
+        with _connection() as db, db:
+            db.executemany(_INSERT, rows)
+            db.execute('DELETE FROM request_metrics WHERE ts < ?', (cutoff,))
+    except sqlite3.Error:
+        # Метрики не должны ронять запросы
+        logger.exception('Не удалось записать метрики запросов')
+
+
+def record(url_name, method, status, duration, recorder):
+    sql, _ = recorder.most_repeated()
+    _buffer.add((
+        time.time(), url_name, method, status,
+        round(duration * 1000, 2), round(recorder.db_time * 1000, 2),
+        recorder.count, recorder.duplicates, sql or '',
+        round(recorder.render_time * 1000, 2),
+    ))
+
+
+def flush():
+    _buffer.flush()
+
+
+# 📋 Отчёт
+REPORT_ORDERING = {
+    'queries': 'avg_queries',
+    'db': 'avg_db_ms',
+    'render': 'avg_render_ms',
+    'duration': 'p95_ms',
+    'duplicates': 'max_duplicates',
+}
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(hours=24, order='queries', limit=20):
+    """Сводка по именам URL за последние hours часов, худшие сверху."""
+    flush()
+    with _connection() as db:
+        rows = db.execute(
+            'SELECT url_name, duration_ms, db_ms, queries, duplicates, top_sql, render_ms '
+            'FROM request_metrics WHERE ts >= ?',
+            (time.time() - hours * 3600,),
+        ).fetchall()
+
+    grouped = {}
+    for url_name, duration_ms, db_ms, queries, duplicates, top_sql, render_ms in rows:
+        grouped.setdefault(url_name, []).append((duration_ms, db_ms, queries, duplicates, top_sql, render_ms))
+
+    summary = []
+    for url_name, samples in grouped.items():
+        durations = [s[0] for s in samples]
+        worst = max(samples, key=lambda s: s[3])
+        summary.append({
+            'url_name': url_name,
+            'requests': len(samples),
+            'avg_queries': round(sum(s[2] for s in samples) / len(samples), 1),
+            'max_queries': max(s[2] for s in samples),
+            'avg_db_ms': round(sum(s[1] for s in samples) / len(samples), 2),
+            'avg_render_ms': round(sum(s[5] for s in samples) / len(samples), 2),
+            'p95_render_ms': _percentile([s[5] for s in samples], 0.95),
+            'p50_ms': _percentile(durations, 0.5),
+            'p95_ms': _percentile(durations, 0.95),
+            'max_duplicates': worst[3],
+            'top_sql': worst[4],
+            'budget': budget_for(url_name),
+        })
+    key = REPORT_ORDERING[order]
+    summary.sort(key=lambda row: row[key], reverse=True)
+    return summary[:limit]
@@ -0,0 +1,61 @@
+# app/middleware.py
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+
+class QueryMetricsMiddleware:
+    """Замеры SQL-запросов и времени ответа по имени URL (см. app/metrics.py)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics.should_sample():
+            return self.get_response(request)
+
+        recorder = metrics.QueryRecorder()
+        start = time.perf_counter()
+        with recorder.attach(), recorder.track_renders():
+            response = self.get_response(request)
+        self.finish(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.should_sample():
+            return await self.get_response(request)
+
+        # Под ASGI ORM запроса выполняется в одном потоке (sync_to_async с thread_sensitive),
+        # поэтому перехватчик запросов ставится и снимается именно там
+        recorder = metrics.QueryRecorder()
+        attached = ExitStack()
+        await sync_to_async(attached.enter_context)(recorder.attach())
+        start = time.perf_counter()
+        try:
+            # Контекст копируется в потоки sync_to_async, так что рендер там попадёт в этот рекордер
+            with recorder.track_renders():
+                response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            await sync_to_async(attached.close)()
+        await sync_to_async(self.finish)(request, response, recorder, duration)
+        return response
+
+    def finish(self, request, response, recorder, duration):
+        match = request.resolver_match
+        url_name = (match.view_name if match else None) or '<unresolved>'
+        metrics.record(url_name, request.method, response.status_code, duration, recorder)
+        metrics.check_budget(url_name, recorder)
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_progress(apps, schema_editor):
+    Enrollment = apps.get_model('app', 'Enrollment')
+    Assignment = apps.get_model('app', 'Assignment')
+    AssignmentSubmission = apps.get_model('app', 'AssignmentSubmission')
+    ProgramProgress = apps.get_model('app', 'ProgramProgress')
+
+    totals = dict(
+        Assignment.objects.values_list('module__section_id').annotate(n=Count('id'))
+    )
+    accepted = {
+        (user_id, section_id): n
+        for user_id, section_id, n in AssignmentSubmission.objects.filter(status='accepted')
+        .values_list('user_id', 'assignment__module__section_id')
+        .annotate(n=Count('id'))
+    }
+    ProgramProgress.objects.bulk_create([
+        ProgramProgress(
+            user_id=user_id,
+            program_id=program_id,
+            assignments_total=totals.get(section_id, 0),
+            assignments_accepted=accepted.get((user_id, section_id), 0),
+        )
+        for user_id, program_id, section_id in Enrollment.objects.filter(is_approved=True)
+        .values_list('user_id', 'program_id', 'program__section_id')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assignments_total', models.IntegerField(default=0)),
+                ('assignments_accepted', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='app.program')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='program_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'program')},
+            },
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
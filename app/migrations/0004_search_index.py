@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Program = apps.get_model('app', 'Program')
+    Section = apps.get_model('app', 'Section')
+    Users = apps.get_model('app', 'Users')
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, title, body, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+    rows = [
+        ('program', p.pk, p.name, ' '.join([p.description, p.goal, p.skills]))
+        for p in Program.objects.all()
+    ] + [
+        ('section', s.pk, s.name, s.description)
+        for s in Section.objects.all()
+    ] + [
+        ('curator', u.pk, u.username, ' '.join(filter(None, [u.last_name, u.first_name, u.middle_name])))
+        for u in Users.objects.filter(groups__name='Куратор').distinct()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO search_index (kind, object_id, title, body) VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:27
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_materials(apps, schema_editor):
+    Material = apps.get_model('app', 'Material')
+    MaterialProgress = apps.get_model('app', 'MaterialProgress')
+    ProgramProgress = apps.get_model('app', 'ProgramProgress')
+
+    totals = dict(Material.objects.values_list('module__section_id').annotate(n=Count('id')))
+    viewed = {
+        (user_id, section_id): n
+        for user_id, section_id, n in MaterialProgress.objects
+        .values_list('user_id', 'material__module__section_id')
+        .annotate(n=Count('id'))
+    }
+    rows = list(ProgramProgress.objects.select_related('program'))
+    for row in rows:
+        section_id = row.program.section_id
+        row.materials_total = totals.get(section_id, 0)
+        row.materials_viewed = viewed.get((row.user_id, section_id), 0)
+    ProgramProgress.objects.bulk_update(rows, ['materials_total', 'materials_viewed'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programprogress',
+            name='materials_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='programprogress',
+            name='materials_viewed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_materials, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_progress_materials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignmentsubmission',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='materialprogress',
+            name='viewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyProgramStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('enrollments', models.IntegerField(default=0)),
+                ('submissions', models.IntegerField(default=0)),
+                ('accepted', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('material_views', models.IntegerField(default=0)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='app.program')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['program', 'day'], name='app_dailypr_program_be33f8_idx')],
+                'unique_together': {('day', 'program')},
+            },
+        ),
+    ]
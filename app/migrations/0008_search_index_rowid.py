@@ -0,0 +1,34 @@
+from django.db import migrations
+
+KIND_CODES = {'program': 1, 'section': 2, 'curator': 3}
+
+
+def rekey_search_index(apps, schema_editor):
+    """Перенумеровать документы: rowid = (object_id << 2) | вид (см. app/search.py)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if 'search_index' not in schema_editor.connection.introspection.table_names(cursor):
+            return
+        cursor.execute('SELECT kind, object_id, title, body FROM search_index')
+        rows = {
+            (int(object_id) << 2) | KIND_CODES[kind]: (kind, object_id, title, body)
+            for kind, object_id, title, body in cursor.fetchall()
+            if kind in KIND_CODES
+        }
+        cursor.execute('DELETE FROM search_index')
+        cursor.executemany(
+            'INSERT INTO search_index (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+            [(rowid, *row) for rowid, row in rows.items()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_daily_program_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_search_index, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission
+import uuid
+
 from django.db import models
+from django.utils import timezone
 
 class UserManager(BaseUserManager):
     def create_user(self, username, password=None, **extra_fields):
@@ -100,6 +103,8 @@ class Enrollment(models.Model):
     user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='enrollments')
     program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='enrollments')
     is_approved = models.BooleanField(default=False)
+    # NULL — заявка подана до появления поля (дата неизвестна)
+    created_at = models.DateTimeField(default=timezone.now, null=True, blank=True)
 
     class Meta:
         unique_together = ('user', 'program')
@@ -115,6 +120,7 @@ class AssignmentSubmission(models.Model):
         ('rejected', 'Требует доработки')
     ], default='submitted')
     submitted_at = models.DateTimeField(auto_now_add=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username} → {self.assignment.title}"
@@ -131,6 +137,119 @@ class Certificate(models.Model):
 class MaterialProgress(models.Model):
     user = models.ForeignKey(Users, on_delete=models.CASCADE)
     material = models.ForeignKey(Material, on_delete=models.CASCADE)
+    # NULL — материал просмотрен до появления поля (дата неизвестна)
+    viewed_at = models.DateTimeField(default=timezone.now, null=True, blank=True)
 
     class Meta:
         unique_together = ('user', 'material')
+
+
+class ProgramProgress(models.Model):
+    """Состояние прохождения программы пользователем (ведётся инкрементально, см. app/progress.py)."""
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='program_progress')
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='progress')
+    assignments_total = models.IntegerField(default=0)
+    assignments_accepted = models.IntegerField(default=0)
+    materials_total = models.IntegerField(default=0)
+    materials_viewed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'program')
+
+    @property
+    def is_completed(self):
+        return 0 < self.assignments_total <= self.assignments_accepted
+
+    @staticmethod
+    def _percent(done, total):
+        return min(100, int(done * 100 / total)) if total > 0 else 0
+
+    @property
+    def assignments_percent(self):
+        return self._percent(self.assignments_accepted, self.assignments_total)
+
+    @property
+    def materials_percent(self):
+        return self._percent(self.materials_viewed, self.materials_total)
+
+    @property
+    def percent(self):
+        return self._percent(
+            self.assignments_accepted + self.materials_viewed,
+            self.assignments_total + self.materials_total,
+        )
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди (см. app/jobs.py и команду runjobs)."""
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+
+class UploadSession(models.Model):
+    """Докачиваемая загрузка файла частями (см. app/uploads.py)."""
+    STATUS_CHOICES = [
+        ('uploading', 'Загружается'),
+        ('complete', 'Загружен'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True)
+    received_chunks = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+
+class DailyProgramStats(models.Model):
+    """Дневные агрегаты по программе для страницы статистики (см. app/stats.py)."""
+    day = models.DateField()
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='daily_stats')
+    enrollments = models.IntegerField(default=0)
+    submissions = models.IntegerField(default=0)
+    accepted = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    material_views = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'program')
+        indexes = [models.Index(fields=['program', 'day'])]
+
+    @property
+    def acceptance_rate(self):
+        reviewed = self.accepted + self.rejected
+        return round(self.accepted * 100 / reviewed) if reviewed else None
@@ -0,0 +1,129 @@
+# app/pagination.py
+"""
+Keyset (seek) пагинация для списков.
+
+Вместо OFFSET страница ищется по значениям полей сортировки последней
+показанной строки: WHERE (f1, f2) > (v1, v2) ORDER BY f1, f2 LIMIT n + 1.
+Стоимость страницы не зависит от её номера, COUNT(*) не выполняется.
+Последним полем сортировки должен быть уникальный ключ (обычно pk),
+поля сортировки не должны быть NULL.
+
+Курсор — base64 от JSON со значениями полей и направлением. Курсор
+приходит от клиента: если значения не подходят к полям сортировки
+(подделан или устарел после смены ordering), показывается первая страница.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 20
+CURSOR_PARAM = 'cursor'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction):
+    raw = json.dumps({'v': values, 'd': direction}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values, direction = data['v'], data['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+def _parse_ordering(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _seek_filter(fields, values, forward):
+    """(f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... с учётом направления каждого поля."""
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(fields, values):
+        lookup = 'gt' if forward != descending else 'lt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def paginate(queryset, request, ordering=('pk',), per_page=PAGE_SIZE, param=CURSOR_PARAM):
+    """
+    Вернуть KeysetPage для запроса. ordering — поля сортировки ('-' для убывания),
+    последним должен идти уникальный ключ.
+    """
+    fields = _parse_ordering(ordering)
+    values, direction = None, 'next'
+    if cursor := request.GET.get(param):
+        try:
+            values, direction = decode_cursor(cursor)
+        except InvalidCursor:
+            values = None
+        if values is not None and len(values) != len(fields):
+            values, direction = None, 'next'
+
+    forward = direction == 'next'
+    if forward:
+        order_by = list(ordering)
+    else:
+        order_by = [name if descending else f'-{name}' for name, descending in fields]
+
+    qs = queryset.order_by(*order_by)
+    if values is not None:
+        try:
+            # Значения приводятся к типам полей уже здесь, до выполнения запроса
+            qs = qs.filter(_seek_filter(fields, values, forward))
+        except (ValueError, TypeError, ValidationError):
+            values, forward = None, True
+            qs = queryset.order_by(*ordering)
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def cursor_for(obj, to):
+        return encode_cursor([getattr(obj, name) for name, _ in fields], to)
+
+    has_next = has_more if forward else values is not None
+    has_previous = values is not None if forward else has_more
+    return KeysetPage(
+        rows,
+        has_next=bool(rows) and has_next,
+        has_previous=bool(rows) and has_previous,
+        next_cursor=cursor_for(rows[-1], 'next') if rows and has_next else None,
+        previous_cursor=cursor_for(rows[0], 'prev') if rows and has_previous else None,
+    )
@@ -0,0 +1,347 @@
+# app/progress.py
+"""
+Инкрементальный учёт прохождения программ.
+
+Для каждой одобренной заявки (пользователь, программа) хранится строка
+ProgramProgress со счётчиками заданий (всего/принято) и материалов
+(всего/просмотрено). Задания и материалы программы — это задания и материалы
+модулей её раздела. Счётчики сдвигаются на ±1 при изменении статуса ответа,
+отметке о просмотре и добавлении/удалении задания или материала, поэтому
+выдача сертификата — это проверка одной строки, а профиль читает готовые
+цифры без пересчёта.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import (
+    Assignment, AssignmentSubmission, Certificate, Enrollment, Material, MaterialProgress, ProgramProgress
+)
+from . import stats
+from .tasks import render_certificates
+
+
+def _completed(progress_qs):
+    return progress_qs.filter(
+        assignments_total__gt=0,
+        assignments_accepted__gte=F('assignments_total'),
+    )
+
+
+def issue_certificates(progress_qs, render=True):
+    """
+    Выдать недостающие сертификаты по завершённым строкам прогресса.
+    render=False — не ставить рендер PDF в очередь (его сделает вызывающий).
+    """
+    pairs = list(
+        _completed(progress_qs)
+        .exclude(Exists(Certificate.objects.filter(user_id=OuterRef('user_id'), program_id=OuterRef('program_id'))))
+        .values_list('user_id', 'program_id')
+    )
+    if not pairs:
+        return 0
+    Certificate.objects.bulk_create(
+        [Certificate(user_id=user_id, program_id=program_id) for user_id, program_id in pairs],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+    if render:
+        # PDF рендерится в фоне, чтобы первое скачивание не ждало ReportLab
+        transaction.on_commit(lambda: render_certificates.enqueue(pairs=[list(pair) for pair in pairs]))
+    return len(pairs)
+
+
+def _shift_user(user_id, section_id, field, delta):
+    if not delta or section_id is None:
+        return None
+    rows = ProgramProgress.objects.filter(user_id=user_id, program__section_id=section_id)
+    rows.update(**{field: F(field) + delta}, updated_at=timezone.now())
+    return rows
+
+
+def change_accepted(user_id, section_id, delta):
+    """Сдвинуть счётчик принятых заданий пользователя во всех программах раздела."""
+    rows = _shift_user(user_id, section_id, 'assignments_accepted', delta)
+    if rows is not None and delta > 0:
+        issue_certificates(rows)
+
+
+def change_viewed(user_id, section_id, delta):
+    """Сдвинуть счётчик просмотренных материалов пользователя во всех программах раздела."""
+    _shift_user(user_id, section_id, 'materials_viewed', delta)
+
+
+def _shift_section(section_id, total_field, done_field, delta, done_by_user):
+    """
+    Сдвинуть общее число во всех программах раздела.
+
+    done_by_user — {user_id: n}: сколько выполненных (принятых/просмотренных)
+    уходит вместе с удаляемыми объектами.
+    """
+    if section_id is None:
+        return None
+    rows = ProgramProgress.objects.filter(program__section_id=section_id)
+    now = timezone.now()
+    if delta:
+        rows.update(**{total_field: F(total_field) + delta}, updated_at=now)
+
+    by_count = {}
+    for user_id, n in (done_by_user or {}).items():
+        by_count.setdefault(n, []).append(user_id)
+    for n, user_ids in by_count.items():
+        rows.filter(user_id__in=user_ids).update(**{done_field: F(done_field) - n}, updated_at=now)
+    return rows
+
+
+def change_assignments_total(section_id, delta, accepted_by_user=None):
+    rows = _shift_section(section_id, 'assignments_total', 'assignments_accepted', delta, accepted_by_user)
+    if rows is not None and delta < 0:
+        # Удаление последнего незачтённого задания может завершить программу
+        issue_certificates(rows)
+
+
+def change_materials_total(section_id, delta, viewed_by_user=None):
+    _shift_section(section_id, 'materials_total', 'materials_viewed', delta, viewed_by_user)
+
+
+def accepted_by_user(submissions):
+    """{user_id: число принятых ответов} для набора ответов."""
+    return dict(Counter(
+        submissions.filter(status='accepted').values_list('user_id', flat=True)
+    ))
+
+
+def viewed_by_user(material):
+    """{user_id: 1} для всех, кто отметил материал просмотренным."""
+    return dict(Counter(
+        MaterialProgress.objects.filter(material=material).values_list('user_id', flat=True)
+    ))
+
+
+def rebuild_progress(enrollments, render=True, issue=True):
+    """
+    Пересчитать прогресс с нуля для набора заявок.
+
+    Неодобренные заявки пропускаются. Выполняется фиксированным числом
+    запросов независимо от числа заявок. render — см. issue_certificates;
+    issue=False — не выдавать сертификаты (вызывающий выдаст и посчитает их сам).
+    """
+    rows = list(
+        enrollments.filter(is_approved=True)
+        .values_list('user_id', 'program_id', 'program__section_id')
+    )
+    if not rows:
+        return 0
+
+    section_ids = {section_id for _, _, section_id in rows}
+    user_ids = {user_id for user_id, _, _ in rows}
+
+    totals = dict(
+        Assignment.objects.filter(module__section_id__in=section_ids)
+        .values_list('module__section_id')
+        .annotate(n=Count('id'))
+    )
+    material_totals = dict(
+        Material.objects.filter(module__section_id__in=section_ids)
+        .values_list('module__section_id')
+        .annotate(n=Count('id'))
+    )
+    viewed = {
+        (user_id, section_id): n
+        for user_id, section_id, n in MaterialProgress.objects.filter(
+            user_id__in=user_ids,
+            material__module__section_id__in=section_ids,
+        )
+        .values_list('user_id', 'material__module__section_id')
+        .annotate(n=Count('id'))
+    }
+    accepted = {
+        (user_id, section_id): n
+        for user_id, section_id, n in AssignmentSubmission.objects.filter(
+            status='accepted',
+            user_id__in=user_ids,
+            assignment__module__section_id__in=section_ids,
+        )
+        .values_list('user_id', 'assignment__module__section_id')
+        .annotate(n=Count('id'))
+    }
+
+    now = timezone.now()
+    ProgramProgress.objects.bulk_create(
+        [
+            ProgramProgress(
+                user_id=user_id,
+                program_id=program_id,
+                assignments_total=totals.get(section_id, 0),
+                assignments_accepted=accepted.get((user_id, section_id), 0),
+                materials_total=material_totals.get(section_id, 0),
+                materials_viewed=viewed.get((user_id, section_id), 0),
+                updated_at=now,
+            )
+            for user_id, program_id, section_id in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'program'],
+        update_fields=[
+            'assignments_total', 'assignments_accepted', 'materials_total', 'materials_viewed', 'updated_at',
+        ],
+    )
+
+    if issue:
+        issue_certificates(ProgramProgress.objects.filter(
+            user_id__in=user_ids,
+            program_id__in={program_id for _, program_id, _ in rows},
+        ), render=render)
+    return len(rows)
+
+
+def rebuild_section_progress(section_id):
+    rebuild_progress(Enrollment.objects.filter(program__section_id=section_id))
+
+
+def refresh_program_progress(user, program):
+    """Создать или пересчитать строку прогресса после одобрения заявки."""
+    rebuild_progress(Enrollment.objects.filter(user=user, program=program))
+
+
+def drop_program_progress(user, program):
+    ProgramProgress.objects.filter(user=user, program=program).delete()
+
+
+def set_approval(enrollments, approved):
+    """
+    Одобрить или отклонить набор заявок одним UPDATE.
+
+    Сигналы при этом не срабатывают, поэтому прогресс создаётся
+    (rebuild_progress) или удаляется пакетом для всех изменённых заявок.
+    Возвращает число изменённых заявок.
+    """
+    with transaction.atomic():
+        # id фиксируются заранее: фильтр вроде «ожидающие» после UPDATE уже ничего не вернёт
+        ids = list(enrollments.filter(is_approved=not approved).values_list('pk', flat=True))
+        if not ids:
+            return 0
+        changed = Enrollment.objects.filter(pk__in=ids)
+        changed.update(is_approved=approved)
+        if approved:
+            rebuild_progress(changed)
+        else:
+            ProgramProgress.objects.filter(
+                Exists(changed.filter(user_id=OuterRef('user_id'), program_id=OuterRef('program_id')))
+            ).delete()
+    return len(ids)
+
+
+def review_submissions(submissions, status):
+    """
+    Проставить статус проверки набору ответов.
+
+    Статусы пишутся через bulk_update (сигналы не срабатывают), счётчики
+    принятых сдвигаются одним UPDATE на каждую пару (раздел, сдвиг),
+    а сертификаты проверяются один раз для всех затронутых пользователей.
+    Возвращает число изменённых ответов.
+    """
+    with transaction.atomic():
+        rows = list(
+            submissions.exclude(status=status)
+            .annotate(section_id=F('assignment__module__section_id'))
+            .only('id', 'user_id', 'assignment_id', 'status')
+        )
+        if not rows:
+            return 0
+
+        now = timezone.now()
+        shifts = Counter()
+        for row in rows:
+            if row.status == 'accepted':
+                shifts[(row.user_id, row.section_id)] -= 1
+            if status == 'accepted':
+                shifts[(row.user_id, row.section_id)] += 1
+            row.status = status
+            row.reviewed_at = now
+        AssignmentSubmission.objects.bulk_update(rows, ['status', 'reviewed_at'], batch_size=500)
+
+        users_by_shift = defaultdict(list)
+        for (user_id, section_id), delta in shifts.items():
+            if delta and section_id is not None:
+                users_by_shift[(section_id, delta)].append(user_id)
+        for (section_id, delta), user_ids in users_by_shift.items():
+            ProgramProgress.objects.filter(program__section_id=section_id, user_id__in=user_ids).update(
+                assignments_accepted=F('assignments_accepted') + delta, updated_at=now,
+            )
+        if status == 'accepted':
+            issue_certificates(ProgramProgress.objects.filter(
+                user_id__in={user_id for user_id, _ in shifts},
+                program__section_id__in={section_id for _, section_id in shifts},
+            ))
+
+        # Дневная статистика: ответ засчитывается программам раздела, на которые записан автор
+        reviewed = Counter((row.user_id, row.section_id) for row in rows)
+        events = defaultdict(Counter)
+        day = timezone.localdate(now)
+        for user_id, program_id, section_id in Enrollment.objects.filter(
+            user_id__in={user_id for user_id, _ in reviewed},
+            program__section_id__in={section_id for _, section_id in reviewed},
+        ).values_list('user_id', 'program_id', 'program__section_id'):
+            events[(day, program_id)][status] += reviewed.get((user_id, section_id), 0)
+        stats.bump_many(events)
+    return len(rows)
+
+
+def record_material_views(views):
+    """
+    Отметить пачку просмотров материалов одной транзакцией.
+
+    views — [(user_id, material_id, viewed_at)]. Уже отмеченные пропускаются,
+    счётчики просмотренного и дневная статистика сдвигаются агрегированно.
+    Возвращает число новых отметок.
+    """
+    latest = {}
+    for user_id, material_id, viewed_at in views:
+        latest.setdefault((user_id, material_id), viewed_at)
+    if not latest:
+        return 0
+
+    with transaction.atomic():
+        user_ids = {user_id for user_id, _ in latest}
+        material_ids = {material_id for _, material_id in latest}
+        existing = set(
+            MaterialProgress.objects.filter(user_id__in=user_ids, material_id__in=material_ids)
+            .values_list('user_id', 'material_id')
+        )
+        new = {pair: viewed_at for pair, viewed_at in latest.items() if pair not in existing}
+        if not new:
+            return 0
+        MaterialProgress.objects.bulk_create(
+            [MaterialProgress(user_id=u, material_id=m, viewed_at=at) for (u, m), at in new.items()],
+            ignore_conflicts=True,
+        )
+
+        material_section = dict(
+            Material.objects.filter(pk__in={m for _, m in new}).values_list('pk', 'module__section_id')
+        )
+        per_user = Counter((u, material_section.get(m)) for u, m in new)
+        users_by_shift = defaultdict(list)
+        for (user_id, section_id), n in per_user.items():
+            if section_id is not None:
+                users_by_shift[(section_id, n)].append(user_id)
+        now = timezone.now()
+        for (section_id, n), shifted in users_by_shift.items():
+            ProgramProgress.objects.filter(program__section_id=section_id, user_id__in=shifted).update(
+                materials_viewed=F('materials_viewed') + n, updated_at=now,
+            )
+
+        days = defaultdict(Counter)
+        for (user_id, material_id), viewed_at in new.items():
+            days[(user_id, material_section.get(material_id))][timezone.localdate(viewed_at)] += 1
+        events = defaultdict(Counter)
+        for user_id, program_id, section_id in Enrollment.objects.filter(
+            user_id__in={u for u, _ in new},
+            program__section_id__in={s for s in material_section.values() if s is not None},
+        ).values_list('user_id', 'program_id', 'program__section_id'):
+            for day, n in days.get((user_id, section_id), {}).items():
+                events[(day, program_id)]['material_views'] += n
+        stats.bump_many(events)
+    return len(new)
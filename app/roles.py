@@ -0,0 +1,59 @@
+# app/roles.py
+"""
+Определение ролей пользователя.
+
+Набор групп пользователя загружается один раз за запрос (кэшируется на объекте
+request.user, который общий для декораторов, вьюх и context processor'а)
+и хранится в общем кэше между запросами. Кэш сбрасывается сигналами
+из app/signals.py при изменении Users.groups и при переименовании/удалении групп.
+"""
+from django.core.cache import cache
+
+ROLE_PARTICIPANT = 'Пользователь'
+ROLE_CURATOR = 'Куратор'
+ROLE_ADMIN = 'Администратор'
+
+ROLE_CACHE_TIMEOUT = 60 * 5
+_REQUEST_ATTR = '_role_names'
+
+
+def _cache_key(user_id):
+    return f'roles:{user_id}'
+
+
+def get_user_roles(user):
+    """Множество названий групп пользователя (frozenset)."""
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, _REQUEST_ATTR, None)
+    if roles is not None:
+        return roles
+
+    key = _cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+
+    setattr(user, _REQUEST_ATTR, roles)
+    return roles
+
+
+def invalidate_user_roles(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+def forget_request_roles(user):
+    """Сбросить кэш ролей, сохранённый на объекте пользователя."""
+    user.__dict__.pop(_REQUEST_ATTR, None)
+
+
+# 🔐 Проверки ролей
+def in_group(user, name): return name in get_user_roles(user)
+def is_participant(user): return in_group(user, ROLE_PARTICIPANT)
+def is_curator(user): return in_group(user, ROLE_CURATOR)
+def is_admin(user): return user.is_superuser or in_group(user, ROLE_ADMIN)
+def is_curator_or_admin(user): return is_curator(user) or is_admin(user)
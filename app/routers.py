@@ -0,0 +1,158 @@
+# app/routers.py
+"""
+Чтение каталога с реплики.
+
+Реплики перечислены в settings.DATABASE_REPLICAS: снимок SQLite
+(`python manage.py snapshotdb`) или, например, standby Postgres.
+Запросы уходят на реплику только:
+
+* внутри представлений, помеченных @replica_reads;
+* для моделей каталога из REPLICA_MODELS. Заявки, ответы, сессии
+  и пользователи всегда читаются с основной базы: request.user
+  загружается лениво, в том числе внутри @replica_reads, и не должен
+  зависеть от отставания снимка (смена пароля, блокировка, роли);
+* если пользователь недавно ничего не записывал. Любая запись помечает
+  ответ cookie, и следующие REPLICA_PIN_SECONDS секунд его запросы
+  читают с основной базы — так, например, после отправки ответа
+  редирект показывает свежие данные.
+
+Запись всегда идёт в default.
+"""
+import os
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PIN_COOKIE = 'db_primary'
+
+REPLICA_MODELS = {
+    'app.program', 'app.section', 'app.module', 'app.programmodule',
+    'app.assignment', 'app.material',
+}
+
+
+class _RoutingState:
+    __slots__ = ('pinned', 'use_replica', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_ready(alias):
+    # Снимок SQLite может ещё не существовать — тогда читаем с основной базы
+    settings_dict = connections.settings[alias]
+    if settings_dict['ENGINE'].endswith('sqlite3'):
+        return os.path.exists(settings_dict['NAME'])
+    return True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Явный default, чтобы связанные объекты не наследовали базу экземпляра с реплики
+        state = _state.get()
+        if state is None or not state.use_replica or model._meta.label_lower not in REPLICA_MODELS:
+            return 'default'
+        ready = [alias for alias in replicas() if is_ready(alias)]
+        return random.choice(ready) if ready else 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе со снимком (или репликацией), не миграциями
+        return None if db == 'default' else False
+
+
+class DatabaseRoutingMiddleware:
+    """Состояние маршрутизации на время запроса и закрепление за основной базой после записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        # Контекст копируется в потоки sync_to_async, поэтому запись из ORM видна и здесь
+        state = _RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    def pin(self, state, response):
+        if state.wrote and replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 120),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def read_source():
+    """
+    Откуда сейчас читается каталог: 'default' или реплики с поколением снимка.
+    Нужно для ключей кэша, чтобы данные снимка не выдавались за свежие.
+    """
+    state = _state.get()
+    if state is None or not state.use_replica:
+        return 'default'
+    sources = []
+    for alias in replicas():
+        if not is_ready(alias):
+            continue
+        settings_dict = connections.settings[alias]
+        if settings_dict['ENGINE'].endswith('sqlite3'):
+            sources.append(f"{alias}@{os.stat(settings_dict['NAME']).st_mtime_ns}")
+        else:
+            sources.append(alias)
+    return ','.join(sources) or 'default'
+
+
+def replica_reads(view):
+    """Разрешить представлению читать модели каталога с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or state.pinned or not replicas():
+            return view(request, *args, **kwargs)
+        state.use_replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+    return wrapper
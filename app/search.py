@@ -0,0 +1,185 @@
+# app/search.py
+"""
+Полнотекстовый поиск по каталогу на SQLite FTS5.
+
+Одна виртуальная таблица search_index хранит документы трёх видов:
+программы (название, описание, цель, навыки), разделы (название, описание)
+и кураторы (логин и ФИО). Индекс поддерживается сигналами из app/signals.py
+и пересобирается командой `python manage.py rebuildsearch`.
+
+rowid документа вычисляется из вида и id объекта (doc_rowid), поэтому
+обновление и удаление документа — поиск по rowid, а не перебор таблицы
+(kind и object_id в FTS5 не индексируются).
+
+Поиск не выбирает id в Python: filter_queryset добавляет к queryset
+подзапрос MATCH, так что фильтры представления, права и keyset-пагинация
+применяются ко всем совпадениям, а не к первым N по релевантности.
+
+unicode61 приводит регистр и для кириллицы, а окончания русских слов
+срезаются лёгким стеммером и заменяются префиксным поиском, поэтому
+«программированию» находит «Программирование».
+
+Если база не SQLite или таблицы нет, поиск откатывается на icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .roles import ROLE_CURATOR
+
+PROGRAM = 'program'
+SECTION = 'section'
+CURATOR = 'curator'
+
+# Младшие биты rowid — вид документа, остальные — id объекта
+KIND_CODES = {PROGRAM: 1, SECTION: 2, CURATOR: 3}
+_KIND_BITS = 2
+
+# Веса колонок для bm25: kind, object_id, title, body
+_RANK = 'bm25(search_index, 0.0, 0.0, 10.0, 1.0)'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_SUFFIXES = sorted([
+    'иями', 'ями', 'ами', 'иях', 'ием', 'ией', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ость', 'ости', 'ние', 'ния', 'нию', 'нием', 'ать', 'ять', 'ить', 'еть',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем', 'ам', 'ям',
+    'ах', 'ях', 'ую', 'юю', 'ия', 'ья', 'ов', 'ев', 'ию',
+    'ы', 'и', 'а', 'я', 'о', 'е', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+_MIN_STEM = 3
+
+_available = None
+
+
+def is_available():
+    global _available
+    if _available is None:
+        _available = (
+            connection.vendor == 'sqlite'
+            and 'search_index' in connection.introspection.table_names()
+        )
+    return _available
+
+
+def _stem(token):
+    token = token.lower()
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def build_match(query):
+    """Строка MATCH для FTS5: все слова обязательны, каждое — как префикс основы."""
+    terms = [_stem(token) for token in _TOKEN_RE.findall(query)]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+def doc_rowid(kind, object_id):
+    return (int(object_id) << _KIND_BITS) | KIND_CODES[kind]
+
+
+# 📄 Документы
+def program_document(program):
+    return program.name, ' '.join([program.description, program.goal, program.skills])
+
+
+def section_document(section):
+    return section.name, section.description
+
+
+def curator_document(user):
+    return user.username, ' '.join(filter(None, [user.last_name, user.first_name, user.middle_name]))
+
+
+# ✍️ Обновление индекса
+def index_object(kind, object_id, title, body):
+    if not is_available():
+        return
+    rowid = doc_rowid(kind, object_id)
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index WHERE rowid = %s', [rowid])
+        cursor.execute(
+            'INSERT INTO search_index (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+            [rowid, kind, object_id, title, body],
+        )
+
+
+def remove_object(kind, object_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index WHERE rowid = %s', [doc_rowid(kind, object_id)])
+
+
+def index_program(program):
+    index_object(PROGRAM, program.pk, *program_document(program))
+
+
+def index_section(section):
+    index_object(SECTION, section.pk, *section_document(section))
+
+
+def index_curator(user):
+    """Проиндексировать пользователя, если он куратор, иначе убрать из индекса."""
+    if user.groups.filter(name=ROLE_CURATOR).exists():
+        index_object(CURATOR, user.pk, *curator_document(user))
+    else:
+        remove_object(CURATOR, user.pk)
+
+
+def rebuild():
+    """Пересобрать индекс целиком. Возвращает число документов."""
+    from .models import Program, Section, Users
+
+    if not is_available():
+        return 0
+    rows = (
+        [(PROGRAM, p.pk, *program_document(p)) for p in Program.objects.all()]
+        + [(SECTION, s.pk, *section_document(s)) for s in Section.objects.all()]
+        + [(CURATOR, u.pk, *curator_document(u)) for u in Users.objects.filter(groups__name=ROLE_CURATOR).distinct()]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM search_index')
+        cursor.executemany(
+            'INSERT INTO search_index (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+            [(doc_rowid(kind, object_id), kind, object_id, title, body) for kind, object_id, title, body in rows],
+        )
+        cursor.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+    return len(rows)
+
+
+# 🔍 Поиск
+def filter_queryset(queryset, kind, query, fallback_fields=('name',)):
+    """
+    Отфильтровать queryset по поисковому запросу и упорядочить по релевантности.
+
+    Релевантность доступна как аннотация search_rank (bm25: чем меньше, тем
+    релевантнее) — её можно использовать в ordering keyset-пагинации.
+    """
+    if not query:
+        return queryset
+
+    if not is_available():
+        filters = Q()
+        for field in fallback_fields:
+            filters |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(filters)
+
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    meta, quote = queryset.model._meta, connection.ops.quote_name
+    column = f'{quote(meta.db_table)}.{quote(meta.pk.column)}'
+    # Совпадения выбираются одним подзапросом, остальные условия queryset применяются к ним же
+    matched = RawSQL('SELECT object_id FROM search_index WHERE search_index MATCH %s AND kind = %s', [match, kind])
+    # Оценка считается только для строк результата — точечно по rowid документа
+    rank = RawSQL(
+        f'SELECT {_RANK} FROM search_index WHERE search_index MATCH %s '
+        f'AND rowid = ({column} << {_KIND_BITS}) | %s',
+        [match, KIND_CODES[kind]],
+        output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=matched).annotate(search_rank=rank).order_by('search_rank', 'pk')
@@ -0,0 +1,337 @@
+# app/signals.py
+from django.contrib.auth.models import Group
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import fragments, progress, search, stats
+from .models import (
+    Users, Section, Module, Program, Assignment, AssignmentSubmission, Enrollment, Material, MaterialProgress
+)
+from .roles import ROLE_CURATOR, invalidate_user_roles, forget_request_roles
+
+
+def _origin_model(origin):
+    """Модель, с которой началось удаление (для каскадов — родитель)."""
+    if origin is None:
+        return None
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _section_of_assignment(assignment_id):
+    return Assignment.objects.filter(pk=assignment_id).values_list('module__section_id', flat=True).first()
+
+
+def _section_of_material(material_id):
+    return Material.objects.filter(pk=material_id).values_list('module__section_id', flat=True).first()
+
+
+def _section_of_module(module_id):
+    return Module.objects.filter(pk=module_id).values_list('section_id', flat=True).first()
+
+
+# 🔐 Кэш ролей
+@receiver(m2m_changed, sender=Users.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+
+    if not reverse:
+        # user.groups.add(...) — instance это пользователь
+        forget_request_roles(instance)
+        invalidate_user_roles([instance.pk])
+        if action != 'pre_clear':
+            search.index_curator(instance)
+    elif action == 'pre_clear':
+        # group.customuser_set.clear() — после очистки участников уже не найти
+        user_ids = list(instance.customuser_set.values_list('id', flat=True))
+        invalidate_user_roles(user_ids)
+        if instance.name == ROLE_CURATOR:
+            for user_id in user_ids:
+                search.remove_object(search.CURATOR, user_id)
+    elif pk_set:
+        invalidate_user_roles(pk_set)
+        if instance.name == ROLE_CURATOR:
+            for user in Users.objects.filter(pk__in=pk_set):
+                search.index_curator(user)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_roles(instance.customuser_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(instance.customuser_set.values_list('id', flat=True))
+
+
+# 📊 Прогресс по программам
+@receiver(pre_save, sender=AssignmentSubmission)
+def remember_submission_state(sender, instance, raw=False, **kwargs):
+    instance._progress_previous = None
+    if instance.pk and not raw:
+        instance._progress_previous = (
+            AssignmentSubmission.objects.filter(pk=instance.pk)
+            .values_list('assignment_id', 'status').first()
+        )
+    previous_status = instance._progress_previous[1] if instance._progress_previous else None
+    if instance.status in ('accepted', 'rejected') and previous_status != instance.status:
+        instance.reviewed_at = timezone.now()
+
+
+@receiver(post_save, sender=AssignmentSubmission)
+def submission_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_progress_previous', None)
+    previous_status = previous[1] if previous else None
+    was_accepted = previous_status == 'accepted'
+    is_accepted = instance.status == 'accepted'
+    section_id = None
+
+    if previous and previous[0] != instance.assignment_id:
+        if was_accepted:
+            progress.change_accepted(instance.user_id, _section_of_assignment(previous[0]), -1)
+        if is_accepted:
+            section_id = _section_of_assignment(instance.assignment_id)
+            progress.change_accepted(instance.user_id, section_id, 1)
+    elif was_accepted != is_accepted:
+        section_id = _section_of_assignment(instance.assignment_id)
+        progress.change_accepted(instance.user_id, section_id, 1 if is_accepted else -1)
+
+    if previous_status != instance.status:
+        if section_id is None:
+            section_id = _section_of_assignment(instance.assignment_id)
+        reviewed_at = instance.reviewed_at if instance.status != 'submitted' else None
+        stats.record_submission_status(
+            instance.user_id, section_id, previous_status, instance.status, reviewed_at,
+        )
+
+
+@receiver(post_delete, sender=AssignmentSubmission)
+def submission_deleted(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении задания счётчики уже поправлены в assignment_deleted
+    if _origin_model(origin) not in (None, AssignmentSubmission):
+        return
+    if instance.status == 'accepted':
+        progress.change_accepted(instance.user_id, _section_of_assignment(instance.assignment_id), -1)
+
+
+@receiver(pre_save, sender=Assignment)
+def remember_assignment_section(sender, instance, raw=False, **kwargs):
+    instance._progress_section_id = None
+    if instance.pk and not raw:
+        instance._progress_section_id = _section_of_assignment(instance.pk)
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    section_id = _section_of_module(instance.module_id)
+    if created:
+        progress.change_assignments_total(section_id, 1)
+        return
+    old_section_id = getattr(instance, '_progress_section_id', None)
+    if old_section_id is not None and old_section_id != section_id:
+        progress.rebuild_section_progress(old_section_id)
+        progress.rebuild_section_progress(section_id)
+
+
+@receiver(pre_delete, sender=Assignment)
+def assignment_deleted(sender, instance, origin=None, **kwargs):
+    # Раздел удаляется вместе с программами — пересчитывать нечего
+    if _origin_model(origin) is Section:
+        return
+    progress.change_assignments_total(
+        _section_of_assignment(instance.pk), -1,
+        progress.accepted_by_user(instance.submissions.all()),
+    )
+
+
+@receiver(post_save, sender=MaterialProgress)
+def material_viewed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        section_id = _section_of_material(instance.material_id)
+        progress.change_viewed(instance.user_id, section_id, 1)
+        stats.record_material_view(instance.user_id, section_id, instance.viewed_at)
+
+
+@receiver(post_delete, sender=MaterialProgress)
+def material_unviewed(sender, instance, origin=None, **kwargs):
+    # При удалении материала счётчики поправлены в material_deleted
+    if _origin_model(origin) in (None, MaterialProgress):
+        progress.change_viewed(instance.user_id, _section_of_material(instance.material_id), -1)
+
+
+@receiver(pre_save, sender=Material)
+def remember_material_section(sender, instance, raw=False, **kwargs):
+    instance._progress_section_id = None
+    if instance.pk and not raw:
+        instance._progress_section_id = _section_of_material(instance.pk)
+
+
+@receiver(post_save, sender=Material)
+def material_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    section_id = _section_of_module(instance.module_id)
+    if created:
+        progress.change_materials_total(section_id, 1)
+        return
+    old_section_id = getattr(instance, '_progress_section_id', None)
+    if old_section_id is not None and old_section_id != section_id:
+        progress.rebuild_section_progress(old_section_id)
+        progress.rebuild_section_progress(section_id)
+
+
+@receiver(pre_delete, sender=Material)
+def material_deleted(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Section:
+        return
+    progress.change_materials_total(
+        _section_of_material(instance.pk), -1, progress.viewed_by_user(instance),
+    )
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_section(sender, instance, raw=False, **kwargs):
+    instance._progress_section_id = None
+    if instance.pk and not raw:
+        instance._progress_section_id = (
+            Module.objects.filter(pk=instance.pk).values_list('section_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Module)
+def module_saved(sender, instance, created, raw=False, **kwargs):
+    old_section_id = getattr(instance, '_progress_section_id', None)
+    if raw or created or old_section_id in (None, instance.section_id):
+        return
+    progress.rebuild_section_progress(old_section_id)
+    progress.rebuild_section_progress(instance.section_id)
+
+
+@receiver(pre_save, sender=Program)
+def remember_program_section(sender, instance, raw=False, **kwargs):
+    instance._progress_section_id = None
+    if instance.pk and not raw:
+        instance._progress_section_id = (
+            Program.objects.filter(pk=instance.pk).values_list('section_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Program)
+def program_saved(sender, instance, created, raw=False, **kwargs):
+    old_section_id = getattr(instance, '_progress_section_id', None)
+    if raw or created or old_section_id in (None, instance.section_id):
+        return
+    progress.rebuild_progress(Enrollment.objects.filter(program=instance))
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.record_enrollment(instance)
+    if instance.is_approved:
+        progress.refresh_program_progress(instance.user_id, instance.program_id)
+    else:
+        progress.drop_program_progress(instance.user_id, instance.program_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) in (None, Enrollment):
+        progress.drop_program_progress(instance.user_id, instance.program_id)
+
+
+# 🔍 Поисковый индекс
+@receiver(post_save, sender=Program)
+def index_program(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_program(instance)
+
+
+@receiver(post_delete, sender=Program)
+def unindex_program(sender, instance, **kwargs):
+    search.remove_object(search.PROGRAM, instance.pk)
+
+
+@receiver(post_save, sender=Section)
+def index_section(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_section(instance)
+
+
+@receiver(post_delete, sender=Section)
+def unindex_section(sender, instance, **kwargs):
+    search.remove_object(search.SECTION, instance.pk)
+
+
+_CURATOR_DOCUMENT_FIELDS = {'username', 'first_name', 'last_name', 'middle_name'}
+
+
+@receiver(post_save, sender=Users)
+def index_curator(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Новый пользователь ещё без групп — куратором его сделает m2m_changed.
+    # Сохранение last_login при входе индекс не трогает.
+    if raw or created or (update_fields and not _CURATOR_DOCUMENT_FIELDS & set(update_fields)):
+        return
+    search.index_curator(instance)
+
+
+@receiver(post_delete, sender=Users)
+def unindex_curator(sender, instance, **kwargs):
+    search.remove_object(search.CURATOR, instance.pk)
+
+
+# 🗂 Версии кэша фрагментов каталога
+_FRAGMENT_GROUPS = {
+    Program: fragments.PROGRAMS,
+    Section: fragments.SECTIONS,
+    Module: fragments.MODULES,
+    Material: fragments.MATERIALS,
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_catalog_version(sender, **kwargs):
+    if sender in _FRAGMENT_GROUPS:
+        fragments.bump(_FRAGMENT_GROUPS[sender])
+
+
+@receiver(m2m_changed, sender=Program.curators.through)
+def program_curators_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        fragments.bump(fragments.CURATORS)
+
+
+@receiver(m2m_changed, sender=Users.groups.through)
+def curator_group_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # При clear() затронутые группы неизвестны; новый участник в группе «Пользователь» список не меняет
+    if reverse:
+        affected = instance.name == ROLE_CURATOR
+    else:
+        affected = action == 'post_clear' or Group.objects.filter(pk__in=pk_set, name=ROLE_CURATOR).exists()
+    if affected:
+        fragments.bump(fragments.CURATORS)
+
+
+@receiver(post_save, sender=Users)
+def curator_profile_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or (update_fields and not _CURATOR_DOCUMENT_FIELDS & set(update_fields)):
+        return
+    fragments.bump(fragments.CURATORS)
+
+
+@receiver(post_delete, sender=Users)
+def curator_deleted(sender, **kwargs):
+    fragments.bump(fragments.CURATORS)
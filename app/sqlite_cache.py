@@ -0,0 +1,283 @@
+# app/sqlite_cache.py
+"""
+Кэш Django в файле SQLite, общий для всех воркеров на одном сервере.
+
+LocMemCache у каждого процесса gunicorn свой, а Redis/memcached у нас
+нет. Этот бэкенд хранит записи в одном файле SQLite (WAL, поэтому чтения
+не ждут записи):
+
+* get — один SELECT по первичному ключу на соединении, которое живёт
+  всё время жизни потока;
+* incr — один атомарный UPDATE ... RETURNING, годится для счётчиков
+  версий (app/fragments.py);
+* вытеснение LRU по времени последнего чтения при превышении MAX_ENTRIES
+  записей или MAX_SIZE байт. Время чтения обновляется не чаще раза
+  в TOUCH_INTERVAL секунд, чтобы get почти никогда не писал в файл.
+
+Пример:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'app.sqlite_cache.SQLiteCache',
+            'LOCATION': BASE_DIR / 'db' / 'cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 50000, 'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+
+Сравнение с LocMemCache и FileBasedCache: `python manage.py benchcache`.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_totals VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_resize AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 1;
+END;
+'''
+
+_UPSERT = (
+    'INSERT INTO cache_entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+    'expires = excluded.expires, accessed = excluded.accessed'
+)
+
+# Сколько ключей в одном IN (...), с запасом под лимит параметров SQLite
+_CHUNK = 500
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+def _encode(value):
+    # Целые храним как есть, чтобы incr работал в SQL; bool — подкласс int, его пиклим
+    if type(value) is int and _INT64[0] <= value <= _INT64[1]:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+def _alive(expires, now):
+    return expires is None or expires > now
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 10))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    # 🔌 Соединение: своё у каждого потока, после fork — новое
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            # Кэш можно потерять при сбое питания — полная синхронизация не нужна
+            db.execute('PRAGMA synchronous=OFF')
+            db.execute('PRAGMA mmap_size=67108864')
+            db.executescript(f'BEGIN IMMEDIATE; {_SCHEMA} COMMIT;')
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _write(self, func):
+        """Несколько операторов в одной транзакции, сразу с блокировкой записи."""
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _touch_stale(self, db, keys, now):
+        try:
+            db.executemany(
+                'UPDATE cache_entries SET accessed = ? WHERE key = ?', [(now, key) for key in keys]
+            )
+        except sqlite3.OperationalError:
+            # Файл занят записью — порядок LRU подождёт до следующего чтения
+            pass
+
+    def _cull(self, db):
+        entries, size = db.execute('SELECT entries, bytes FROM cache_totals').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        db.execute('DELETE FROM cache_entries WHERE expires <= ?', (time.time(),))
+        entries, size = db.execute('SELECT entries, bytes FROM cache_totals').fetchone()
+        # Освобождаем с запасом (1/CULL_FREQUENCY), чтобы не чистить на каждой записи
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        excess_entries = entries - int(self._max_entries * keep)
+        excess_bytes = size - int(self._max_size * keep)
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        db.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            ' SELECT key FROM ('
+            '  SELECT key, size,'
+            '   ROW_NUMBER() OVER (ORDER BY accessed, key) AS position,'
+            '   SUM(size) OVER (ORDER BY accessed, key) AS freed'
+            '  FROM cache_entries)'
+            ' WHERE position <= ? OR freed - size < ?)',
+            (excess_entries, excess_bytes),
+        )
+
+    # 📦 API кэша
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db()
+        row = db.execute(
+            'SELECT value, expires, accessed FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or not _alive(row[1], now):
+            return default
+        if now - row[2] > self._touch_interval:
+            self._touch_stale(db, [key], now)
+        return _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        db = self._db()
+        now = time.time()
+        found, stale = {}, []
+        keys = list(key_map)
+        for start in range(0, len(keys), _CHUNK):
+            chunk = keys[start:start + _CHUNK]
+            rows = db.execute(
+                'SELECT key, value, expires, accessed FROM cache_entries '
+                f"WHERE key IN ({', '.join('?' * len(chunk))})", chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if not _alive(expires, now):
+                    continue
+                found[key_map[key]] = _decode(value)
+                if now - accessed > self._touch_interval:
+                    stale.append(key)
+        if stale:
+            self._touch_stale(db, stale, now)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data, size = _encode(value)
+        row = (key, data, size, self._expires(timeout), time.time())
+
+        def write(db):
+            db.execute(_UPSERT, row)
+            self._cull(db)
+
+        self._write(write)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self._expires(timeout), time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), *_encode(value), expires, now)
+            for key, value in data.items()
+        ]
+
+        def write(db):
+            db.executemany(_UPSERT, rows)
+            self._cull(db)
+
+        self._write(write)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data, size = _encode(value)
+        now = time.time()
+
+        def write(db):
+            # Перезаписываем только истёкшую запись
+            added = db.execute(
+                _UPSERT + ' WHERE cache_entries.expires <= ?',
+                (key, data, size, self._expires(timeout), now, now),
+            ).rowcount
+            if added:
+                self._cull(db)
+            return bool(added)
+
+        return self._write(write)
+
+    def incr(self, key, delta=1, version=None):
+        validated = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            "UPDATE cache_entries SET value = value + ? WHERE key = ? AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, validated, time.time()),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        # Нет ключа (ValueError) или значение не целое — обычный get + set
+        return super().incr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        return bool(self._db().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), now, key, now),
+        ).rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._db().execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount)
+
+    def delete_many(self, keys, version=None):
+        rows = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        if rows:
+            self._write(lambda db: db.executemany('DELETE FROM cache_entries WHERE key = ?', rows))
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Django закрывает кэши после каждого запроса; соединение живёт дольше
+        pass
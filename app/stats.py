@@ -0,0 +1,210 @@
+# app/stats.py
+"""
+Дневные агрегаты для страницы статистики.
+
+DailyProgramStats хранит по строке на (день, программа): новые заявки,
+отправленные ответы, принятые/отклонённые ответы и просмотры материалов.
+Счётчики увеличиваются сигналами в момент события (app/signals.py), а
+команда `python manage.py backfillstats` пересчитывает их по исходным
+таблицам. Страница статистики читает только агрегаты.
+
+Ответ или просмотр материала относится к тем программам раздела,
+на которые записан пользователь.
+
+Даты заявок и просмотров появились в миграции 0007; у строк, созданных
+раньше, они пустые. backfill такие строки не относит ни к какому дню,
+их число показывает undated().
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import AssignmentSubmission, DailyProgramStats, Enrollment, MaterialProgress
+
+COUNTERS = ('enrollments', 'submissions', 'accepted', 'rejected', 'material_views')
+
+
+def _day(moment=None):
+    return timezone.localdate(moment) if moment else timezone.localdate()
+
+
+def user_programs_in_section(user_id, section_id):
+    if section_id is None:
+        return []
+    return list(
+        Enrollment.objects.filter(user_id=user_id, program__section_id=section_id)
+        .values_list('program_id', flat=True)
+    )
+
+
+def bump(program_ids, day=None, **deltas):
+    """Прибавить deltas к счётчикам дня для программ. Два запроса на вызов."""
+    deltas = {field: n for field, n in deltas.items() if n}
+    if not program_ids or not deltas:
+        return
+    day = day or _day()
+    DailyProgramStats.objects.bulk_create(
+        [DailyProgramStats(day=day, program_id=program_id) for program_id in program_ids],
+        ignore_conflicts=True,
+    )
+    DailyProgramStats.objects.filter(day=day, program_id__in=program_ids).update(
+        **{field: F(field) + n for field, n in deltas.items()}
+    )
+
+
+def bump_many(events):
+    """
+    Пакетный вариант bump для массовых операций.
+
+    events — {(day, program_id): Counter(поле=n)}; запросов столько,
+    сколько различных наборов приращений, а не событий.
+    """
+    events = {key: counter for key, counter in events.items() if +counter}
+    if not events:
+        return
+    DailyProgramStats.objects.bulk_create(
+        [DailyProgramStats(day=day, program_id=program_id) for day, program_id in events],
+        ignore_conflicts=True,
+    )
+    groups = defaultdict(list)
+    for (day, program_id), counter in events.items():
+        groups[(day, tuple(sorted((+counter).items())))].append(program_id)
+    for (day, deltas), program_ids in groups.items():
+        DailyProgramStats.objects.filter(day=day, program_id__in=program_ids).update(
+            **{field: F(field) + n for field, n in deltas}
+        )
+
+
+def record_enrollment(enrollment):
+    bump([enrollment.program_id], _day(enrollment.created_at), enrollments=1)
+
+
+def record_submission_status(user_id, section_id, previous_status, status, moment=None):
+    """Учесть отправку или проверку ответа."""
+    deltas = {}
+    if status == 'submitted' and previous_status != 'submitted':
+        deltas['submissions'] = 1
+    elif status in ('accepted', 'rejected') and previous_status != status:
+        deltas[status] = 1
+    if deltas:
+        bump(user_programs_in_section(user_id, section_id), _day(moment), **deltas)
+
+
+def record_material_view(user_id, section_id, moment=None):
+    bump(user_programs_in_section(user_id, section_id), _day(moment), material_views=1)
+
+
+# 🔁 Пересчёт по исходным таблицам
+def _in_range(queryset, field, since, until):
+    if since:
+        queryset = queryset.filter(**{f'{field}__date__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{field}__date__lte': until})
+    return queryset
+
+
+def backfill(since=None, until=None):
+    """
+    Пересчитать агрегаты за период (включительно). Возвращает число строк.
+
+    Восстанавливается то, что видно по текущему состоянию строк: повторные
+    отправки и промежуточные проверки одного ответа не сохраняются, поэтому
+    после пересчёта счётчики могут быть меньше накопленных сигналами.
+    Заявки и просмотры без даты пропускаются (см. undated).
+    """
+    totals = defaultdict(Counter)
+
+    enrollments = _in_range(Enrollment.objects.filter(created_at__isnull=False), 'created_at', since, until)
+    for day, program_id, n in (
+        enrollments.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'program_id').annotate(n=Count('id'))
+    ):
+        totals[(day, program_id)]['enrollments'] += n
+
+    # Ответ засчитывается программам раздела, на которые записан автор
+    submissions = AssignmentSubmission.objects.filter(
+        user__enrollments__program__section_id=F('assignment__module__section_id')
+    )
+    for day, program_id, n in (
+        _in_range(submissions, 'submitted_at', since, until)
+        .annotate(day=TruncDate('submitted_at'))
+        .values_list('day', 'user__enrollments__program_id').annotate(n=Count('id'))
+    ):
+        totals[(day, program_id)]['submissions'] += n
+
+    reviewed = submissions.filter(status__in=['accepted', 'rejected']).annotate(
+        reviewed=Coalesce('reviewed_at', 'submitted_at')
+    )
+    for day, program_id, status, n in (
+        _in_range(reviewed, 'reviewed', since, until)
+        .annotate(day=TruncDate('reviewed'))
+        .values_list('day', 'user__enrollments__program_id', 'status').annotate(n=Count('id'))
+    ):
+        totals[(day, program_id)][status] += n
+
+    views = MaterialProgress.objects.filter(
+        viewed_at__isnull=False,
+        user__enrollments__program__section_id=F('material__module__section_id'),
+    )
+    for day, program_id, n in (
+        _in_range(views, 'viewed_at', since, until)
+        .annotate(day=TruncDate('viewed_at'))
+        .values_list('day', 'user__enrollments__program_id').annotate(n=Count('id'))
+    ):
+        totals[(day, program_id)]['material_views'] += n
+
+    with transaction.atomic():
+        existing = DailyProgramStats.objects.all()
+        if since:
+            existing = existing.filter(day__gte=since)
+        if until:
+            existing = existing.filter(day__lte=until)
+        existing.delete()
+        DailyProgramStats.objects.bulk_create(
+            [
+                DailyProgramStats(day=day, program_id=program_id, **counter)
+                for (day, program_id), counter in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def undated():
+    """Сколько заявок и просмотров без даты: они не попадают в дневную статистику."""
+    return {
+        'enrollments': Enrollment.objects.filter(created_at__isnull=True).count(),
+        'material_views': MaterialProgress.objects.filter(viewed_at__isnull=True).count(),
+    }
+
+
+# 📈 Чтение для страницы статистики
+def _with_rate(row):
+    reviewed = row['accepted'] + row['rejected']
+    row['acceptance_rate'] = round(row['accepted'] * 100 / reviewed) if reviewed else None
+    return row
+
+
+def dashboard(days=30, program_id=None):
+    since = _day() - timedelta(days=days - 1)
+    queryset = DailyProgramStats.objects.filter(day__gte=since)
+    if program_id:
+        queryset = queryset.filter(program_id=program_id)
+    sums = {field: Sum(field) for field in COUNTERS}
+
+    by_day = [_with_rate(row) for row in queryset.values('day').annotate(**sums).order_by('day')]
+    by_program = [
+        _with_rate(row)
+        for row in queryset.values('program_id', 'program__name').annotate(**sums).order_by('-submissions', 'program__name')
+    ]
+    totals = _with_rate({field: sum(row[field] for row in by_day) for field in COUNTERS})
+
+    peak = max([row['submissions'] for row in by_day] + [1])
+    for row in by_day:
+        row['submissions_percent'] = round(row['submissions'] * 100 / peak)
+
+    return {'since': since, 'by_day': by_day, 'by_program': by_program, 'totals': totals}
@@ -0,0 +1,176 @@
+# app/streaming.py
+"""
+Отдача файлов из хранилища с поддержкой HTTP Range, ETag/Last-Modified
+и выгрузкой отдачи на веб-сервер (X-Accel-Redirect / X-Sendfile).
+
+Под ASGI тело отдаётся асинхронным итератором, под WSGI — синхронным:
+итератор «чужого» вида Django сначала читает в память целиком.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Разобрать заголовок Range. Поддерживается один диапазон;
+    возвращает (start, end) включительно или None, если заголовок не применим.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # В пустом файле нет ни одного байта, который можно вернуть
+        raise RangeNotSatisfiable
+    if not first:
+        # bytes=-500 — последние 500 байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def iter_file_range(fileobj, start, end, chunk_size=CHUNK_SIZE):
+    try:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fileobj.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+async def aiter_file_range(fileobj, start, end, chunk_size=CHUNK_SIZE):
+    """iter_file_range для ASGI: файл читается в пуле потоков, цикл событий не ждёт диск."""
+    read = sync_to_async(fileobj.read, thread_sensitive=False)
+    try:
+        await sync_to_async(fileobj.seek, thread_sensitive=False)(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(fileobj.close, thread_sensitive=False)()
+
+
+def file_validators(fieldfile):
+    """ETag и время изменения файла — без чтения содержимого."""
+    storage = fieldfile.storage
+    size = storage.size(fieldfile.name)
+    mtime = int(storage.get_modified_time(fieldfile.name).timestamp())
+    return size, f'"{size:x}-{mtime:x}"', mtime
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _sendfile_response(fieldfile, content_type):
+    backend = getattr(settings, 'MATERIAL_SENDFILE_BACKEND', None)
+    response = HttpResponse(content_type=content_type)
+    if backend == 'x-accel-redirect':
+        # nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+        prefix = getattr(settings, 'MATERIAL_SENDFILE_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = quote(prefix + fieldfile.name)
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = fieldfile.path
+    else:
+        raise ValueError(f'Неизвестный MATERIAL_SENDFILE_BACKEND: {backend}')
+    return response
+
+
+def serve_file(request, fieldfile, filename=None, as_attachment=False):
+    """
+    Ответ с содержимым FieldFile. Поддерживает условные запросы (304/412),
+    один Range-диапазон (206/416) и, если задан MATERIAL_SENDFILE_BACKEND,
+    передаёт отдачу веб-серверу — тогда Range обслуживает он.
+
+    Сама функция синхронная (stat и open файла); из async-представления её
+    вызывают через sync_to_async.
+    """
+    asynchronous = isinstance(request, ASGIRequest)
+    filename = filename or os.path.basename(fieldfile.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    size, etag, mtime = file_validators(fieldfile)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is not None:
+        return not_modified
+
+    if getattr(settings, 'MATERIAL_SENDFILE_BACKEND', None):
+        response = _sendfile_response(fieldfile, content_type)
+    else:
+        byte_range = None
+        range_header = request.headers.get('Range')
+        if range_header and _if_range_matches(request, etag, mtime):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None and asynchronous:
+            response = StreamingHttpResponse(
+                aiter_file_range(fieldfile.open('rb'), 0, size - 1), content_type=content_type,
+            )
+            response['Content-Length'] = str(size)
+        elif byte_range is None:
+            response = FileResponse(fieldfile.open('rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            body = aiter_file_range if asynchronous else iter_file_range
+            response = StreamingHttpResponse(
+                body(fieldfile.open('rb'), start, end),
+                status=206, content_type=content_type,
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
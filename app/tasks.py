@@ -0,0 +1,49 @@
+# app/tasks.py
+"""
+Фоновые задачи, которые вьюхи ставят в очередь (см. app/jobs.py).
+
+Задача сама открывает короткие транзакции: SQLite с BEGIN IMMEDIATE держит
+блокировку записи на всю транзакцию, и долгая работа внутри неё (рендер PDF)
+остановила бы все записи сайта.
+"""
+from . import writes
+from .certificates import attach_files, certificate_key_for, is_certificate_file_current, render_to_storage
+from .jobs import job
+from .models import Certificate, Program, Section
+
+ATTACH_BATCH = 100
+
+
+@job(name='certificates.render')
+def render_certificates(pairs):
+    """Заранее отрендерить PDF выданных сертификатов: pairs = [[user_id, program_id], ...]."""
+    wanted = {tuple(pair) for pair in pairs}
+    certificates = (
+        Certificate.objects.select_related('user', 'program')
+        .filter(user_id__in={user_id for user_id, _ in wanted},
+                program_id__in={program_id for _, program_id in wanted})
+    )
+    names = {}
+    for certificate in certificates:
+        if (certificate.user_id, certificate.program_id) not in wanted:
+            continue
+        key = certificate_key_for(certificate)
+        if is_certificate_file_current(certificate, key):
+            continue
+        # Рендер — вне транзакции; в базу пишутся только имена файлов, пачками
+        names[certificate.pk] = render_to_storage(key, certificate.user.username, certificate.program.name)
+        if len(names) >= ATTACH_BATCH:
+            writes.atomic_with_retry(attach_files, names)
+            names = {}
+    if names:
+        writes.atomic_with_retry(attach_files, names)
+
+
+@job(name='programs.delete')
+def delete_program(program_id):
+    writes.atomic_with_retry(Program.objects.filter(pk=program_id).delete)
+
+
+@job(name='sections.delete')
+def delete_section(section_id):
+    writes.atomic_with_retry(Section.objects.filter(pk=section_id).delete)
@@ -0,0 +1,31 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+def _srcset(sources):
+    return ', '.join(f'{url} {width}w' for url, width in sources)
+
+
+@register.inclusion_tag('responsive_image.html')
+def responsive_image(image, alt='', sizes='100vw', css_class='', style=''):
+    """
+    <picture> с уменьшенными копиями изображения (app/thumbnails.py): WebP
+    и JPEG в srcset, браузер сам выбирает ширину по sizes.
+    Если копии сделать не удалось — обычный <img> с исходником.
+    """
+    manifest = thumbnails.manifest_for(image)
+    context = {'alt': alt, 'sizes': sizes, 'css_class': css_class, 'style': style, 'manifest': manifest}
+    if manifest is None:
+        context['src'] = image.url if image else ''
+        return context
+    jpeg = manifest['sources'].get('jpeg', [])
+    context.update({
+        'webp_srcset': _srcset(manifest['sources'].get('webp', [])),
+        'jpeg_srcset': _srcset(jpeg),
+        # Для браузеров без srcset — самая маленькая копия
+        'src': jpeg[0][0] if jpeg else image.url,
+    })
+    return context
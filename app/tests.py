@@ -1,3 +1,1001 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    fragments, jobs, metrics, progress, roles, routers, search, stats, streaming, uploads, warmup, writes,
+)
+from .models import (
+    Users, Section, Module, Program, Assignment, AssignmentSubmission, Enrollment, DailyProgramStats,
+    Material, MaterialProgress, Certificate, Job, ProgramProgress, UploadSession,
+)
+from .forms import MaterialForm
+from .pagination import encode_cursor, paginate
+from .roles import ROLE_CURATOR
+from .sqlite_cache import SQLiteCache
+
+
+class StudyHubTestCase(TestCase):
+    """
+    Общий кэш (SQLite) и MEDIA_ROOT на время тестов переносятся во временный
+    каталог, чтобы не задевать рабочие файлы; метрики запросов выключены.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.mkdtemp()
+        cls._settings = override_settings(
+            CACHES={'default': {
+                'BACKEND': 'app.sqlite_cache.SQLiteCache',
+                'LOCATION': f'{cls._tmp}/cache.sqlite3',
+            }},
+            MEDIA_ROOT=f'{cls._tmp}/media',
+            CHUNKED_UPLOAD_ROOT=f'{cls._tmp}/uploads',
+            METRICS_ENABLED=False,
+            JOBS_EAGER=True,
+            MATERIAL_VIEWS_FLUSH_INTERVAL=0,
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        )
+        cls._settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._settings.disable()
+        shutil.rmtree(cls._tmp, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('initroles', stdout=io.StringIO())
+
+    @staticmethod
+    def make_user(username, role=None):
+        user = Users.objects.create_user(username, 'password')
+        if role:
+            user.groups.set([Group.objects.get(name=role)])
+        return user
+
+
+# 📊 Бюджеты SQL-запросов (settings.QUERY_BUDGETS)
+class QueryBudgetTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.curator = cls.make_user('curator', ROLE_CURATOR)
+        section = Section.objects.create(name='Раздел', description='')
+        module = Module.objects.create(name='Модуль', description='', section=section)
+        programs = [
+            Program.objects.create(name=f'Программа {i}', description='', section=section, goal='', skills='')
+            for i in range(3)
+        ]
+        for program in programs:
+            program.curators.add(cls.curator)
+        assignments = [
+            Assignment.objects.create(module=module, title=f'Задание {i}', description='') for i in range(5)
+        ]
+        cls.students = [cls.make_user(f'student{i}') for i in range(25)]
+        for student in cls.students:
+            for program in programs:
+                Enrollment.objects.create(user=student, program=program, is_approved=True)
+            for assignment in assignments:
+                AssignmentSubmission.objects.create(assignment=assignment, user=student, answer_text='ответ')
+
+    def assertWithinBudget(self, user, url_name):
+        self.client.force_login(user)
+        with metrics.query_budget(url_name=url_name):
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile(self):
+        self.assertWithinBudget(self.students[0], 'profile')
+
+    def test_assignments_participant(self):
+        self.assertWithinBudget(self.students[0], 'assignments')
+
+    def test_assignments_curator(self):
+        self.assertWithinBudget(self.curator, 'assignments')
+
+    def test_manage_enrollments(self):
+        self.assertWithinBudget(self.curator, 'enrollments_manage')
+
+    def test_submissions_to_check(self):
+        self.assertWithinBudget(self.curator, 'submissions_to_check')
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(metrics.QueryBudgetExceeded):
+            with metrics.query_budget(1):
+                list(Users.objects.all())
+                list(Program.objects.all())
+
+
+# ⏱ Время рендеринга в метриках
+class RenderTimeMetricsTests(StudyHubTestCase):
+    def test_render_time_recorded(self):
+        user = self.make_user('student')
+        self.client.force_login(user)
+        with override_settings(METRICS_ENABLED=True, METRICS_SAMPLE_RATE=1.0, METRICS_DB=f'{self._tmp}/metrics.sqlite3'):
+            # Цепочка middleware пересобирается, чтобы QueryMetricsMiddleware включился
+            self.client.handler.load_middleware()
+            self.client.get(reverse('profile'))
+            rows = {row['url_name']: row for row in metrics.report(hours=1)}
+        self.assertGreater(rows['profile']['avg_render_ms'], 0)
+
+    def test_one_connection_per_process(self):
+        recorder = metrics.QueryRecorder()
+        with override_settings(METRICS_DB=f'{self._tmp}/metrics-a.sqlite3'):
+            metrics.record('a', 'GET', 200, 0.01, recorder)
+            metrics.flush()
+            first = metrics._db[2]
+            metrics.record('a', 'GET', 200, 0.01, recorder)
+            self.assertEqual(metrics.report(hours=1)[0]['requests'], 2)
+            self.assertIs(metrics._db[2], first)
+        with override_settings(METRICS_DB=f'{self._tmp}/metrics-b.sqlite3'):
+            self.assertEqual(metrics.report(hours=1), [])
+            self.assertIsNot(metrics._db[2], first)
+
+    def test_nested_render_counted_once(self):
+        recorder = metrics.QueryRecorder()
+        with recorder.track_renders():
+            with metrics.render_timer():
+                outer = recorder.render_time
+                with metrics.render_timer():
+                    pass
+                self.assertEqual(recorder.render_time, outer)
+        self.assertGreater(recorder.render_time, 0)
+
+
+# 🔍 Полнотекстовый поиск
+class SearchTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.first, cls.second = [Section.objects.create(name=f'Раздел {i}', description='') for i in range(2)]
+        # Больше совпадений, чем прежний предел в 500 id; во втором разделе — самые слабые по bm25
+        Program.objects.bulk_create(
+            [Program(name='Программирование на Python', description='', section=cls.first, goal='', skills='')
+             for _ in range(520)]
+            + [Program(name='Основы', description='программирование ' + 'текст ' * 50,
+                       section=cls.second, goal='', skills='') for _ in range(30)]
+        )
+        search.rebuild()
+
+    def test_filters_apply_to_all_matches(self):
+        programs = search.filter_queryset(Program.objects.filter(section=self.second), search.PROGRAM, 'программированию')
+        self.assertEqual(programs.count(), 30)
+
+    def test_keyset_pages_past_all_matches(self):
+        programs = search.filter_queryset(Program.objects.all(), search.PROGRAM, 'программирование')
+        request = RequestFactory().get('/')
+        seen = []
+        while True:
+            page = paginate(programs, request, ordering=('search_rank', 'pk'), per_page=100)
+            seen += [program.pk for program in page]
+            if not page.has_next:
+                break
+            request = RequestFactory().get('/', {'cursor': page.next_cursor})
+        self.assertEqual(len(seen), 550)
+        self.assertEqual(len(set(seen)), 550)
+
+    def test_reindex_replaces_document(self):
+        program = Program.objects.filter(section=self.second).first()
+        program.name = 'Алгоритмы'
+        program.save()
+        search.index_program(program)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM search_index WHERE rowid = %s', [search.doc_rowid(search.PROGRAM, program.pk)])
+            self.assertEqual(cursor.fetchone()[0], 1)
+        found = search.filter_queryset(Program.objects.all(), search.PROGRAM, 'алгоритмы')
+        self.assertEqual(list(found), [program])
+        search.remove_object(search.PROGRAM, program.pk)
+        self.assertFalse(search.filter_queryset(Program.objects.all(), search.PROGRAM, 'алгоритмы').exists())
+
+
+# 📈 Дневная статистика
+class BackfillStatsTests(StudyHubTestCase):
+    def test_undated_rows_are_skipped_and_reported(self):
+        section = Section.objects.create(name='Раздел', description='')
+        program = Program.objects.create(name='Программа', description='', section=section, goal='', skills='')
+        dated, undated = self.make_user('dated'), self.make_user('undated')
+        Enrollment.objects.create(user=dated, program=program)
+        Enrollment.objects.create(user=undated, program=program, created_at=None)
+
+        stats.backfill()
+
+        self.assertEqual(
+            list(DailyProgramStats.objects.values_list('day', 'enrollments')),
+            [(timezone.localdate(), 1)],
+        )
+        self.assertEqual(stats.undated(), {'enrollments': 1, 'material_views': 0})
+
+
+# 📱 JSON API
+class ApiTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.curator = cls.make_user('curator', ROLE_CURATOR)
+        cls.student = cls.make_user('student')
+        cls.section = Section.objects.create(name='Раздел', description='')
+        cls.programs = [
+            Program.objects.create(name=f'Программа {i}', description='', section=cls.section, goal='', skills='')
+            for i in range(30)
+        ]
+        for program in cls.programs:
+            program.curators.add(cls.curator)
+
+    def url(self, resource, **params):
+        return f"{reverse('api_collection', args=[resource])}?{urlencode(params)}"
+
+    def get_json(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    # 🔐 Доступ
+    def test_anonymous_does_not_see_curators(self):
+        program = self.get_json(self.url('programs'))['results'][0]
+        self.assertNotIn('curators', program)
+        self.get_json(self.url('programs', include='curators'), status=401)
+        self.get_json(self.url('programs', fields='name,curators'), status=401)
+        self.get_json(self.url('programs', **{'fields[users]': 'username'}), status=401)
+
+    def test_authenticated_sees_curators(self):
+        self.client.force_login(self.student)
+        program = self.get_json(self.url('programs', include='curators'))['results'][0]
+        self.assertEqual([curator['username'] for curator in program['curators']], ['curator'])
+
+    def test_etag_depends_on_login(self):
+        anonymous = self.client.get(self.url('programs'))
+        self.client.force_login(self.student)
+        response = self.client.get(self.url('programs'), HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('curators', response.json()['results'][0])
+
+    def test_roles(self):
+        self.get_json(self.url('enrollments'), status=401)
+        data = {'name': 'Новая', 'description': '-', 'goal': '-', 'skills': '-', 'section': self.section.pk}
+
+        self.client.force_login(self.student)
+        response = self.client.post(self.url('programs'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        enrollment = Enrollment.objects.create(user=self.student, program=self.programs[0])
+        item = reverse('api_item', args=['enrollments', enrollment.pk])
+        response = self.client.patch(item, {'is_approved': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.curator)
+        response = self.client.post(self.url('programs'), data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.patch(item, {'is_approved': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_approved'])
+
+    # 🗄 Запросы к базе
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.get_json(url)
+        return context.captured_queries
+
+    def test_include_does_not_depend_on_page_size(self):
+        self.client.force_login(self.student)
+        small = self.count_queries(self.url('programs', include='section,curators', limit=5))
+        large = self.count_queries(self.url('programs', include='section,curators', limit=30))
+        self.assertEqual(len(small), len(large))
+
+    def test_sparse_fields_limit_columns(self):
+        results = self.get_json(self.url('programs', fields='name'))['results']
+        self.assertEqual(set(results[0]), {'id', 'name'})
+        queries = self.count_queries(self.url('programs', fields='name', limit=7))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0]['sql'])
+
+    # 🏷 Условные запросы
+    def test_not_modified(self):
+        response = self.client.get(self.url('programs'))
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url('programs'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        self.client.force_login(self.student)
+        enrollments = self.client.get(self.url('enrollments'))
+        again = self.client.get(self.url('enrollments'), HTTP_IF_NONE_MATCH=enrollments['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        response = self.client.get(self.url('programs'))
+        self.programs[0].name = 'Переименована'
+        self.programs[0].save()
+        again = self.client.get(self.url('programs'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+
+    # 🚫 Некорректные параметры
+    def test_bad_parameters(self):
+        for params in (
+            {'limit': '0'}, {'limit': '101'}, {'limit': 'abc'},
+            {'section': 'abc'}, {'fields': 'nope'}, {'include': 'nope'},
+            {'fields[nope]': 'name'},
+        ):
+            with self.subTest(params=params):
+                self.assertIn('error', self.get_json(self.url('programs', **params), status=400))
+
+
+# 🎯 Инкрементальные счётчики прогресса
+class ProgressCountersTests(StudyHubTestCase):
+    """После каждой операции счётчики совпадают с пересчётом с нуля (rebuild_progress)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        section = Section.objects.create(name='Раздел', description='')
+        module = Module.objects.create(name='Модуль', description='', section=section)
+        cls.programs = [
+            Program.objects.create(name=f'Программа {i}', description='', section=section, goal='', skills='')
+            for i in range(2)
+        ]
+        cls.assignments = [
+            Assignment.objects.create(module=module, title=f'Задание {i}', description='') for i in range(3)
+        ]
+        cls.materials = [
+            Material.objects.create(module=module, title=f'Материал {i}', description='', file=f'materials/{i}.pdf')
+            for i in range(2)
+        ]
+        cls.students = [cls.make_user(f'student{i}') for i in range(3)]
+        for student in cls.students:
+            Enrollment.objects.create(user=student, program=cls.programs[0], is_approved=True)
+        Enrollment.objects.create(user=cls.students[0], program=cls.programs[1], is_approved=True)
+        cls.submissions = [
+            AssignmentSubmission.objects.create(assignment=assignment, user=student, answer_text='ответ')
+            for student in cls.students for assignment in cls.assignments
+        ]
+
+    def counters(self):
+        return sorted(ProgramProgress.objects.values_list(
+            'user_id', 'program_id',
+            'assignments_total', 'assignments_accepted', 'materials_total', 'materials_viewed',
+        ))
+
+    def assertConsistent(self):
+        incremental = self.counters()
+        progress.rebuild_progress(Enrollment.objects.all(), render=False)
+        self.assertEqual(incremental, self.counters())
+        return incremental
+
+    def test_single_review(self):
+        submission = self.submissions[0]
+        submission.status = 'accepted'
+        submission.save()
+        self.assertConsistent()
+        submission.status = 'rejected'
+        submission.save()
+        self.assertConsistent()
+
+    def test_bulk_review(self):
+        first = AssignmentSubmission.objects.filter(user=self.students[0])
+        progress.review_submissions(first, 'accepted')
+        self.assertConsistent()
+        self.assertTrue(Certificate.objects.filter(user=self.students[0], program__in=self.programs).exists())
+
+        progress.review_submissions(AssignmentSubmission.objects.all(), 'rejected')
+        self.assertConsistent()
+        progress.review_submissions(AssignmentSubmission.objects.filter(user=self.students[1]), 'accepted')
+        counters = self.assertConsistent()
+        self.assertIn((self.students[1].pk, self.programs[0].pk, 3, 3, 2, 0), counters)
+
+    def test_approval(self):
+        progress.review_submissions(AssignmentSubmission.objects.filter(user=self.students[2]), 'accepted')
+        enrollments = Enrollment.objects.filter(user=self.students[2])
+        progress.set_approval(enrollments, False)
+        self.assertFalse(ProgramProgress.objects.filter(user=self.students[2]).exists())
+        self.assertConsistent()
+        progress.set_approval(enrollments, True)
+        counters = self.assertConsistent()
+        self.assertIn((self.students[2].pk, self.programs[0].pk, 3, 3, 2, 0), counters)
+
+    def test_material_views(self):
+        now = timezone.now()
+        views = [(student.pk, material.pk, now) for student in self.students for material in self.materials]
+        self.assertEqual(progress.record_material_views(views + views[:2]), 6)
+        self.assertEqual(progress.record_material_views(views), 0)
+        counters = self.assertConsistent()
+        self.assertTrue(all(row[5] == 2 for row in counters))
+
+    @override_settings(MATERIAL_VIEWS_FLUSH_INTERVAL=60)
+    def test_buffered_material_views(self):
+        student, material = self.students[0], self.materials[0]
+        writes.mark_material_viewed(student, material)
+        # До сброса отметка видна только этому процессу
+        self.assertEqual(writes.pending_material_views(student), {material.pk})
+        self.assertFalse(MaterialProgress.objects.filter(user=student).exists())
+        # Так буфер сбрасывает worker_exit в gunicorn.conf.py
+        writes.flush_material_views()
+        self.assertEqual(writes.pending_material_views(student), set())
+        self.assertTrue(MaterialProgress.objects.filter(user=student, material=material).exists())
+        counters = self.assertConsistent()
+        self.assertIn((student.pk, self.programs[0].pk, 3, 0, 2, 1), counters)
+
+    def test_assignment_deleted(self):
+        progress.review_submissions(AssignmentSubmission.objects.all(), 'accepted')
+        self.assignments[0].delete()
+        counters = self.assertConsistent()
+        self.assertTrue(all(row[2:4] == (2, 2) for row in counters))
+
+    def test_issuecertificates_counts_rebuilt(self):
+        # Оценки импортированы мимо сигналов — счётчики и сертификаты появятся только при пересчёте
+        AssignmentSubmission.objects.filter(user__in=self.students[:2]).update(status='accepted')
+        out = io.StringIO()
+        call_command('issuecertificates', '--rebuild-progress', '--no-render', stdout=out)
+        self.assertEqual(Certificate.objects.count(), 3)
+        self.assertIn('Выдано новых сертификатов: 3', out.getvalue())
+
+
+# 🗃 Кэш в файле SQLite
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.path = f'{tmp}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': {'TOUCH_INTERVAL': 0, **options}})
+
+    def test_add_keeps_live_value(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+
+    def test_add_replaces_expired_value(self):
+        self.cache.set('key', 'old', timeout=0)
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr_is_atomic(self):
+        self.cache.set('counter', 0)
+        threads, rounds = 8, 200
+
+        def work():
+            # У каждого потока своё соединение с файлом — как у воркеров gunicorn
+            for _ in range(rounds):
+                self.cache.incr('counter')
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), threads * rounds)
+        self.assertEqual(self.make_cache().get('counter'), threads * rounds)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_respects_max_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        cache.get('key0')  # недавно прочитанная запись вытесняется последней
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        for i in range(11, 40):
+            cache.set(f'key{i}', i)
+            entries = cache._db().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            self.assertLessEqual(entries, 10)
+        self.assertEqual(cache.get('key39'), 39)
+
+    def test_cull_respects_max_size(self):
+        cache = self.make_cache(MAX_SIZE=10_000)
+        for i in range(20):
+            cache.set(f'key{i}', b'x' * 1000)
+        entries, size = cache._db().execute('SELECT entries, bytes FROM cache_totals').fetchone()
+        self.assertLessEqual(size, 10_000)
+        self.assertEqual(entries, cache._db().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0])
+
+
+# 📄 Keyset-пагинация
+class PaginationTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Section.objects.bulk_create([Section(name=f'Раздел {i:02}', description='') for i in range(25)])
+
+    def page(self, cursor=None, ordering=('name', 'pk')):
+        request = RequestFactory().get('/', {'cursor': cursor} if cursor else {})
+        return paginate(Section.objects.all(), request, ordering=ordering, per_page=10)
+
+    def names(self, page):
+        return [section.name for section in page]
+
+    def test_next_and_previous(self):
+        first = self.page()
+        second = self.page(first.next_cursor)
+        self.assertEqual(self.names(second)[0], 'Раздел 10')
+        self.assertTrue(second.has_previous)
+        self.assertEqual(self.names(self.page(second.previous_cursor)), self.names(first))
+
+    def test_crafted_cursor_shows_first_page(self):
+        first = self.names(self.page())
+        for cursor in (
+            encode_cursor(['Раздел 05', 'не число'], 'next'),
+            encode_cursor([None, None], 'next'),
+            encode_cursor([{'a': 1}, [2]], 'prev'),
+            encode_cursor(['Раздел 05'], 'next'),
+            'не base64 !!!',
+        ):
+            with self.subTest(cursor=cursor):
+                page = self.page(cursor)
+                self.assertEqual(self.names(page), first)
+                self.assertFalse(page.has_previous)
+
+    def test_crafted_cursor_in_views(self):
+        self.client.force_login(self.make_user('curator', ROLE_CURATOR))
+        cursor = encode_cursor(['вчера', 'x'], 'next')
+        for url in (reverse('submissions_to_check'), reverse('enrollments_manage'), reverse('api_collection', args=['programs'])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 200)
+
+
+# 📤 Загрузка файлов частями
+@override_settings(CHUNKED_UPLOAD_MAX_SESSIONS=2, CHUNKED_UPLOAD_MAX_USER_BYTES=1000)
+class UploadLimitTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = cls.make_user('student')
+
+    def start(self, size, user=None):
+        return uploads.start_upload(user or self.user, 'file.bin', size)
+
+    def test_session_and_size_limits(self):
+        self.start(400)
+        self.start(400)
+        with self.assertRaisesMessage(uploads.UploadError, 'незавершённых'):
+            self.start(10)
+        # Лимит — на пользователя, другим он не мешает
+        self.start(400, self.make_user('other'))
+        self.assertEqual(UploadSession.objects.filter(user=self.user).count(), 2)
+
+    def test_total_size_limit(self):
+        self.start(600)
+        with self.assertRaisesMessage(uploads.UploadError, 'общий объём'):
+            self.start(500)
+
+    def test_stale_uploads_are_removed(self):
+        old = self.start(600)
+        UploadSession.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        # Брошенная загрузка удаляется и больше не занимает лимит
+        fresh = self.start(600)
+        self.assertFalse(UploadSession.objects.filter(pk=old.pk).exists())
+        self.assertFalse(os.path.exists(uploads.part_path(old)))
+        self.assertTrue(os.path.exists(uploads.part_path(fresh)))
+
+    def test_orphan_part_files_are_removed(self):
+        session = self.start(100)
+        orphan = os.path.join(uploads.upload_root(), f'{uuid.uuid4()}.part')
+        open(orphan, 'wb').close()
+        old = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(orphan, (old, old))
+        os.utime(uploads.part_path(session), (old, old))
+        self.assertEqual(uploads.cleanup_stale(), 1)
+        self.assertFalse(os.path.exists(orphan))
+        # Файл живой загрузки не трогаем, даже если он давно не менялся
+        self.assertTrue(os.path.exists(uploads.part_path(session)))
+
+
+class AttachUploadTests(StudyHubTestCase):
+    content = b'0123456789' * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.curator = cls.make_user('curator', ROLE_CURATOR)
+        section = Section.objects.create(name='Раздел', description='')
+        cls.module = Module.objects.create(name='Модуль', description='', section=section)
+
+    def setUp(self):
+        session = uploads.start_upload(self.curator, 'lecture.bin', len(self.content))
+        session = uploads.write_chunk(session, 0, io.BytesIO(self.content))
+        self.session = uploads.finish_upload(session)
+
+    def form(self):
+        form = MaterialForm({
+            'module': self.module.pk, 'title': 'Лекция', 'file_type': 'other', 'description': '-',
+            'upload_id': self.session.pk,
+        }, user=self.curator)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def test_attach(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = self.form().save()
+        with material.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(UploadSession.objects.filter(pk=self.session.pk).exists())
+        self.assertFalse(os.path.exists(uploads.part_path(self.session)))
+
+    def test_failed_save_keeps_upload(self):
+        form = self.form()
+        materials_dir = os.path.join(settings.MEDIA_ROOT, 'materials')
+        os.makedirs(materials_dir, exist_ok=True)
+        stored = set(os.listdir(materials_dir))
+        with mock.patch.object(Material, 'save', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError), self.captureOnCommitCallbacks(execute=True):
+                form.save()
+        self.assertFalse(form.instance.file)
+        self.assertEqual(set(os.listdir(materials_dir)), stored)
+        self.assertTrue(UploadSession.objects.filter(pk=self.session.pk).exists())
+        with open(uploads.part_path(self.session), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        # Ту же загрузку можно прикрепить ещё раз
+        with self.captureOnCommitCallbacks(execute=True):
+            material = self.form().save()
+        self.assertTrue(material.file.name.startswith('materials/lecture'))
+        self.assertFalse(UploadSession.objects.filter(pk=self.session.pk).exists())
+
+
+# 🏅 Скачивание сертификата
+class CertificateDownloadTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = cls.make_user('student')
+        section = Section.objects.create(name='Раздел', description='')
+        program = Program.objects.create(name='Программа', description='', section=section, goal='', skills='')
+        cls.certificate = Certificate.objects.create(user=cls.student, program=program)
+
+    def test_revalidation_skips_storage(self):
+        self.client.force_login(self.student)
+        url = reverse('download_certificate', args=[self.certificate.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        with mock.patch('app.views.ensure_certificate_file') as ensure:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        ensure.assert_not_called()
+
+
+# ⚙️ Очередь фоновых задач
+_job_calls = []
+
+
+@jobs.job(name='tests.record')
+def _record_job(value):
+    _job_calls.append(value)
+
+
+@jobs.job(name='tests.fail', max_attempts=2)
+def _failing_job():
+    raise RuntimeError('сбой')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_BACKOFF=30, JOBS_STALE_TIMEOUT=600)
+class JobQueueTests(StudyHubTestCase):
+    def setUp(self):
+        _job_calls.clear()
+
+    def test_claim_is_exclusive(self):
+        job = _record_job.enqueue(value=1)
+        claimed = jobs.claim_next('w1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ('running', 'w1', 1))
+        self.assertIsNone(jobs.claim_next('w2'))
+
+    def test_future_jobs_wait(self):
+        _record_job.enqueue(value=1, run_at=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(jobs.claim_next('w1'))
+
+    def test_success(self):
+        _record_job.enqueue(value=7)
+        self.assertTrue(jobs.run_job(jobs.claim_next('w1')))
+        self.assertEqual(_job_calls, [7])
+        job = Job.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff_then_fail(self):
+        _failing_job.enqueue()
+        before = timezone.now()
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(jobs.claim_next('w1')))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('сбой', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=30))
+        # До конца паузы задача не берётся
+        self.assertIsNone(jobs.claim_next('w1'))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(jobs.claim_next('w1')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNone(jobs.claim_next('w1'))
+
+        self.assertEqual(jobs.retry(Job.objects.all()), 1)
+        self.assertEqual(jobs.claim_next('w1').attempts, 1)
+
+    def test_requeue_stale(self):
+        _record_job.enqueue(value=1)
+        _record_job.enqueue(value=2)
+        stale, fresh = jobs.claim_next('dead'), jobs.claim_next('alive')
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), ('queued', ''))
+        self.assertEqual(fresh.status, 'running')
+        self.assertEqual(jobs.claim_next('w1').pk, stale.pk)
+
+
+# 🗄 Чтение каталога с реплики
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        # Настоящей реплики в тестах нет — считаем снимок готовым
+        patcher = mock.patch.object(routers, 'is_ready', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def call(self, view, cookies=None):
+        """Выполнить view через DatabaseRoutingMiddleware; вернуть (ответ, что выбрал роутер)."""
+        seen = {}
+
+        @routers.replica_reads
+        def wrapped(request):
+            return view(request, seen) or HttpResponse()
+
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        response = routers.DatabaseRoutingMiddleware(wrapped)(request)
+        return response, seen
+
+    def read(self, request, seen):
+        for model in (Program, Material, Enrollment, Users):
+            seen[model] = self.router.db_for_read(model)
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(self.router.db_for_read(Program), 'default')
+
+    def test_catalog_models_read_from_replica(self):
+        response, seen = self.call(self.read)
+        self.assertEqual(seen, {Program: 'replica', Material: 'replica', Enrollment: 'default', Users: 'default'})
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_without_replica_reads_view(self):
+        request = self.factory.get('/')
+        seen = {}
+        routers.DatabaseRoutingMiddleware(lambda r: self.read(r, seen) or HttpResponse())(request)
+        self.assertEqual(seen[Program], 'default')
+
+    def test_write_pins_to_primary(self):
+        def write(request, seen):
+            self.assertEqual(self.router.db_for_write(Enrollment), 'default')
+
+        response, _ = self.call(write)
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 120)
+        self.assertTrue(cookie['httponly'])
+
+        # Следующие запросы с cookie читают каталог с основной базы
+        _, seen = self.call(self.read, {routers.PIN_COOKIE: '1'})
+        self.assertEqual(seen[Program], 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_no_pin(self):
+        response, seen = self.call(lambda request, seen: self.router.db_for_write(Enrollment) and None)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        _, seen = self.call(self.read)
+        self.assertEqual(seen[Program], 'default')
+
+    async def test_async_write_in_thread_pins(self):
+        # Под ASGI ORM работает в потоках sync_to_async — запись должна дойти до middleware
+        async def view(request):
+            await sync_to_async(self.router.db_for_write)(Enrollment)
+            return HttpResponse()
+
+        response = await routers.DatabaseRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+
+# 📼 Range и условные запросы к файлам
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        for header, expected in (
+            ('bytes=0-99', (0, 99)),
+            ('bytes=10-', (10, 999)),
+            ('bytes=990-5000', (990, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=-5000', (0, 999)),
+            ('bytes=-', None),
+            ('bytes=0-1,5-6', None),
+            ('items=0-1', None),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(streaming.parse_range(header, 1000), expected)
+
+    def test_not_satisfiable(self):
+        for header, size in (('bytes=1000-', 1000), ('bytes=20-10', 1000), ('bytes=-0', 1000),
+                             ('bytes=-10', 0), ('bytes=0-', 0)):
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(streaming.RangeNotSatisfiable):
+                    streaming.parse_range(header, size)
+
+
+class MaterialFileTests(StudyHubTestCase):
+    content = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.curator = cls.make_user('curator', ROLE_CURATOR)
+        section = Section.objects.create(name='Раздел', description='')
+        module = Module.objects.create(name='Модуль', description='', section=section)
+        cls.material = Material.objects.create(
+            module=module, title='Файл', description='', file=ContentFile(cls.content, name='data.bin'),
+        )
+        cls.url = reverse('material_file', args=[cls.material.pk])
+
+    def setUp(self):
+        self.client.force_login(self.curator)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.content[100:200])
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_empty_file_suffix_range(self):
+        empty = Material.objects.create(
+            module=self.material.module, title='Пусто', description='', file=ContentFile(b'', name='empty.bin'),
+        )
+        response = self.client.get(reverse('material_file', args=[empty.pk]), HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # If-Range со старым ETag — весь файл вместо диапазона
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    async def test_partial_content_asgi(self):
+        await self.async_client.aforce_login(self.curator)
+        response = await self.async_client.get(self.url, headers={'Range': 'bytes=-24'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.content[-24:])
+
+
+# 🧩 Версионный кэш фрагментов каталога
+class FragmentCacheTests(StudyHubTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.section = Section.objects.create(name='Раздел', description='')
+        Program.objects.bulk_create([
+            Program(name=f'Программа {i:02}', description='', section=cls.section, goal='', skills='')
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_only_its_group(self):
+        before = fragments.versions(fragments.PROGRAMS, fragments.SECTIONS)
+        self.assertEqual(fragments.versions(fragments.PROGRAMS, fragments.SECTIONS), before)
+        fragments.bump(fragments.PROGRAMS)
+        after = fragments.versions(fragments.PROGRAMS, fragments.SECTIONS)
+        self.assertNotEqual(after.split('.')[1], before.split('.')[1])
+        self.assertEqual(after.split('.')[3], before.split('.')[3])
+
+    def test_saving_model_invalidates_fragment(self):
+        program = Program.objects.order_by('name').first()
+        self.assertContains(self.client.get(reverse('index')), program.name)
+        program.name = 'Переименованная программа'
+        program.save()
+        self.assertContains(self.client.get(reverse('index')), 'Переименованная программа')
+
+        self.section.name = 'Новое имя раздела'
+        self.section.save()
+        self.assertContains(self.client.get(reverse('index')), 'Новое имя раздела')
+
+    def test_curator_role_invalidates_curators(self):
+        before = fragments.versions(fragments.CURATORS)
+        self.make_user('student')
+        self.assertEqual(fragments.versions(fragments.CURATORS), before)
+        self.make_user('curator', ROLE_CURATOR)
+        self.assertNotEqual(fragments.versions(fragments.CURATORS), before)
+
+    def test_pagination_links_not_shared(self):
+        # Первый посетитель пришёл с utm-меткой — фрагмент кэшируется с его ссылками
+        first = self.client.get(reverse('index'), {'utm_source': 'mail', 'section': self.section.pk})
+        self.assertNotContains(first, 'utm_source')
+        self.assertContains(first, f'section={self.section.pk}')
+        second = self.client.get(reverse('index'), {'section': self.section.pk})
+        self.assertNotContains(second, 'utm_source')
+
+
+# 🔐 Кэш ролей
+class RoleCacheTests(StudyHubTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def fresh(self, user):
+        # Новый объект — как request.user следующего запроса
+        return Users.objects.get(pk=user.pk)
+
+    def test_roles_loaded_once(self):
+        user = self.make_user('curator', ROLE_CURATOR)
+        user = self.fresh(user)
+        with self.assertNumQueries(1):
+            self.assertTrue(roles.is_curator(user))
+            self.assertTrue(roles.is_curator_or_admin(user))
+            self.assertFalse(roles.is_participant(user))
+        # Следующий запрос берёт роли из общего кэша
+        user = self.fresh(user)
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.is_curator(user))
+
+    def test_group_change_invalidates(self):
+        user = self.make_user('student')
+        self.assertTrue(roles.is_participant(self.fresh(user)))
+        user.groups.add(Group.objects.get(name=ROLE_CURATOR))
+        self.assertTrue(roles.is_curator(self.fresh(user)))
+        user.groups.clear()
+        self.assertEqual(roles.get_user_roles(self.fresh(user)), frozenset())
+
+
+# 🔥 Прогрев воркера
+class WarmUpTests(StudyHubTestCase):
+    def test_steps(self):
+        timings = warmup.warm_up()
+        self.assertEqual(set(timings), {'templates', 'urls', 'databases'})
+        self.assertGreater(timings['templates'][0], 0)
+        self.assertGreater(timings['urls'][0], 0)
+
+    def test_asgi_skips_databases(self):
+        self.assertNotIn('databases', warmup.warm_up(databases=False))
@@ -0,0 +1,151 @@
+# app/thumbnails.py
+"""
+Уменьшенные копии изображений сертификатов для каталога.
+
+Исходные JPEG весят мегабайты, а в карточке показываются шириной в пару
+сотен пикселей. Для каждого изображения Pillow делает копии шириной
+THUMBNAIL_WIDTHS в WebP и JPEG (для браузеров без WebP). Копии лежат
+в MEDIA_ROOT/thumbnails/ под именем из хэша содержимого, поэтому
+одинаковые файлы делят копии, а повторная генерация ничего не пишет.
+
+Копии создаются при загрузке через ProgramForm, а для уже загруженных
+изображений — при первом показе (тег {% responsive_image %}
+из app/templatetags/images.py) или командой `python manage.py buildthumbnails`.
+Описание копий (manifest) хранится в кэше, чтобы не читать исходник
+на каждом рендере. Pillow импортируется только при нарезке — при попадании
+в кэш он не нужен.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Увеличить при изменении способа нарезки — manifest и имена файлов сменятся
+THUMBNAIL_VERSION = 1
+THUMBNAIL_DIR = 'thumbnails'
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache_key(name):
+    return f'thumbnails:{THUMBNAIL_VERSION}:{name}'
+
+
+def _content_hash(field):
+    digest = hashlib.sha256(str(THUMBNAIL_VERSION).encode())
+    with field.storage.open(field.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _widths(source_width):
+    # Не увеличиваем: маленький исходник получает одну копию своей ширины
+    widths = [width for width in _setting('THUMBNAIL_WIDTHS', (320, 640, 960)) if width < source_width]
+    return widths or [source_width]
+
+
+def _formats():
+    from PIL import features
+
+    return [fmt for fmt in FORMATS if fmt != 'webp' or features.check('webp')]
+
+
+def _encode(image, fmt):
+    from PIL import Image
+
+    buffer = BytesIO()
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # Прозрачность в JPEG невозможна — кладём на белый фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    options = {'optimize': True, 'progressive': True} if fmt == 'jpeg' else {'method': 4}
+    image.save(buffer, FORMATS[fmt], quality=_setting('THUMBNAIL_QUALITY', 80), **options)
+    return buffer.getvalue()
+
+
+def _name(key, width, fmt):
+    return f'{THUMBNAIL_DIR}/{key[:2]}/{key}-{width}.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def _build(field):
+    from PIL import ExifTags, Image, ImageOps
+
+    key = _content_hash(field)
+    with field.storage.open(field.name, 'rb') as f:
+        image = Image.open(f)
+        # Размер читается из заголовка, без декодирования
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            width, height = height, width
+        widths = _widths(width)
+        formats = _formats()
+        missing = [
+            (target, fmt) for target in widths for fmt in formats
+            if not default_storage.exists(_name(key, target, fmt))
+        ]
+        if missing:
+            # Декодировать JPEG сразу в уменьшенном масштабе — в разы быстрее полного.
+            # Квадрат — чтобы хватило ширины и после поворота по EXIF
+            image.draft('RGB', (max(widths), max(widths)))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            for target in sorted({target for target, _ in missing}):
+                resized = image if target == image.width else image.resize(
+                    (target, max(1, round(image.height * target / image.width))), Image.LANCZOS,
+                )
+                for fmt in formats:
+                    if (target, fmt) in missing:
+                        default_storage.save(_name(key, target, fmt), ContentFile(_encode(resized, fmt)))
+
+    # Размеры для атрибутов width/height: пропорции, чтобы вёрстка не прыгала при загрузке
+    return {
+        'width': widths[-1],
+        'height': max(1, round(height * widths[-1] / width)),
+        'sources': {
+            fmt: [(default_storage.url(_name(key, target, fmt)), target) for target in widths]
+            for fmt in formats
+        },
+    }
+
+
+def generate(field):
+    """
+    Создать копии для ImageField (если их ещё нет) и вернуть manifest:
+    {'width', 'height', 'sources': {'webp': [(url, ширина), ...], 'jpeg': [...]}}.
+    None — изображение не удалось прочитать.
+    """
+    if not field:
+        return None
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        manifest = _build(field)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception('Не удалось сделать копии изображения %s', field.name)
+        # Не пытаться заново на каждом рендере — шаблон покажет исходник
+        cache.set(_cache_key(field.name), False, 300)
+        return None
+    cache.set(_cache_key(field.name), manifest, None)
+    return manifest
+
+
+def manifest_for(field):
+    """Manifest из кэша, а при промахе — сгенерировать копии сейчас."""
+    if not field:
+        return None
+    manifest = cache.get(_cache_key(field.name))
+    if manifest is None:
+        manifest = generate(field)
+    return manifest or None
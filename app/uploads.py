@@ -0,0 +1,261 @@
+# app/uploads.py
+"""
+Докачиваемая загрузка больших файлов частями.
+
+Протокол:
+  1. POST   /uploads/                       — init: filename, size[, checksum]
+  2. PUT    /uploads/<id>/chunks/<n>/       — тело запроса = часть n
+                                              (необязательный заголовок X-Chunk-Checksum: sha256 части)
+  3. POST   /uploads/<id>/finalize/         — сверка всех частей и sha256 файла
+  GET       /uploads/<id>/                  — какие части уже получены (для докачки)
+
+После finalize id загрузки передаётся в форму материала или ответа
+(скрытое поле upload_id), и файл прикрепляется к Material.file или
+AssignmentSubmission.answer_file без повторного копирования (attaching).
+
+Части пишутся сразу на диск по смещению n * chunk_size, тело запроса
+читается потоком и целиком в памяти не держится.
+
+.part-файл создаётся полного размера уже на init, поэтому число загрузок
+пользователя и их общий объём ограничены (CHUNKED_UPLOAD_MAX_SESSIONS,
+CHUNKED_UPLOAD_MAX_USER_BYTES), а брошенные загрузки удаляет cleanup_stale()
+— из runjobs и команды cleanuploads.
+"""
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import UploadSession
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def upload_root():
+    root = _setting('CHUNKED_UPLOAD_ROOT', os.path.join(settings.BASE_DIR, 'db', 'uploads'))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def part_path(session):
+    return os.path.join(upload_root(), f'{session.pk}.part')
+
+
+def start_upload(user, filename, size, checksum=''):
+    max_size = _setting('CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError('Не указано имя файла')
+    if size <= 0 or size > max_size:
+        raise UploadError(f'Недопустимый размер файла (максимум {max_size} байт)')
+
+    # Брошенные загрузки самого пользователя не должны занимать его лимит
+    cleanup_stale(user=user)
+    max_sessions = _setting('CHUNKED_UPLOAD_MAX_SESSIONS', 3)
+    max_bytes = _setting('CHUNKED_UPLOAD_MAX_USER_BYTES', 4 * 1024 ** 3)
+    with transaction.atomic():
+        # Завершённые, но ещё не прикреплённые загрузки тоже держат файл на диске
+        used = UploadSession.objects.filter(user=user).aggregate(count=Count('pk'), size=Sum('size'))
+        if used['count'] >= max_sessions:
+            raise UploadError(f'Слишком много незавершённых загрузок (не больше {max_sessions})')
+        if (used['size'] or 0) + size > max_bytes:
+            raise UploadError(f'Превышен общий объём загрузок ({max_bytes} байт)')
+        session = UploadSession.objects.create(
+            user=user,
+            filename=filename,
+            size=size,
+            chunk_size=_setting('CHUNKED_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024),
+            checksum=(checksum or '').lower(),
+        )
+    # Файл нужного размера заранее, чтобы части можно было писать в любом порядке
+    with open(part_path(session), 'wb') as f:
+        f.truncate(size)
+    return session
+
+
+def write_chunk(session, index, stream, checksum=''):
+    """Записать часть index из потока (request) на её место в файле."""
+    if session.status != 'uploading':
+        raise UploadError('Загрузка уже завершена')
+    if not 0 <= index < session.chunk_count:
+        raise UploadError('Неверный номер части')
+
+    offset = index * session.chunk_size
+    expected = min(session.chunk_size, session.size - offset)
+    digest = hashlib.sha256()
+    written = 0
+    with open(part_path(session), 'r+b') as f:
+        f.seek(offset)
+        while written < expected:
+            data = stream.read(min(READ_SIZE, expected - written))
+            if not data:
+                break
+            f.write(data)
+            digest.update(data)
+            written += len(data)
+        if stream.read(1):
+            raise UploadError('Часть больше ожидаемого размера')
+
+    if written != expected:
+        raise UploadError(f'Получено {written} байт из {expected}')
+    if checksum and digest.hexdigest() != checksum.lower():
+        raise UploadError('Контрольная сумма части не совпадает')
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if index not in session.received_chunks:
+            session.received_chunks = sorted(session.received_chunks + [index])
+            session.save(update_fields=['received_chunks', 'updated_at'])
+    return session
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finish_upload(session, checksum=''):
+    """Проверить, что все части на месте, и сверить sha256 всего файла."""
+    if session.status == 'complete':
+        return session
+    missing = sorted(set(range(session.chunk_count)) - set(session.received_chunks))
+    if missing:
+        raise UploadError(f'Не получены части: {missing[:20]}')
+
+    actual = file_checksum(part_path(session))
+    expected = (checksum or session.checksum).lower()
+    if expected and actual != expected:
+        raise UploadError('Контрольная сумма файла не совпадает')
+
+    session.checksum = actual
+    session.status = 'complete'
+    session.save(update_fields=['checksum', 'status', 'updated_at'])
+    return session
+
+
+def describe(session):
+    return {
+        'upload_id': str(session.pk),
+        'filename': session.filename,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'chunk_count': session.chunk_count,
+        'received': session.received_chunks,
+        'status': session.status,
+        'checksum': session.checksum,
+    }
+
+
+class _AssembledFile(File):
+    """Собранный файл; temporary_file_path позволяет хранилищу просто переместить его."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+@contextmanager
+def attaching(session, fieldfile):
+    """
+    Прикрепить завершённую загрузку к полю файла на время сохранения модели:
+
+        with attaching(session, instance.file):
+            instance.save()
+
+    Загрузка удаляется только после коммита. Если сохранение упало, файл
+    возвращается на место .part, и ту же загрузку можно прикрепить снова.
+    """
+    instance, attname, previous = fieldfile.instance, fieldfile.field.attname, fieldfile.name
+    with transaction.atomic():
+        with open(part_path(session), 'rb') as f:
+            fieldfile.save(session.filename, _AssembledFile(f, name=session.filename), save=False)
+        try:
+            yield
+        except BaseException:
+            _detach(session, fieldfile)
+            setattr(instance, attname, previous)
+            raise
+        # Файловое хранилище перемещает файл, остальные копируют — тогда исходник удалит discard_upload
+        transaction.on_commit(lambda: discard_upload(session))
+
+
+def _detach(session, fieldfile):
+    if os.path.exists(part_path(session)):
+        fieldfile.storage.delete(fieldfile.name)
+    else:
+        os.replace(fieldfile.path, part_path(session))
+
+
+def discard_upload(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def cleanup_stale(max_age_hours=None, user=None):
+    """
+    Удалить брошенные загрузки старше max_age_hours (по умолчанию
+    CHUNKED_UPLOAD_EXPIRE_HOURS), а при общей чистке — и .part-файлы,
+    у которых не осталось записи UploadSession.
+    """
+    if max_age_hours is None:
+        max_age_hours = _setting('CHUNKED_UPLOAD_EXPIRE_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+    if user is not None:
+        stale = stale.filter(user=user)
+    count = 0
+    for session in stale:
+        discard_upload(session)
+        count += 1
+    if user is None:
+        count += _remove_orphan_parts(cutoff.timestamp())
+    return count
+
+
+def _remove_orphan_parts(older_than):
+    root = upload_root()
+    names = [name for name in os.listdir(root) if name.endswith('.part')]
+    known = {
+        f'{pk}.part' for pk in UploadSession.objects.filter(
+            pk__in=[name[:-len('.part')] for name in names if _is_uuid(name[:-len('.part')])]
+        ).values_list('pk', flat=True)
+    }
+    count = 0
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            # Свежий файл может принадлежать загрузке, которая создаётся прямо сейчас
+            if name not in known and os.path.getmtime(path) < older_than:
+                os.remove(path)
+                count += 1
+        except FileNotFoundError:
+            pass
+    return count
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
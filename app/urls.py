@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # --- Аутентификация ---
@@ -37,15 +37,23 @@ urlpatterns = [
     # --- Проверка заданий (куратор) ---
     path('submissions/', views.submissions_to_check, name='submissions_to_check'),
     path('submissions/<int:submission_id>/review/', views.review_submission, name='review_submission'),
+    path('submissions/review/', views.submissions_bulk_review, name='submissions_bulk_review'),
 
     # --- Материалы ---
     path('materials/', views.materials, name='materials'),
     path('materials/<int:pk>/', views.material_detail, name='material_detail'),
+    path('materials/<int:pk>/file/', views.material_file, name='material_file'),
     path('materials/<int:pk>/edit/', views.material_edit, name='material_edit'),
     path('materials/<int:pk>/delete/', views.material_delete, name='material_delete'),
     path('materials/upload/', views.upload_material, name='upload_material'),
     path('materials/<int:material_id>/viewed/', views.mark_material_viewed, name='mark_material_viewed'),
 
+    # --- Загрузка файлов частями ---
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:upload_id>/', views.upload_status, name='upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/finalize/', views.upload_finish, name='upload_finish'),
+
     # --- Разделы (секции) ---
     path('sections/', views.sections, name='sections'),
     path('sections/create/', views.section_create, name='section_create'),
@@ -58,7 +66,14 @@ urlpatterns = [
     # --- Управление заявками ---
     path('enrollments/manage/', views.manage_enrollments, name='enrollments_manage'),
     path('enrollments/<int:pk>/toggle/', views.enrollment_toggle_approval, name='enrollment_toggle_approval'),
+    path('enrollments/bulk/', views.enrollments_bulk, name='enrollments_bulk'),
 
     # --- Статистика (только админ) ---
     path('stats/', views.statistics, name='stats'),
+
+    # --- JSON API v1 (app/api.py) ---
+    path('api/v1/favorites/', api.favorites, name='api_favorites'),
+    path('api/v1/favorites/<int:program_id>/', api.favorite, name='api_favorite'),
+    path('api/v1/<str:resource>/', api.collection, name='api_collection'),
+    path('api/v1/<str:resource>/<int:pk>/', api.item, name='api_item'),
 ]
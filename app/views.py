@@ -1,108 +1,70 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST, require_http_methods
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
 from django.db.models import Q
 import os
-from django.db.models import Count
+from urllib.parse import urlencode
+from django.db.models import Count, Prefetch
+from django.utils.functional import SimpleLazyObject
 from .models import (
     Users, Program, Section, Module, Assignment,
-    Enrollment, AssignmentSubmission, Material, Certificate, MaterialProgress
+    Enrollment, AssignmentSubmission, Material, Certificate, MaterialProgress, UploadSession,
+    ProgramProgress
 )
 from .forms import (
     RegistrationForm, LoginForm, ProfileEditForm, EnrollmentForm,
     AssignmentSubmissionForm, MaterialForm, AssignmentForm, ProgramForm,
     CertificateForm, AddFavoriteForm, SubmissionReviewForm
 )
-from io import BytesIO
-from django.core.files.base import ContentFile
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import cm
+from . import uploads, writes
+from .roles import is_participant, is_curator, is_admin, is_curator_or_admin
+from .certificates import certificate_key_for, ensure_certificate_file
+from . import fragments, progress, search, stats, tasks
+from .pagination import paginate
+from .routers import replica_reads
+from .streaming import serve_file
 
-from transliterate import translit
 
-def generate_certificate_pdf(username, program_name):
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-
-    width, height = A4
-
-    # Заменим всё на латиницу
-    username = translit(username, 'ru', reversed=True)
-    program_name = translit(program_name, 'ru', reversed=True)
-
-    p.setFont("Helvetica-Bold", 24)
-    p.drawCentredString(width / 2, height - 4 * cm, "CERTIFICATE")
-
-    p.setFont("Helvetica", 16)
-    p.drawCentredString(width / 2, height - 6 * cm, f"User: {username}")
-
-    p.setFont("Helvetica-Oblique", 14)
-    p.drawCentredString(width / 2, height - 8 * cm, f"For completed the program: {program_name}")
-
-    p.setFont("Helvetica", 12)
-    p.drawCentredString(width / 2, 3 * cm, "Congratulate!")
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-
-    filename = f'{username}_{program_name}_certificate.pdf'.replace(' ', '_')
-    return ContentFile(buffer.read(), name=filename)
-
-
-
-# 🔐 Группы
-def in_group(user, name): return user.groups.filter(name=name).exists()
-def is_participant(user): return in_group(user, 'Пользователь')
-def is_curator(user): return in_group(user, 'Куратор')
-def is_admin(user): return user.is_superuser or in_group(user, 'Администратор')
-def check_program_completion(user):
-    approved_programs = Program.objects.filter(
-        enrollments__user=user,
-        enrollments__is_approved=True
-    )
-
-    for program in approved_programs:
-        section = program.section
-        modules = section.modules.all()
-        assignments = Assignment.objects.filter(module__in=modules)
-
-        total = assignments.count()
-        if total == 0:
-            continue
-
-        accepted_count = AssignmentSubmission.objects.filter(
-            assignment__in=assignments,
-            user=user,
-            status='accepted'
-        ).count()
-
-        if accepted_count == total:
-            Certificate.objects.get_or_create(user=user, program=program)
+def _search_ordering(query, default=('pk',)):
+    """При поиске списки идут по релевантности (аннотация search_rank из app/search.py)."""
+    return ('search_rank', 'pk') if query and search.is_available() else default
 
 
 # 🏠 Главная
+@replica_reads
 def index(request):
     query = request.GET.get('q', '')
     section_id = request.GET.get('section')
 
     filters = Q()
-    if query:
-        filters &= Q(name__icontains=query)
     if section_id:
         filters &= Q(section_id=section_id)
 
-    programs = Program.objects.filter(filters)
+    programs = search.filter_queryset(
+        Program.objects.filter(filters).select_related('section'), search.PROGRAM, query
+    )
+    # Страница выбирается только при промахе кэша фрагментов
+    page_obj = SimpleLazyObject(lambda: paginate(programs, request, ordering=_search_ordering(query)))
     sections = Section.objects.all()
 
+    selected_section = int(section_id) if section_id else None
     context = {
-        'programs': programs,
+        'programs': page_obj,
+        'page_obj': page_obj,
         'sections': sections,
         'query': query,
-        'selected_section': int(section_id) if section_id else None
+        'selected_section': selected_section,
+        'cursor': request.GET.get('cursor', ''),
+        'page_query': fragments.page_query(q=query, section=selected_section),
+        **fragments.context(fragments.PROGRAMS, fragments.SECTIONS),
     }
     return render(request, 'index.html', context)
 
@@ -144,48 +106,72 @@ def profile(request):
         messages.success(request, 'Данные обновлены')
         return redirect('profile')
 
-    enrollments = Enrollment.objects.filter(user=user)
-    certificates = Certificate.objects.filter(user=user)
+    enrollments = Enrollment.objects.filter(user=user).select_related('program')
+    certificates = Certificate.objects.filter(user=user).select_related('program')
 
-    total = Assignment.objects.filter(module__section__in=[e.program.section for e in enrollments if e.is_approved]).count()
-    completed = AssignmentSubmission.objects.filter(user=user, status='accepted').count()
-    progress_percent = int((completed / total) * 100) if total else 0
+    # Счётчики ведутся инкрементально (app/progress.py) — здесь только чтение
+    program_progress = list(ProgramProgress.objects.filter(user=user).select_related('program').order_by('program__name'))
+    done = sum(p.assignments_accepted + p.materials_viewed for p in program_progress)
+    total = sum(p.assignments_total + p.materials_total for p in program_progress)
+    progress_percent = min(100, int(done * 100 / total)) if total else 0
 
     return render(request, 'profile.html', {
         'form': form,
         'enrollments': enrollments,
         'certificates': certificates,
+        'program_progress': program_progress,
         'progress_percent': progress_percent
     })
 
 
 # 📥 Скачать сертификат
+def _read_file(fieldfile):
+    with fieldfile.open('rb') as f:
+        return f.read()
+
+
+# Async-представления (скачивание, файлы, избранное) не занимают воркер на время
+# ввода-вывода под ASGI; под WSGI Django выполняет их в своём цикле событий
 @login_required
-def download_certificate(request, certificate_id):
-    certificate = get_object_or_404(Certificate, id=certificate_id, user=request.user)
-    username = request.user.username
-    program_name = certificate.program.name
+async def download_certificate(request, certificate_id):
+    user = await request.auser()
+    certificate = await aget_object_or_404(
+        Certificate.objects.select_related('user', 'program'),
+        id=certificate_id, user=user,
+    )
+
+    # ETag — ключ из имени, программы и версии шаблона: клиенту с актуальной
+    # копией отвечаем 304, не заглядывая в хранилище
+    etag = f'"{certificate_key_for(certificate)}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
 
-    # 🔥 Генерируем PDF на лету
-    content = generate_certificate_pdf(username, program_name)
+    # PDF рендерится только если изменились имя, программа или версия шаблона
+    await sync_to_async(ensure_certificate_file)(certificate)
 
+    # PDF — несколько килобайт: читаем целиком в пуле потоков, без потоковой отдачи
+    content = await sync_to_async(_read_file, thread_sensitive=False)(certificate.file)
     response = HttpResponse(content, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{content.name}"'
+    response['Content-Disposition'] = content_disposition_header(True, os.path.basename(certificate.file.name))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 # ⭐ Избранное
 @login_required
-def add_to_favorites(request):
+async def add_to_favorites(request):
+    user = await request.auser()
     form = AddFavoriteForm(request.POST)
     if form.is_valid():
-        program = get_object_or_404(Program, id=form.cleaned_data['program_id'])
+        program = await aget_object_or_404(Program, id=form.cleaned_data['program_id'])
 
         # Переключаем состояние: если уже есть — удалим, иначе добавим
-        if program in request.user.favorites.all():
-            request.user.favorites.remove(program)
+        if await user.favorites.filter(pk=program.pk).aexists():
+            await user.favorites.aremove(program)
             messages.success(request, 'Удалено из избранного')
         else:
-            request.user.favorites.add(program)
+            await user.favorites.aadd(program)
             messages.success(request, 'Добавлено в избранное')
 
     # 🔁 Вернуться обратно на ту же страницу, откуда пришли
@@ -195,11 +181,13 @@ def add_to_favorites(request):
 
 @login_required
 def favorites(request):
-    return render(request, 'favorites.html', {'favorites': request.user.favorites.all()})
+    page_obj = paginate(request.user.favorites.select_related('section'), request)
+    return render(request, 'favorites.html', {'favorites': page_obj, 'page_obj': page_obj})
 
 
 # 📋 Программа
 @login_required
+@replica_reads
 def program_detail(request, pk):
     program = get_object_or_404(Program, pk=pk)
     enrolled = Enrollment.objects.filter(user=request.user, program=program, is_approved=True).exists()
@@ -207,7 +195,9 @@ def program_detail(request, pk):
     return render(request, 'program_detail.html', {
         'program': program,
         'enrolled': enrolled,
-        'form': form
+        'in_favorites': request.user.favorites.filter(pk=program.pk).exists(),
+        'form': form,
+        **fragments.context(fragments.PROGRAMS, fragments.SECTIONS),
     })
 
 
@@ -216,7 +206,7 @@ def program_detail(request, pk):
 @user_passes_test(is_participant)
 def enroll(request, program_id):
     program = get_object_or_404(Program, id=program_id)
-    Enrollment.objects.get_or_create(user=request.user, program=program)
+    writes.atomic_with_retry(Enrollment.objects.get_or_create, user=request.user, program=program)
     messages.success(request, 'Заявка подана')
     return redirect('program_detail', pk=program_id)
 
@@ -234,12 +224,14 @@ def assignments(request):
             filters &= Q(module__section__programs__id=program)
 
         assignments = Assignment.objects.filter(filters).select_related('module').distinct()
+        page_obj = paginate(assignments, request)
 
         # Куратор не проверяет submissions
-        assignments_with_submissions = [(a, None) for a in assignments]
+        assignments_with_submissions = [(a, None) for a in page_obj]
 
         context = {
             'assignments_with_submissions': assignments_with_submissions,
+            'page_obj': page_obj,
             'is_curator': True,
             'module_filter': request.GET.get('module'),
             'program_filter': request.GET.get('program'),
@@ -252,21 +244,34 @@ def assignments(request):
 
     filters = Q()
     if status := request.GET.get('status'):
-        filters &= Q(submissions__status=status)
+        # Статус смотрим только у своих ответов, а не у ответов других участников
+        filters &= Q(submissions__user=user, submissions__status=status)
     if module := request.GET.get('module'):
         filters &= Q(module_id=module)
     if program := request.GET.get('program'):
         filters &= Q(module__section__programs__id=program)
 
-    assignments = Assignment.objects.filter(filters).distinct() if filters else Assignment.objects.all()
+    assignments = (
+        Assignment.objects.filter(filters)
+        .select_related('module')
+        .prefetch_related(Prefetch(
+            'submissions',
+            queryset=AssignmentSubmission.objects.filter(user=user),
+            to_attr='user_submissions',
+        ))
+        .distinct()
+    )
+    page_obj = paginate(assignments, request)
 
-    assignments_with_submissions = []
-    for assignment in assignments:
-        submission = assignment.submissions.filter(user=user).first()
-        assignments_with_submissions.append((assignment, submission))
+    # Ответы пользователя подгружены одним запросом на всю страницу
+    assignments_with_submissions = [
+        (assignment, assignment.user_submissions[0] if assignment.user_submissions else None)
+        for assignment in page_obj
+    ]
 
     context = {
         'assignments_with_submissions': assignments_with_submissions,
+        'page_obj': page_obj,
         'status_filter': request.GET.get('status'),
         'module_filter': request.GET.get('module'),
         'program_filter': request.GET.get('program'),
@@ -276,7 +281,7 @@ def assignments(request):
 
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def assignment_create(request):
     form = AssignmentForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
@@ -323,17 +328,16 @@ def assignment_detail(request, pk):
             messages.warning(request, 'Вы не можете изменить это задание.')
             return redirect('assignment_detail', pk=pk)
 
-        form = AssignmentSubmissionForm(request.POST, request.FILES, instance=submission)
+        form = AssignmentSubmissionForm(request.POST, request.FILES, instance=submission, user=request.user)
         if form.is_valid():
-            new_submission = form.save(commit=False)
-            new_submission.user = request.user
-            new_submission.assignment = assignment
-            new_submission.status = 'submitted'
-            new_submission.save()
+            form.instance.user = request.user
+            form.instance.assignment = assignment
+            form.instance.status = 'submitted'
+            writes.atomic_with_retry(form.save)
             messages.success(request, 'Ответ отправлен на проверку.')
             return redirect('assignments')
     else:
-        form = AssignmentSubmissionForm(instance=submission)
+        form = AssignmentSubmissionForm(instance=submission, user=request.user)
 
     return render(request, 'assignment_detail.html', {
         'assignment': assignment,
@@ -363,14 +367,13 @@ def submit_assignment(request, assignment_id):
         return redirect('assignment_detail', assignment_id)
 
     # Если есть черновик (submitted) — редактируем
-    form = AssignmentSubmissionForm(request.POST or None, request.FILES or None, instance=submission)
+    form = AssignmentSubmissionForm(request.POST or None, request.FILES or None, instance=submission, user=request.user)
 
     if request.method == 'POST' and form.is_valid():
-        submission = form.save(commit=False)
-        submission.user = request.user
-        submission.assignment = assignment
-        submission.status = 'submitted'  # сбрасываем статус
-        submission.save()
+        form.instance.user = request.user
+        form.instance.assignment = assignment
+        form.instance.status = 'submitted'  # сбрасываем статус
+        writes.atomic_with_retry(form.save)
         messages.success(request, 'Задание отправлено')
         return redirect('assignments')
 
@@ -384,6 +387,7 @@ def submit_assignment(request, assignment_id):
 
 # 📚 Материалы + фильтрация по модулю
 @login_required
+@replica_reads
 def materials(request):
     user = request.user
     module_id = request.GET.get('module')
@@ -396,8 +400,10 @@ def materials(request):
     if is_curator_flag or is_admin_flag:
         if module_id:
             queryset = queryset.filter(module_id=module_id)
+        page_obj = paginate(queryset, request)
         return render(request, 'materials.html', {
-            'materials': queryset,
+            'materials': page_obj,
+            'page_obj': page_obj,
             'viewed_ids': set(),  # Куратору/админу это не надо
             'is_curator': is_curator_flag,
             'is_admin': is_admin_flag,
@@ -416,10 +422,15 @@ def materials(request):
     if module_id:
         queryset = queryset.filter(module_id=module_id)
 
-    viewed_ids = set(MaterialProgress.objects.filter(user=user).values_list('material_id', flat=True))
+    page_obj = paginate(queryset, request)
+    # Отметки о прочтении нужны только для материалов текущей страницы
+    viewed_ids = set(MaterialProgress.objects.filter(
+        user=user, material_id__in=[material.pk for material in page_obj]
+    ).values_list('material_id', flat=True)) | writes.pending_material_views(user)
 
     return render(request, 'materials.html', {
-        'materials': queryset,
+        'materials': page_obj,
+        'page_obj': page_obj,
         'viewed_ids': viewed_ids,
         'is_curator': is_curator_flag,
         'is_admin': is_admin_flag,
@@ -432,7 +443,14 @@ def material_detail(request, pk):
     material = get_object_or_404(Material, pk=pk)
 
     if is_participant(request.user):
-        viewed, _ = MaterialProgress.objects.get_or_create(user=request.user, material=material)
+        # Запись только при первом просмотре; сама отметка пишется пачкой (app/writes.py)
+        viewed = (
+            material.pk in writes.pending_material_views(request.user)
+            or MaterialProgress.objects.filter(user=request.user, material=material).exists()
+        )
+        if not viewed:
+            writes.mark_material_viewed(request.user, material)
+            viewed = True
     else:
         viewed = None  # неважно для куратора
 
@@ -444,11 +462,37 @@ def material_detail(request, pk):
 
 
 
+async def _can_open_material(user, material):
+    """Файл материала доступен куратору/админу и участнику, записанному на программу его раздела."""
+    if await sync_to_async(is_curator_or_admin)(user):
+        return True
+    return await Enrollment.objects.filter(
+        user=user, is_approved=True, program__section_id=material.module.section_id
+    ).aexists()
+
+
+# 📼 Файл материала (Range, ETag, X-Accel-Redirect/X-Sendfile)
+@login_required
+async def material_file(request, pk):
+    user = await request.auser()
+    material = await aget_object_or_404(Material.objects.select_related('module'), pk=pk)
+    if not material.file:
+        raise Http404
+    if not await _can_open_material(user, material):
+        raise PermissionDenied
+    try:
+        return await sync_to_async(serve_file)(
+            request, material.file, as_attachment=request.GET.get('download') == '1',
+        )
+    except FileNotFoundError:
+        raise Http404
+
+
 @login_required
 @user_passes_test(is_curator)
 def material_edit(request, pk):
     material = get_object_or_404(Material, pk=pk)
-    form = MaterialForm(request.POST or None, request.FILES or None, instance=material)
+    form = MaterialForm(request.POST or None, request.FILES or None, instance=material, user=request.user)
     if request.method == 'POST' and form.is_valid():
         form.save()
         messages.success(request, 'Материал обновлён')
@@ -470,16 +514,64 @@ def material_delete(request, pk):
 @login_required
 def mark_material_viewed(request, material_id):
     material = get_object_or_404(Material, id=material_id)
-    MaterialProgress.objects.get_or_create(user=request.user, material=material)
+    writes.mark_material_viewed(request.user, material)
     return redirect('materials')
 
 
 # 🧑‍🏫 Проверка заданий (куратор)
+SUBMISSION_BULK_ACTIONS = {
+    'accept_selected': ('accepted', False),
+    'reject_selected': ('rejected', False),
+    'accept_all': ('accepted', True),
+    'reject_all': ('rejected', True),
+}
+
+
+def _pending_submissions(params):
+    submissions = AssignmentSubmission.objects.filter(status='submitted')
+    assignment_id = params.get('assignment', '')
+    if assignment_id.isdigit():
+        submissions = submissions.filter(assignment_id=assignment_id)
+    return submissions
+
+
 @login_required
 @user_passes_test(is_curator)
 def submissions_to_check(request):
-    submissions = AssignmentSubmission.objects.filter(status='submitted')
-    return render(request, 'review_submissions.html', {'submissions': submissions})
+    submissions = _pending_submissions(request.GET).select_related('user', 'assignment')
+    # Сначала самые давние ответы
+    page_obj = paginate(submissions, request, ordering=('submitted_at', 'pk'))
+    return render(request, 'review_submissions.html', {
+        'submissions': page_obj,
+        'page_obj': page_obj,
+        'assignments': Assignment.objects.filter(submissions__status='submitted').distinct().order_by('title').values_list('id', 'title'),
+        'selected_assignment': request.GET.get('assignment', ''),
+    })
+
+
+@login_required
+@user_passes_test(is_curator)
+@require_POST
+def submissions_bulk_review(request):
+    action = SUBMISSION_BULK_ACTIONS.get(request.POST.get('action'))
+    assignment_id = request.POST.get('assignment', '')
+    back = reverse('submissions_to_check') + (f'?assignment={assignment_id}' if assignment_id.isdigit() else '')
+    if action is None:
+        messages.error(request, 'Неизвестное действие')
+        return redirect(back)
+    status, everything = action
+
+    submissions = _pending_submissions(request.POST)
+    if not everything:
+        ids = [pk for pk in request.POST.getlist('selected') if pk.isdigit()]
+        if not ids:
+            messages.warning(request, 'Не выбрано ни одного ответа')
+            return redirect(back)
+        submissions = submissions.filter(pk__in=ids)
+
+    count = progress.review_submissions(submissions, status)
+    messages.success(request, f'{"Принято" if status == "accepted" else "Отправлено на доработку"} ответов: {count}')
+    return redirect(back)
 
 
 @login_required
@@ -488,9 +580,8 @@ def review_submission(request, submission_id):
     submission = get_object_or_404(AssignmentSubmission, id=submission_id)
     form = SubmissionReviewForm(request.POST or None, instance=submission)
     if request.method == 'POST' and form.is_valid():
-        form.save()
-        if submission.status == 'accepted':
-            check_program_completion(submission.user)
+        # Счётчики прогресса и сертификат обновляются сигналами (app/progress.py)
+        writes.atomic_with_retry(form.save)
         messages.success(request, 'Статус задания обновлен')
         return redirect('submissions_to_check')
 
@@ -501,7 +592,7 @@ def review_submission(request, submission_id):
 @login_required
 @user_passes_test(is_curator)
 def upload_material(request):
-    form = MaterialForm(request.POST or None, request.FILES or None)
+    form = MaterialForm(request.POST or None, request.FILES or None, user=request.user)
     if request.method == 'POST' and form.is_valid():
         form.save()
         messages.success(request, 'Материал загружен')
@@ -509,28 +600,87 @@ def upload_material(request):
     return render(request, 'upload_material.html', {'form': form})
 
 
+# ⏫ Загрузка файлов частями (протокол — в app/uploads.py)
+def _upload_error(exc):
+    return JsonResponse({'error': str(exc)}, status=400)
+
+
+@login_required
+@require_POST
+def upload_start(request):
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Не указан размер файла'}, status=400)
+    try:
+        session = uploads.start_upload(
+            request.user, request.POST.get('filename'), size, request.POST.get('checksum', '')
+        )
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(uploads.describe(session), status=201)
+
+
+@login_required
+def upload_status(request, upload_id):
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    return JsonResponse(uploads.describe(session))
+
+
+@login_required
+@require_http_methods(['PUT', 'POST'])
+def upload_chunk(request, upload_id, index):
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    try:
+        # request читается потоком прямо в файл на диске
+        session = uploads.write_chunk(session, index, request, request.headers.get('X-Chunk-Checksum', ''))
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(uploads.describe(session))
+
+
+@login_required
+@require_POST
+def upload_finish(request, upload_id):
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    try:
+        session = uploads.finish_upload(session, request.POST.get('checksum', ''))
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(uploads.describe(session))
+
+
 # 👩‍🏫 Кураторы
 @login_required
+@replica_reads
 def curators(request):
     query = request.GET.get('q', '')
-    curators = Users.objects.filter(groups__name='Куратор')
-
-    if query:
-        curators = curators.filter(username__icontains=query)
+    curators = search.filter_queryset(
+        Users.objects.filter(groups__name='Куратор'), search.CURATOR, query,
+        fallback_fields=('username', 'last_name', 'first_name'),
+    )
 
     # 👇 Правильный related_name — Program.curator -> curated_programs
     curators = curators.annotate(programs_count=Count('curated_programs'))
+    page_obj = SimpleLazyObject(
+        lambda: paginate(curators, request, ordering=_search_ordering(query, ('username', 'pk')))
+    )
 
-    return render(request, 'curators.html', {'curators': curators, 'query': query})
+    return render(request, 'curators.html', {
+        'curators': page_obj,
+        'page_obj': page_obj,
+        'query': query,
+        'cursor': request.GET.get('cursor', ''),
+        'page_query': fragments.page_query(q=query),
+        **fragments.context(fragments.CURATORS, fragments.PROGRAMS),
+    })
 
 
 @login_required
+@replica_reads
 def sections(request):
     query = request.GET.get('q', '')
-    sections = Section.objects.all()
-
-    if query:
-        sections = sections.filter(name__icontains=query)
+    sections = search.filter_queryset(Section.objects.all(), search.SECTION, query)
 
     # 📊 Аннотация: количество программ и количество материалов через module -> materials
     sections = sections.annotate(
@@ -538,22 +688,105 @@ def sections(request):
         materials_count=Count('modules__materials', distinct=True)  # <- FIX: modules__materials
     )
 
+    page_obj = SimpleLazyObject(lambda: paginate(sections, request, ordering=_search_ordering(query)))
+
     context = {
-        'sections': sections,
+        'sections': page_obj,
+        'page_obj': page_obj,
         'query': query,
-        'is_curator': is_curator(request.user)
+        'cursor': request.GET.get('cursor', ''),
+        'page_query': fragments.page_query(q=query),
+        'is_curator': is_curator(request.user),
+        **fragments.context(fragments.SECTIONS, fragments.PROGRAMS, fragments.MODULES, fragments.MATERIALS),
     }
     return render(request, 'sections.html', context)
 
 
 # ✅ Одобрение заявок (Куратор, Админ)
+ENROLLMENT_STATUSES = {'pending': False, 'approved': True}
+ENROLLMENT_BULK_ACTIONS = {
+    'approve_selected': (True, False),
+    'reject_selected': (False, False),
+    'approve_all': (True, True),
+    'reject_all': (False, True),
+}
+
+
+def _managed_programs(user):
+    # Куратор работает только со своими программами, админ — со всеми
+    programs = Program.objects.all()
+    if not is_admin(user):
+        programs = programs.filter(curators=user)
+    return programs
+
+
+def _managed_enrollments(user):
+    enrollments = Enrollment.objects.all()
+    if not is_admin(user):
+        enrollments = enrollments.filter(program__curators=user)
+    return enrollments
+
+
+def _filter_enrollments(enrollments, params):
+    """Фильтры страницы заявок: программа, статус, логин."""
+    program_id = params.get('program', '')
+    if program_id.isdigit():
+        enrollments = enrollments.filter(program_id=program_id)
+    status = params.get('status', '')
+    if status in ENROLLMENT_STATUSES:
+        enrollments = enrollments.filter(is_approved=ENROLLMENT_STATUSES[status])
+    if query := params.get('q', '').strip():
+        enrollments = enrollments.filter(user__username__icontains=query)
+    return enrollments
+
+
+def _enrollment_filters_query(params):
+    return urlencode({key: params[key] for key in ('program', 'status', 'q') if params.get(key)})
+
+
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def manage_enrollments(request):
-    enrollments = Enrollment.objects.all()
-    return render(request, 'manage_enrollments.html', {'enrollments': enrollments})
+    enrollments = _filter_enrollments(_managed_enrollments(request.user), request.GET).select_related('user', 'program')
+    # Новые заявки сверху
+    page_obj = paginate(enrollments, request, ordering=('-pk',))
+    return render(request, 'manage_enrollments.html', {
+        'enrollments': page_obj,
+        'page_obj': page_obj,
+        'programs': _managed_programs(request.user).order_by('name').values_list('id', 'name'),
+        'selected_program': request.GET.get('program', ''),
+        'selected_status': request.GET.get('status', ''),
+        'query': request.GET.get('q', ''),
+    })
+
+
+@login_required
+@user_passes_test(is_curator_or_admin)
+@require_POST
+def enrollments_bulk(request):
+    action = ENROLLMENT_BULK_ACTIONS.get(request.POST.get('action'))
+    if action is None:
+        messages.error(request, 'Неизвестное действие')
+        return redirect('enrollments_manage')
+    approved, everything = action
+
+    enrollments = _filter_enrollments(_managed_enrollments(request.user), request.POST)
+    if not everything:
+        ids = [pk for pk in request.POST.getlist('selected') if pk.isdigit()]
+        enrollments = enrollments.filter(pk__in=ids)
+        if not ids:
+            messages.warning(request, 'Не выбрано ни одной заявки')
+            return redirect(f"{reverse('enrollments_manage')}?{_enrollment_filters_query(request.POST)}")
+
+    count = progress.set_approval(enrollments, approved)
+    messages.success(request, f'{"Одобрено" if approved else "Отклонено"} заявок: {count}')
+    return redirect(f"{reverse('enrollments_manage')}?{_enrollment_filters_query(request.POST)}")
+
 
 # 📈 Статистика (только Админ)
+STATISTICS_PERIODS = ('7', '30', '90', '365')
+
+
 @login_required
 @user_passes_test(is_admin)
 def statistics(request):
@@ -561,17 +794,28 @@ def statistics(request):
     curators_count = Users.objects.filter(groups__name='Куратор').count()
     programs_count = Program.objects.count()
 
+    # Динамика — только из дневных агрегатов (app/stats.py)
+    days = request.GET.get('days', '30')
+    days = int(days) if days in STATISTICS_PERIODS else 30
+    program_id = request.GET.get('program')
+    program_id = int(program_id) if program_id and program_id.isdigit() else None
+
     context = {
         'participants_count': participants_count,
         'curators_count': curators_count,
-        'programs_count': programs_count
+        'programs_count': programs_count,
+        'days': days,
+        'periods': [int(period) for period in STATISTICS_PERIODS],
+        'program_id': program_id,
+        'programs': Program.objects.order_by('name').values_list('id', 'name'),
+        **stats.dashboard(days, program_id),
     }
     return render(request, 'statistics.html', context)
 
 
 # --- Программы: CRUD ---
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def program_create(request):
     form = ProgramForm(request.POST or None, request.FILES or None)
     if request.method == 'POST' and form.is_valid():
@@ -581,7 +825,7 @@ def program_create(request):
     return render(request, 'program_form.html', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def program_edit(request, pk):
     program = get_object_or_404(Program, pk=pk)
     form = ProgramForm(request.POST or None, request.FILES or None, instance=program)
@@ -592,18 +836,19 @@ def program_edit(request, pk):
     return render(request, 'program_form.html', {'form': form})
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def program_delete(request, pk):
     program = get_object_or_404(Program, pk=pk)
-    program.delete()
-    messages.success(request, 'Программа удалена')
+    # Каскад (заявки, прогресс, сертификаты) удаляется в фоне
+    tasks.delete_program.enqueue(program_id=program.pk)
+    messages.success(request, 'Программа будет удалена в ближайшее время')
     return redirect('my_programs')
 
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def enrollment_toggle_approval(request, pk):
-    enrollment = get_object_or_404(Enrollment, pk=pk)
+    enrollment = get_object_or_404(_managed_enrollments(request.user), pk=pk)
     enrollment.is_approved = not enrollment.is_approved
     enrollment.save()
     messages.success(request, f'Заявка {"одобрена" if enrollment.is_approved else "отклонена"}')
@@ -611,7 +856,7 @@ def enrollment_toggle_approval(request, pk):
 
 # --- Разделы: CRUD ---
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def section_create(request):
     if request.method == 'POST':
         name = request.POST.get('name')
@@ -624,7 +869,7 @@ def section_create(request):
     return render(request, 'section_form.html')
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def section_edit(request, pk):
     section = get_object_or_404(Section, pk=pk)
     if request.method == 'POST':
@@ -636,11 +881,12 @@ def section_edit(request, pk):
     return render(request, 'section_form.html', {'section': section})
 
 @login_required
-@user_passes_test(lambda u: is_curator(u) or is_admin(u))
+@user_passes_test(is_curator_or_admin)
 def section_delete(request, pk):
     section = get_object_or_404(Section, pk=pk)
-    section.delete()
-    messages.success(request, 'Раздел удалён')
+    # Каскад (модули, задания, ответы, программы) удаляется в фоне
+    tasks.delete_section.enqueue(section_id=section.pk)
+    messages.success(request, 'Раздел будет удалён в ближайшее время')
     return redirect('sections_manage')
 
 
@@ -654,12 +900,12 @@ def my_programs(request):
         my_enrollments = Enrollment.objects.filter(user=request.user, is_approved=True).values_list('program_id', flat=True)
         filters &= Q(id__in=my_enrollments)
 
-    if query:
-        filters &= Q(name__icontains=query)
     if section_id:
         filters &= Q(section_id=section_id)
 
-    programs = Program.objects.filter(filters).select_related('section')
+    programs = search.filter_queryset(
+        Program.objects.filter(filters).select_related('section'), search.PROGRAM, query
+    )
     sections = Section.objects.all()
 
     context = {
@@ -0,0 +1,77 @@
+# app/warmup.py
+"""
+Прогрев воркера перед первым запросом.
+
+Без прогрева первый запрос каждого нового воркера (в том числе после
+перезапуска по max_requests) сам компилирует шаблоны, строит таблицы
+URL и открывает соединение с базой — и платит за это задержкой.
+warm_up() делает всё это заранее; вызывается из gunicorn.conf.py
+(post_worker_init) и командой `python manage.py coldstart`.
+
+Соединения прогреваются только для sync-воркера: там запрос выполняется
+в том же потоке, что и прогрев. Под ASGI (UvicornWorker) ORM работает в
+потоках sync_to_async, и соединение главного потока так и осталось бы
+открытым без дела, поэтому gunicorn.conf.py передаёт databases=False.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from .routers import is_ready
+
+logger = logging.getLogger(__name__)
+
+
+def _templates():
+    root = Path(apps.get_app_config('app').path) / 'templates'
+    compiled = 0
+    for path in sorted(root.rglob('*.html')):
+        try:
+            # Кэширующий загрузчик запоминает скомпилированный шаблон на весь процесс
+            get_template(path.relative_to(root).as_posix())
+            compiled += 1
+        except TemplateSyntaxError:
+            logger.exception('Шаблон %s не компилируется', path)
+    return compiled
+
+
+def _urls():
+    resolver = get_resolver()
+    # Импорт представлений и таблица для reverse() строятся при первом обращении
+    resolver.resolve('/')
+    reverse('index')
+    return len(resolver.reverse_dict)
+
+
+def _databases():
+    opened = 0
+    for alias in connections:
+        if alias != 'default' and not is_ready(alias):
+            continue
+        # Заодно выполняется init_command (PRAGMA). Sync-воркер gunicorn обслуживает
+        # запросы в этом же потоке, и с CONN_MAX_AGE соединение переходит к ним
+        connections[alias].ensure_connection()
+        opened += 1
+    return opened
+
+
+def warm_up(databases=True):
+    """
+    Прогреть шаблоны, URL и (если databases) соединения.
+    Возвращает {этап: (количество, мс)}.
+    """
+    steps = [('templates', _templates), ('urls', _urls)]
+    if databases:
+        steps.append(('databases', _databases))
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        count = step()
+        timings[name] = (count, round((time.perf_counter() - start) * 1000, 1))
+    return timings
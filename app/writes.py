@@ -0,0 +1,140 @@
+# app/writes.py
+"""
+Запись в SQLite при конкуренции за блокировку.
+
+SQLite допускает одного писателя. Профиль соединения в settings.py
+(WAL, busy timeout, BEGIN IMMEDIATE) снимает большую часть ошибок
+«database is locked», а то, что осталось, закрывают:
+
+* atomic_with_retry — выполнить запись в транзакции и при блокировке
+  повторить её с экспоненциальной задержкой;
+* mark_material_viewed — отметки о просмотре материалов копятся в памяти
+  процесса и пишутся пачкой в одной транзакции раз в
+  MATERIAL_VIEWS_FLUSH_INTERVAL секунд (0 — сразу, без буфера).
+  Пока отметка в буфере, pending_material_views учитывает её
+  для этого же процесса. Буфер сбрасывается и при штатном выходе
+  процесса (atexit, worker_exit в gunicorn.conf.py — в том числе при
+  перезапуске по max_requests). Если процесс убит (SIGKILL, OOM),
+  теряются отметки последних MATERIAL_VIEWS_FLUSH_INTERVAL секунд:
+  ни строки MaterialProgress, ни счётчика — участнику придётся
+  отметить материал заново. Кому это неприемлемо — интервал 0.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import progress
+
+logger = logging.getLogger(__name__)
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+FLUSH_SIZE = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(text in str(exc) for text in LOCK_ERRORS)
+
+
+def atomic_with_retry(func, *args, attempts=None, base_delay=None, **kwargs):
+    """
+    Выполнить func(*args, **kwargs) в transaction.atomic, повторяя при блокировке базы.
+
+    Внутри уже открытой транзакции повтор невозможен — ошибка пробрасывается наверх,
+    повторять будет внешний вызов.
+    """
+    attempts = attempts or _setting('DB_WRITE_RETRY_ATTEMPTS', 5)
+    base_delay = base_delay if base_delay is not None else _setting('DB_WRITE_RETRY_DELAY', 0.05)
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if not is_lock_error(exc) or attempt == attempts or connection.in_atomic_block:
+                raise
+            delay = base_delay * 2 ** (attempt - 1)
+            logger.info('База занята, повтор %s через %.2f с', attempt, delay)
+            time.sleep(delay + random.uniform(0, delay))
+
+
+# 👀 Буфер отметок о просмотре
+class _ViewBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Сброс при выходе процесса дожидается записи, которую уже начал фоновый поток
+        self.flushing = threading.Lock()
+        self.wakeup = threading.Event()
+        self.views = []
+        self.thread = None
+        self.pid = None
+
+    def add(self, user_id, material_id):
+        with self.lock:
+            self.views.append((user_id, material_id, timezone.now()))
+            self._ensure_thread()
+            if len(self.views) >= FLUSH_SIZE:
+                self.wakeup.set()
+
+    def pending(self, user_id):
+        with self.lock:
+            return {material_id for viewer, material_id, _ in self.views if viewer == user_id}
+
+    def _ensure_thread(self):
+        # После fork (воркеры gunicorn) поток родителя не существует
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='material-views-flush', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        interval = _setting('MATERIAL_VIEWS_FLUSH_INTERVAL', 1.0)
+        while True:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        with self.flushing:
+            with self.lock:
+                views, self.views = self.views, []
+            if not views:
+                return
+            try:
+                atomic_with_retry(progress.record_material_views, views)
+            except Exception as exc:
+                logger.exception('Не удалось записать %s отметок о просмотре', len(views))
+                if is_lock_error(exc):
+                    # База так и не освободилась — попробуем в следующий раз
+                    with self.lock:
+                        self.views = views + self.views
+
+
+_buffer = _ViewBuffer()
+atexit.register(_buffer.flush)
+
+
+def mark_material_viewed(user, material):
+    if _setting('MATERIAL_VIEWS_FLUSH_INTERVAL', 1.0) <= 0:
+        atomic_with_retry(progress.record_material_views, [(user.pk, material.pk, timezone.now())])
+    else:
+        _buffer.add(user.pk, material.pk)
+
+
+def pending_material_views(user):
+    """id материалов, отмеченных пользователем, но ещё не записанных в базу."""
+    return _buffer.pending(user.pk)
+
+
+def flush_material_views():
+    _buffer.flush()
@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+"""
+Настройки gunicorn. Файл подхватывается автоматически, когда gunicorn
+запускается из корня проекта (Dockerfile, loadtest, benchasgi).
+"""
+import os
+import sys
+
+# Перезапуск воркеров после N запросов (0 — выключено); разброс, чтобы не все сразу
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 0))
+
+
+def post_worker_init(worker):
+    # Приложение уже загружено, а запросы воркер ещё не принимает —
+    # прогреваем шаблоны, URL и базу, чтобы первый запрос не платил за них
+    if os.environ.get('STUDYHUB_WARMUP', '1') == '0':
+        return
+    from app.warmup import warm_up
+
+    # Uvicorn-воркер выполняет ORM в других потоках — соединение отсюда им не достанется
+    asgi = type(worker).__module__.startswith('uvicorn')
+    timings = warm_up(databases=not asgi)
+    worker.log.info(
+        'Прогрев: %s', ', '.join(f'{name} {count} за {ms} мс' for name, (count, ms) in timings.items())
+    )
+
+
+def worker_exit(server, worker):
+    # Воркер выходит штатно (SIGTERM, перезапуск по max_requests) — дописываем
+    # отметки о просмотре из буфера app/writes.py, иначе они пропадут.
+    # Модуль не загружен — воркер не успел принять запросы, и буфер пуст
+    writes = sys.modules.get('app.writes')
+    if writes is not None:
+        writes.flush_material_views()
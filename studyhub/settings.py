@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,7 +32,29 @@ ALLOWED_HOSTS = ['85.192.29.95', 'localhost']
 # Application definition
 # --- Медиафайлы (изображения, документы и т.д.) ---
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = os.environ.get('STUDYHUB_MEDIA_ROOT', BASE_DIR / 'media')
+
+# Уменьшенные копии изображений сертификатов для каталога (app/thumbnails.py)
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_QUALITY = 80
+
+# Отдача файлов материалов веб-сервером вместо Django (app/streaming.py):
+# None — отдаёт Django, 'x-accel-redirect' — nginx, 'x-sendfile' — Apache/lighttpd.
+# Для nginx нужен internal-location MATERIAL_SENDFILE_PREFIX с alias на MEDIA_ROOT.
+MATERIAL_SENDFILE_BACKEND = None
+MATERIAL_SENDFILE_PREFIX = '/protected-media/'
+
+# Докачиваемая загрузка файлов частями (app/uploads.py).
+# Части лежат вне MEDIA_ROOT, чтобы недокачанные файлы не были доступны по ссылке.
+CHUNKED_UPLOAD_ROOT = BASE_DIR / 'db' / 'uploads'
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+# Место под .part выделяется сразу, поэтому у каждого пользователя есть лимит
+# незакреплённых загрузок и их общего размера
+CHUNKED_UPLOAD_MAX_SESSIONS = 3
+CHUNKED_UPLOAD_MAX_USER_BYTES = 4 * 1024 ** 3
+# Загрузка без новых частей дольше этого срока считается брошенной и удаляется, ч
+CHUNKED_UPLOAD_EXPIRE_HOURS = 24
 
 AUTH_USER_MODEL = 'app.Users'
 
@@ -54,13 +77,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.routers.DatabaseRoutingMiddleware',
+    'app.middleware.QueryMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'studyhub.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для метрик (app/metrics.py)
+        'BACKEND': 'app.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,7 +109,58 @@ WSGI_APPLICATION = 'studyhub.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db' / 'db.sqlite3',
+        # STUDYHUB_DB_PATH подменяет базу, например для нагрузочного теста на копии
+        'NAME': os.environ.get('STUDYHUB_DB_PATH', BASE_DIR / 'db' / 'db.sqlite3'),
+        # Профиль SQLite под конкурентную запись (см. app/writes.py):
+        # WAL — читатели не блокируют писателя; synchronous=NORMAL в WAL безопасен
+        # при сбое процесса; mmap и кэш страниц ускоряют чтение.
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Транзакция сразу берёт блокировку записи, а не пытается повысить
+            # чтение до записи (такая попытка падает с «database is locked» без ожидания)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # busy timeout, секунд ожидания блокировки
+        },
+        # Постоянные соединения — только для WSGI. Под ASGI синхронный ORM работает
+        # в потоках sync_to_async, соединение не переживает запрос и копится
+        # незакрытым, поэтому Dockerfile вместе с APP_MODULE ставит 0.
+        'CONN_MAX_AGE': int(os.environ.get('STUDYHUB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Реплика для чтения каталога (app/routers.py). Снимок SQLite обновляется
+# командой `python manage.py snapshotdb --interval 60`. Соединение с репликой
+# не переиспользуется, чтобы каждый запрос видел последний снимок.
+if os.environ.get('STUDYHUB_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['STUDYHUB_REPLICA_PATH'],
+        'OPTIONS': {'init_command': 'PRAGMA query_only=1;PRAGMA mmap_size=268435456;'},
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 120  # сколько после записи пользователь читает только с основной базы
+
+
+# Кэш, общий для всех воркеров gunicorn на сервере (app/sqlite_cache.py):
+# роли пользователей, версии и фрагменты каталога
+CACHES = {
+    'default': {
+        'BACKEND': 'app.sqlite_cache.SQLiteCache',
+        'LOCATION': os.environ.get('STUDYHUB_CACHE_PATH', BASE_DIR / 'db' / 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'MAX_SIZE': 64 * 1024 * 1024,  # байт
+        },
     }
 }
 
@@ -128,3 +205,42 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Фоновые задачи (app/jobs.py, воркер: python manage.py runjobs)
+# JOBS_EAGER = True выполняет задачи сразу в запросе — удобно без запущенного воркера
+JOBS_EAGER = False
+JOBS_RETRY_BACKOFF = 30  # секунд до первого повтора, дальше удваивается
+JOBS_STALE_TIMEOUT = 600  # через сколько секунд задача упавшего воркера вернётся в очередь
+JOBS_REQUEUE_INTERVAL = 60  # как часто работающие воркеры ищут такие задачи, секунд
+
+# Метрики SQL-запросов и времени ответа (app/metrics.py, отчёт: python manage.py viewstats)
+# Выключены по умолчанию; STUDYHUB_METRICS=1 включает, и тогда замеряется доля
+# запросов METRICS_SAMPLE_RATE (для разбора на стенде можно поднять до 1.0)
+METRICS_ENABLED = os.environ.get('STUDYHUB_METRICS', '0') == '1'
+METRICS_DB = BASE_DIR / 'db' / 'metrics.sqlite3'
+METRICS_SAMPLE_RATE = float(os.environ.get('STUDYHUB_METRICS_SAMPLE_RATE', 0.05))
+METRICS_RETENTION_HOURS = 72
+# Максимум SQL-запросов на представление; превышение пишется в лог,
+# при QUERY_BUDGETS_STRICT = True — исключение
+QUERY_BUDGETS = {
+    'index': 8,
+    'profile': 10,
+    'assignments': 10,
+    'materials': 10,
+    'enrollments_manage': 8,
+    'submissions_to_check': 8,
+    'stats': 10,
+}
+QUERY_BUDGETS_STRICT = False
+
+# Запись при конкуренции за SQLite (app/writes.py)
+DB_WRITE_RETRY_ATTEMPTS = 5
+DB_WRITE_RETRY_DELAY = 0.05  # секунд до первого повтора, дальше удваивается
+# Отметки о просмотре пишутся пачкой раз в N секунд; 0 — сразу. Если воркер убит
+# (SIGKILL, OOM), отметки за последние N секунд теряются (см. app/writes.py)
+MATERIAL_VIEWS_FLUSH_INTERVAL = 1.0
+
+# Кэш фрагментов каталога (app/fragments.py). Версии сбрасываются сигналами,
+# таймаут лишь убирает старые версии фрагментов из кэша
+FRAGMENT_CACHE_TIMEOUT = 600